@@ -0,0 +1,215 @@
+import os
+import json
+import asyncio
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+
+import inference
+
+"""
+asyncio (ASGI) entry point with the same /ping and /invocations contract as the Flask app in inference.py
+uvicorn asgi:app --host 0.0.0.0 --port 8080        (or SERVER=uvicorn ./serve)
+
+the event loop only moves bytes: a request body is read completely before the request takes an inference
+slot, so a slow upload holds nothing but its socket. JSON parsing, featurization, the forward pass and
+response encoding run on a bounded thread pool
+
+    ASGI_WORKERS       inference threads (default 4 per core; concurrent single-ticker requests meet
+                       in the model's micro-batcher)
+    ASGI_MAX_QUEUE     requests allowed to wait for a thread (default 64); beyond that: 429 + Retry-After
+    ASGI_MAX_BODY_MB   request bodies above this get a 413 (default 64)
+
+Content-Type / Accept application/x-npz: columnar batch requests and responses (codec.py)
+batch requests ({"batch": ...}) sent with "Accept: application/x-ndjson" are answered as a stream, one
+{"ticker": ..., "predictions": {as_of: prediction}} line per ticker as each sector model finishes
+"""
+
+CORES = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+ASGI_WORKERS = int(os.environ.get("ASGI_WORKERS", 4 * CORES))
+ASGI_MAX_QUEUE = int(os.environ.get("ASGI_MAX_QUEUE", "64"))
+ASGI_MAX_BODY = float(os.environ.get("ASGI_MAX_BODY_MB", "64")) * 2**20
+NDJSON = "application/x-ndjson"
+_DONE = object()
+_TOO_LARGE = object()
+
+
+class BadRequest(Exception):
+    pass
+
+
+# thread pool with admission control: at most workers + max_queue requests in it at once, the rest are
+# turned away instead of piling up. all bookkeeping happens on the event loop thread
+class InferencePool():
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="inference")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    # asyncio future of fn(*args) on the pool, or None when it is full
+    def try_submit(self, fn, *args):
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            return None
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self.pending -= 1
+        self.completed += 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+pool = InferencePool(ASGI_WORKERS, ASGI_MAX_QUEUE)
+
+
+# runs on the pool: parse, route, predict, encode -> (body, content type). with emit, a batch request is
+# handed out ticker by ticker
+def run(body, content_type, accept, attributes, args, emit=None):
+    inference.load_artifacts()
+    try:
+        data = inference.decode_request(body, content_type)
+    except ValueError as e:
+        raise BadRequest(f"invalid payload: {e}")
+    hints = inference.route_hints(data, attributes, args)
+    if emit is not None and isinstance(data, dict) and "batch" in data:
+        for ticker, predictions in inference.iter_batch(data, hints):
+            emit((json.dumps({"ticker": ticker, "predictions": predictions}) + "\n").encode())
+        return None
+    return inference.encode_response(data, inference.handle(data, hints), accept)
+
+
+async def respond(send, status, body, content_type="application/json", headers=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def respond_error(send, error):
+    if isinstance(error, (KeyError, BadRequest, inference.InvalidState)):
+        message, status = str(error.args[0]), 400
+    else:
+        message, status = f"{type(error).__name__}: {error}", 500
+    await respond(send, status, json.dumps({"error": message}).encode())
+
+
+# the whole request body, None if the client disconnected, _TOO_LARGE past ASGI_MAX_BODY
+async def read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > ASGI_MAX_BODY:
+            return _TOO_LARGE
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def invocations(scope, receive, send):
+    body = await read_body(receive)
+    if body is None:
+        return  # nobody left to answer
+    if body is _TOO_LARGE:
+        await respond(send, 413, b'{"error": "request body too large"}')
+        return
+
+    headers = {key.decode().lower(): value.decode() for key, value in scope["headers"]}
+    attributes = headers.get("x-amzn-sagemaker-custom-attributes", "")
+    args = dict(parse_qsl(scope["query_string"].decode()))
+    content_type = headers.get("content-type", "application/json")
+    accept = headers.get("accept", "")
+    error = inference.wait_ready(0) if inference.ready.is_set() else await asyncio.to_thread(inference.wait_ready)
+    if error is not None:
+        await respond(send, 503, json.dumps({"error": error}).encode())
+        return
+
+    if NDJSON not in accept:
+        future = pool.try_submit(run, body, content_type, accept, attributes, args)
+        if future is None:
+            await respond(send, 429, b'{"error": "too many requests"}', headers=[(b"retry-after", b"1")])
+            return
+        try:
+            await respond(send, 200, *await future)
+        except Exception as e:
+            await respond_error(send, e)
+        return
+
+    # streamed: lines are queued from the worker thread in order, the future's completion lands after them
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+    future = pool.try_submit(run, body, content_type, accept, attributes, args,
+                             lambda line: loop.call_soon_threadsafe(lines.put_nowait, line))
+    if future is None:
+        await respond(send, 429, b'{"error": "too many requests"}', headers=[(b"retry-after", b"1")])
+        return
+    future.add_done_callback(lambda f: lines.put_nowait(_DONE))
+
+    line = await lines.get()
+    if line is _DONE:
+        # failed before the first ticker (routing, bad payload) or not a batch request: a plain response
+        if future.exception() is not None:
+            await respond_error(send, future.exception())
+        else:
+            await respond(send, 200, *future.result())
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", NDJSON.encode())]})
+    while line is not _DONE:
+        await send({"type": "http.response.body", "body": line, "more_body": True})
+        line = await lines.get()
+    if future.exception() is not None:
+        error = future.exception()
+        line = json.dumps({"error": f"{type(error).__name__}: {error}"}) + "\n"
+        await send({"type": "http.response.body", "body": line.encode(), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route == ("GET", "/ping"):
+        if inference.preload_error is not None:
+            await respond(send, 503, f"model preload failed: {inference.preload_error}".encode(), "text/plain")
+        else:
+            ready = inference.ready.is_set()
+            await respond(send, 200 if ready else 503, b"OK" if ready else b"loading", "text/plain")
+    elif route == ("GET", "/metrics"):
+        await respond(send, 200, json.dumps(dict(inference.stats(), executor=pool.stats())).encode())
+    elif route == ("POST", "/invocations"):
+        await invocations(scope, receive, send)
+        if "first_response_at" not in inference.STARTUP:
+            inference.STARTUP["first_response_at"] = inference.process_age()
+    else:
+        await respond(send, 404, b'{"error": "not found"}')
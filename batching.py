@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+"""
+dynamic micro-batching for concurrent inference requests
+
+    batcher = MicroBatcher(lambda windows: predict_batch(np.stack(windows)), max_batch_size=64, max_wait_ms=5)
+    prediction = batcher.submit(window)       # blocks the calling request thread until its result is ready
+
+one scheduler thread takes the oldest queued item, keeps gathering until the batch holds
+`max_batch_size` items or `max_wait_ms` has passed since that item arrived, runs `fn` once on the
+whole batch and hands result i back to caller i. stats() reports queue depth, a batch-size histogram
+and p50/p99 latency (queue wait + forward) over the last `latency_window` requests
+"""
+
+class BatcherClosed(RuntimeError):
+    pass
+
+
+class MicroBatcher():
+    def __init__(self, fn, max_batch_size=64, max_wait_ms=5.0, latency_window=10_000):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.latency_window = latency_window
+        self._start()
+
+    def _start(self):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = np.zeros(self.max_batch_size + 1, dtype=np.int64)
+        self._latencies = deque(maxlen=self.latency_window)
+        self._requests = 0
+        self._errors = 0
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # threads do not survive fork(): a child process (e.g. a gunicorn worker forked from a master
+    # that preloaded the models) calls this to get its own scheduler thread and empty stats
+    def restart(self):
+        self._start()
+
+    def submit_async(self, item):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise BatcherClosed("MicroBatcher is closed")
+            self._queue.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def submit(self, item, timeout=None):
+        return self.submit_async(item).result(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += len(batch)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            done = time.perf_counter()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._requests += len(batch)
+                self._latencies.extend(done - queued for _, _, queued in batch)
+
+    # drains whatever is queued, then stops the scheduler thread
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = np.array(self._latencies) * 1e3
+            histogram = self._batch_sizes.copy()
+            requests, errors = self._requests, self._errors
+        n_batches = int(histogram.sum())
+        return {
+            "queue_depth": len(self._queue),
+            "requests": requests,
+            "errors": errors,
+            "batches": n_batches,
+            "mean_batch_size": requests / n_batches if n_batches else None,
+            "batch_size_histogram": {int(size): int(histogram[size]) for size in np.flatnonzero(histogram)},
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "p99": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            },
+            "requests_per_sec": requests / (time.perf_counter() - self._started),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1e3,
+        }
@@ -0,0 +1,72 @@
+import os
+import sys
+import io
+import copy
+import time
+from contextlib import redirect_stdout
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from models import Generator, Discriminator
+from training import Trainer
+from metrics import MetricsLogger
+from preprocessing import WindowDataset, TickerBatchSampler
+from feature_store import open_feature_store
+
+"""
+eager fp32 vs bf16 autocast / torch.compile training: steps/s and loss-curve parity
+python3 benchmarks/bench_accel.py [n_batches] [batch_size]
+"""
+
+N_BATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+BATCH_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+LOOKBACK = 3
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "1yr")
+DATASETS = ("financial_stocks_1y.csv", "tech_stocks_1y.csv")
+MODES = {
+    "eager fp32": {},
+    "eager bf16": {"amp_dtype": torch.bfloat16},
+    "compile fp32": {"compile": True},
+    "compile bf16": {"compile": True, "amp_dtype": torch.bfloat16},
+}
+
+
+def run(store, models, options, epochs=2):
+    dataset = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), LOOKBACK, store.offsets("train"))
+    sampler = TickerBatchSampler(dataset, BATCH_SIZE, drop_last=True)
+    batches = [b for b in sampler][:N_BATCHES]
+    loader = DataLoader(dataset, batch_sampler=batches, collate_fn=WindowDataset.collate)
+
+    generator, discriminator = copy.deepcopy(models)
+    optim_g = torch.optim.Adam(generator.parameters(), lr=1e-4, betas=[0.5, 0.9])
+    optim_d = torch.optim.Adam(discriminator.parameters(), lr=1e-4, betas=[0.5, 0.9])
+    trainer = Trainer(generator, discriminator, optim_g, optim_d, lambda_weight=10, critic_iterations=5,
+                      device=torch.device("cpu"), metrics=MetricsLogger(), **options)
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        trainer.train(loader, epochs=epochs, lookback=LOOKBACK, output_dim=1, device=torch.device("cpu"))
+    total = time.perf_counter() - start
+    # first epoch includes compilation; throughput is taken from the last one
+    return trainer, trainer.metrics.epochs[-1]["steps_per_sec"], total
+
+
+if __name__ == "__main__":
+    print(f"{N_BATCHES} batches of {BATCH_SIZE} x 2 epochs, {torch.get_num_threads()} threads")
+    for name in DATASETS:
+        store = open_feature_store(os.path.join(DATA_DIR, name))
+        torch.manual_seed(0)
+        models = (Generator(store.n_features), Discriminator())
+        print(f"\n{name}")
+        print(f"{'mode':>14} {'steps/s':>8} {'speedup':>8} {'total':>8} {'max |d-d_ref|':>14} {'max |g-g_ref|':>14}")
+        reference, base = None, None
+        for mode, options in MODES.items():
+            trainer, steps, total = run(store, models, options)
+            losses = trainer.losses
+            if reference is None:
+                reference, base = losses, steps
+            d_diff = np.abs(np.subtract(losses["d"], reference["d"])).max()
+            g_diff = np.abs(np.subtract(losses["g"], reference["g"])).max()
+            print(f"{mode:>14} {steps:>8.2f} {steps / base:>7.2f}x {total:>7.1f}s {d_diff:>14.4f} {g_diff:>14.4f}")
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import socket
+import warnings
+import threading
+import subprocess
+import http.client
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_registry import model_dir
+from bench_batch_inference import ticker_rows
+from load_test import free_port, request
+
+"""
+asyncio server (asgi.py under uvicorn) against the threaded gunicorn server, both with 4 inference threads
+(random generator weights, 4 sector models)
+
+    slow uploads   8 clients trickle their request bodies over ~3 s while one client sends normal requests
+    overload       64 batch requests at once against ASGI_MAX_QUEUE=8: the excess is refused with 429
+    streaming      a financial + industrial batch as NDJSON: time to the first ticker vs the whole response
+python3 benchmarks/bench_asgi.py
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SLOW_CLIENTS = 8
+UPLOAD_SECONDS = 3
+
+
+def start(command, port, **env):
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              env=dict(os.environ, PORT=str(port), PREDICTION_CACHE="off", **env))
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if request(port, "GET", "/ping")[0] == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise TimeoutError(f"{command} did not become healthy")
+
+
+def gunicorn(directory, port):
+    return start([sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "wsgi:app"], port,
+                 MODEL_DIR=directory, SERVER_MODE="threads", SERVER_WORKERS="1", SERVER_THREADS="4")
+
+
+def uvicorn(directory, port, **env):
+    return start([sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--no-access-log"], port,
+                 MODEL_DIR=directory, ASGI_WORKERS="4", **env)
+
+
+# sends the headers, then the body in pieces over `seconds`, then waits for the response
+def slow_upload(port, body, seconds):
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        s.sendall(f"POST /invocations?sector=financial HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode())
+        pieces = np.array_split(np.frombuffer(body, dtype=np.uint8), 30)
+        for piece in pieces:
+            s.sendall(piece.tobytes())
+            time.sleep(seconds / len(pieces))
+        while s.recv(65536):
+            pass
+
+
+def fast_latencies(port, body, n=10):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        assert request(port, "POST", "/invocations?sector=financial", body)[0] == 200
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1e3
+
+
+def slow_uploads(label, port, body):
+    baseline = fast_latencies(port, body)
+    slow = [threading.Thread(target=slow_upload, args=(port, body, UPLOAD_SECONDS)) for _ in range(SLOW_CLIENTS)]
+    for t in slow:
+        t.start()
+    time.sleep(0.2)
+    during = fast_latencies(port, body)
+    for t in slow:
+        t.join()
+    print(f"{label:>8}: normal request p50 {np.median(baseline):7.1f} ms idle | "
+          f"p50 {np.median(during):7.1f} ms, max {during.max():7.1f} ms while {SLOW_CLIENTS} clients upload slowly")
+
+
+def overload(port, body, n=64):
+    statuses = []
+    lock = threading.Lock()
+
+    def client():
+        status, _ = request(port, "POST", "/invocations", body)
+        with lock:
+            statuses.append(status)
+
+    threads = [threading.Thread(target=client) for _ in range(n)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"overload: {n} concurrent batch requests in {elapsed:5.2f} s -> {statuses.count(200)} x 200, "
+          f"{statuses.count(429)} x 429, other {[s for s in statuses if s not in (200, 429)]}")
+
+
+def streaming(port, batch):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    start = time.perf_counter()
+    connection.request("POST", "/invocations", body=json.dumps(batch),
+                       headers={"Content-Type": "application/json", "Accept": "application/x-ndjson"})
+    response = connection.getresponse()
+    first = None
+    lines = []
+    for line in response:
+        if first is None:
+            first = time.perf_counter() - start
+        lines.append(json.loads(line))
+    total = time.perf_counter() - start
+    connection.close()
+
+    full = json.loads(request(port, "POST", "/invocations", json.dumps(batch))[1])["predictions"]
+    assert {line["ticker"]: line["predictions"] for line in lines} == full
+    print(f"streaming: {len(lines)} tickers, first line after {first * 1e3:6.1f} ms, all after {total * 1e3:6.1f} ms "
+          f"(same predictions as the JSON response)")
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    directory = model_dir()
+    body = json.dumps(ticker_rows("JPM", 60, 0)).encode()
+    batch = {"batch": [row for i, ticker in enumerate(("AXP", "BAC", "C", "GS", "JPM", "MS", "PNC", "WFC"))
+                       for row in ticker_rows(ticker, 60, i)]}
+
+    port = free_port()
+    server = gunicorn(directory, port)
+    try:
+        slow_uploads("gunicorn", port, body)
+    finally:
+        server.terminate()
+        server.wait()
+
+    port = free_port()
+    server = uvicorn(directory, port, ASGI_MAX_QUEUE="8")
+    try:
+        slow_uploads("asgi", port, body)
+        overload(port, json.dumps(batch))
+    finally:
+        server.terminate()
+        server.wait()
+
+    # financial + industrial only, so every ticker routes to exactly one model without hints
+    two_models = model_dir()
+    for root, _, files in os.walk(two_models):
+        for name in files:
+            if name.startswith(("energy_", "tech_")):
+                os.remove(os.path.join(root, name))
+    port = free_port()
+    server = uvicorn(two_models, port)
+    try:
+        mixed = {"batch": batch["batch"] + [row for i, ticker in enumerate(("BA", "CAT", "GE", "UPS"))
+                                            for row in ticker_rows(ticker, 60, 10 + i)]}
+        streaming(port, mixed)
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import time
+import warnings
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from models import Generator
+from bench_features import synthetic_ohlcv
+
+"""
+one batch invocation for the whole financial universe vs one invocation per ticker
+(random generator weights, the repo's financial scalers/encoder; parity is checked per ticker and as_of)
+python3 benchmarks/bench_batch_inference.py
+"""
+
+ARTIFACTS = os.path.join(os.path.dirname(__file__), "..", "artifacts")
+
+
+def model_dir():
+    path = tempfile.mkdtemp()
+    torch.manual_seed(0)
+    torch.save(Generator(59).state_dict(), os.path.join(path, "financial_1y_generator.pth"))
+    for kind, name in (("scalers", "x_scaler"), ("scalers", "y_scaler"), ("encoders", "one_hot_encoder")):
+        shutil.copy(os.path.join(ARTIFACTS, kind, f"financial_1y_{name}.pkl"), path)
+    return path
+
+
+def ticker_rows(ticker, n, seed):
+    df = synthetic_ohlcv(n, seed=seed)
+    df["Dividends"] = 0.0
+    df["Stock Splits"] = 0.0
+    df["ticker"] = ticker
+    df["Date"] = pd.bdate_range("2025-01-02", periods=n).strftime("%Y-%m-%d")
+    return df.to_dict(orient="records")
+
+
+def main():
+    os.environ["MODEL_DIR"] = model_dir()
+    # every request below is a repeat: measure the computation, not the prediction cache
+    os.environ["PREDICTION_CACHE"] = "off"
+    import inference
+    client = inference.app.test_client()
+
+    inference.load_artifacts()
+    tickers = inference.registry.manifests["financial_1y"]["tickers"]
+    payloads = {ticker: ticker_rows(ticker, 100, seed) for seed, ticker in enumerate(tickers)}
+    batch = [row for rows in payloads.values() for row in rows]
+    as_of = [payloads[tickers[0]][i]["Date"] for i in (40, 70, 99)]
+
+    # float32 GEMMs over a batch of windows round differently than one window at a time
+    single = {t: client.post("/invocations", json=rows).get_json() for t, rows in payloads.items()}
+    batched = client.post("/invocations", json={"batch": batch}).get_json()["predictions"]
+    for ticker, rows in payloads.items():
+        (prediction,) = batched[ticker].values()
+        np.testing.assert_allclose(prediction, single[ticker], rtol=1e-4, err_msg=ticker)
+
+    dated = client.post("/invocations", json={"batch": batch, "as_of": as_of}).get_json()["predictions"]
+    for ticker, rows in payloads.items():
+        for date in as_of:
+            cut = [r for r in rows if r["Date"] <= date]
+            expected = client.post("/invocations", json=cut).get_json()
+            np.testing.assert_allclose(dated[ticker][date], expected, rtol=1e-4, err_msg=f"{ticker} {date}")
+    print(f"parity ok: batch matches per-ticker invocations ({len(tickers)} tickers, as_of x{len(as_of)})", file=sys.stderr)
+
+    def run_single():
+        for rows in payloads.values():
+            client.post("/invocations", data=json.dumps(rows), content_type="application/json")
+
+    def run_batch(payload):
+        client.post("/invocations", data=json.dumps(payload), content_type="application/json")
+
+    n_iter = 10
+    results = {}
+    for label, fn in (("per-ticker", run_single),
+                      ("batch", lambda: run_batch({"batch": batch})),
+                      ("batch, 3 as_of", lambda: run_batch({"batch": batch, "as_of": as_of}))):
+        fn()
+        start = time.perf_counter()
+        for _ in range(n_iter):
+            fn()
+        results[label] = (time.perf_counter() - start) / n_iter
+    for label, elapsed in results.items():
+        print(f"{label:>15}: {elapsed * 1e3:7.1f} ms for {len(tickers)} tickers", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    # keeps the server's stdout (startup breakdown) out of the results
+    with redirect_stdout(open(os.devnull, "w")):
+        main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import io
+import time
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from checkpoint import CheckpointManager
+from metrics import MetricsLogger, read_log
+from bench_trainer import make_trainer, synthetic_loader, N_FEATURES
+from models import Generator, Discriminator
+
+"""
+resume must reproduce an uninterrupted run exactly; time the training thread spends per checkpoint
+python3 benchmarks/bench_checkpoint.py
+"""
+
+LOOKBACK = 3
+
+
+def train(trainer, loader, epochs, **kwargs):
+    with redirect_stdout(io.StringIO()):
+        trainer.train(loader, epochs=epochs, lookback=LOOKBACK, output_dim=1, device=torch.device("cpu"), **kwargs)
+
+
+if __name__ == "__main__":
+    root = tempfile.mkdtemp()
+    try:
+        torch.manual_seed(0)
+        models = (Generator(N_FEATURES), Discriminator())
+        loader = synthetic_loader(3, 32)
+        loader = torch.utils.data.DataLoader(loader.dataset, batch_size=32, shuffle=True)
+
+        torch.manual_seed(1)
+        straight = make_trainer(models, "no_grad")
+        straight.metrics = MetricsLogger(flush_every=2, path=os.path.join(root, "log_straight"))
+        train(straight, loader, epochs=3)
+
+        torch.manual_seed(1)
+        first = make_trainer(models, "no_grad")
+        first.metrics = MetricsLogger(flush_every=2, path=os.path.join(root, "log_resumed"))
+        checkpoints = CheckpointManager(os.path.join(root, "ckpt"), keep_last=2)
+        train(first, loader, epochs=3, checkpoints=checkpoints)  # pretend it dies after epoch 2 ...
+        checkpoints.close()
+        os.remove(os.path.join(root, "ckpt", "epoch-0002.pt"))
+        with open(os.path.join(root, "ckpt", "checkpoints.json"), "w") as f:
+            f.write('[{"epoch": 1, "step": 6, "file": "epoch-0001.pt", "score": null}]')
+
+        torch.manual_seed(123)  # a fresh process: nothing shared but the checkpoint
+        resumed = make_trainer((Generator(N_FEATURES), Discriminator()), "no_grad")
+        resumed.metrics = MetricsLogger(flush_every=2, path=os.path.join(root, "log_resumed"), resume=True)
+        checkpoints = CheckpointManager(os.path.join(root, "ckpt"), keep_last=2)
+        with redirect_stdout(io.StringIO()):
+            start_epoch = checkpoints.restore(resumed)
+        assert start_epoch == 2
+        train(resumed, loader, epochs=3, start_epoch=start_epoch, checkpoints=checkpoints)
+        checkpoints.close()
+
+        for a, b in zip(list(straight.generator.state_dict().values()) + list(straight.discriminator.state_dict().values()),
+                        list(resumed.generator.state_dict().values()) + list(resumed.discriminator.state_dict().values())):
+            assert torch.equal(a, b)
+        assert straight.losses == resumed.losses and straight.num_steps == resumed.num_steps
+        log_a, log_b = read_log(os.path.join(root, "log_straight")), read_log(os.path.join(root, "log_resumed"))
+        assert all((log_a[k] == log_b[k]).all() for k in log_a)
+        print("resume after epoch 2 reproduces the uninterrupted run exactly (weights, losses, on-disk log)")
+
+        for async_save in (False, True):
+            manager = CheckpointManager(os.path.join(root, f"timing_{async_save}"), async_save=async_save)
+            blocked = 0.0
+            for epoch in range(5):
+                start = time.perf_counter()
+                manager.save(straight, epoch)
+                blocked += (time.perf_counter() - start) / 5
+                time.sleep(0.5)  # the next epoch's training
+            manager.close()
+            size = os.path.getsize(manager.latest()) / 2**20
+            print(f"{'async' if async_save else 'sync':>5}: training thread blocked {blocked * 1e3:7.1f} ms per checkpoint ({size:.0f} MB)")
+    finally:
+        shutil.rmtree(root)
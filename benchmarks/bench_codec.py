@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import warnings
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_registry import model_dir
+from bench_batch_inference import ticker_rows
+from codec import NPZ, encode_batch, decode_batch, decode_predictions
+
+"""
+JSON records vs the columnar npz format (codec.py) for batch requests: payload size, server-side parse
+time (body -> the DataFrame iter_batch starts from) and the end-to-end request, with identical predictions
+(random generator weights, financial model, 5 as_of dates per ticker, prediction cache off)
+python3 benchmarks/bench_codec.py
+"""
+
+FINANCIAL = ("AXP", "BAC", "C", "GS", "JPM", "MS", "PNC", "WFC")
+
+
+def best_of(fn, n=20):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def main():
+    os.environ["MODEL_DIR"] = model_dir()
+    os.environ["PRELOAD"] = "sync"
+    os.environ["PREDICTION_CACHE"] = "off"
+    import inference
+    client = inference.app.test_client()
+
+    print(f"{'':>22} | {'JSON':>9} | {'npz':>9} | {'parse JSON':>10} | {'parse npz':>9} | {'request JSON':>12} | {'request npz':>11}",
+          file=sys.stderr)
+    for n_tickers, days in ((8, 100), (8, 1000), (64, 250)):
+        tickers = [FINANCIAL[i % len(FINANCIAL)] if i < len(FINANCIAL) else f"{FINANCIAL[i % len(FINANCIAL)]}{i}"
+                   for i in range(n_tickers)]
+        rows = [row for i, ticker in enumerate(tickers) for row in ticker_rows(ticker, days, i)]
+        as_of = [rows[-k]["Date"] for k in (1, 2, 5, 10, 20)]
+        json_body = json.dumps({"batch": rows, "as_of": as_of}).encode()
+        npz_body = encode_batch(pd.DataFrame(rows), as_of)
+
+        parse_json = best_of(lambda: pd.DataFrame(json.loads(json_body)["batch"]))
+        parse_npz = best_of(lambda: pd.DataFrame(decode_batch(npz_body)["batch"]))
+
+        # only the tickers the financial model knows are scored; the rest test the transport
+        known = {"batch": [r for r in rows if r["ticker"] in FINANCIAL], "as_of": as_of}
+        known_json = json.dumps(known).encode()
+        known_npz = encode_batch(pd.DataFrame(known["batch"]), as_of)
+        expected = client.post("/invocations", data=known_json, content_type="application/json").get_json()["predictions"]
+        response = client.post("/invocations", data=known_npz, content_type=NPZ, headers={"Accept": NPZ})
+        assert response.mimetype == NPZ and decode_predictions(response.data) == expected
+        request_json = best_of(lambda: client.post("/invocations", data=known_json, content_type="application/json"), 5)
+        request_npz = best_of(lambda: client.post("/invocations", data=known_npz, content_type=NPZ,
+                                                  headers={"Accept": NPZ}), 5)
+
+        print(f"{f'{n_tickers} tickers x {days} days':>22} | {len(json_body) / 1024:6.0f} kB | {len(npz_body) / 1024:6.0f} kB | "
+              f"{parse_json:7.2f} ms | {parse_npz:6.2f} ms | {request_json:9.1f} ms | {request_npz:8.1f} ms", file=sys.stderr)
+    print("parity ok: npz responses decode to the JSON predictions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    with redirect_stdout(open(os.devnull, "w")):
+        main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_registry import model_dir
+from bench_batch_inference import ticker_rows
+
+"""
+cold start of the serving process, from process start to the first /invocations response
+(four sector models with random weights, each mode in a fresh interpreter)
+
+    lazy                  PRELOAD=0: models load inside the first request
+    preload               models + warm-up before /ping turns healthy, found by file name (no manifest)
+    preload + manifest    manifests written up front, state dicts loaded through mmap
+    preload + script      manifests + frozen TorchScript generators
+python3 benchmarks/bench_cold_start.py
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import os, sys, time, json, warnings
+warnings.filterwarnings("ignore")
+sys.path.insert(0, sys.argv[1])
+import inference
+client = inference.app.test_client()
+while client.get("/ping").status_code != 200:
+    time.sleep(0.002)
+healthy_at = inference.process_age()
+with open(sys.argv[2]) as f:
+    rows = json.load(f)
+start = time.perf_counter()
+response = client.post("/invocations?sector=financial", json=rows)
+assert response.status_code == 200, response.get_json()
+first_request = time.perf_counter() - start
+with open(sys.argv[3], "w") as f:
+    json.dump(dict(inference.STARTUP, healthy_at=healthy_at, first_request=first_request), f)
+"""
+
+
+def run(label, directory, payload, **env):
+    out = os.path.join(tempfile.mkdtemp(), "startup.json")
+    subprocess.run([sys.executable, "-c", CHILD, ROOT, payload, out], check=True, stdout=subprocess.DEVNULL,
+                   env=dict(os.environ, MODEL_DIR=directory, BATCH_MAX_WAIT_MS="0", **env))
+    with open(out) as f:
+        s = json.load(f)
+    load = s.get("models_total")
+    print(f"{label:>20} | imports {s['imports']:5.2f} | discover {s.get('discover', 0):5.2f} | "
+          f"load+warm-up {load if load is not None else 0:5.2f} | healthy at {s['healthy_at']:5.2f} | "
+          f"first request {s['first_request'] * 1e3:7.1f} ms | first response at {s['first_response_at']:5.2f}")
+    return s
+
+
+if __name__ == "__main__":
+    legacy = model_dir()
+    payload = os.path.join(tempfile.mkdtemp(), "rows.json")
+    with open(payload, "w") as f:
+        json.dump(ticker_rows("JPM", 60, 0), f)
+
+    manifests = tempfile.mkdtemp()
+    shutil.copytree(legacy, manifests, dirs_exist_ok=True)
+    subprocess.run([sys.executable, os.path.join(ROOT, "registry.py"), manifests], check=True, stdout=subprocess.DEVNULL)
+    scripts = tempfile.mkdtemp()
+    shutil.copytree(legacy, scripts, dirs_exist_ok=True)
+    subprocess.run([sys.executable, os.path.join(ROOT, "registry.py"), scripts, "--script"], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    print("seconds since process start (4 sector models, 1 CPU)")
+    run("lazy", legacy, payload, PRELOAD="0")
+    run("preload", legacy, payload)
+    run("preload + manifest", manifests, payload)
+    s = run("preload + script", scripts, payload)
+    print("per-model breakdown (preload + script):", json.dumps(s["models"]["financial_1y"]))
@@ -0,0 +1,42 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+"""
+scaling efficiency of distributed.py per rank count (weak scaling: fixed per-rank batch)
+efficiency(n) = samples/s with n ranks / (n * samples/s with 1 rank)
+python3 benchmarks/bench_distributed.py [sector] [max_rank_count] [steps]
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SECTOR = sys.argv[1] if len(sys.argv) > 1 else "tech"
+MAX_RANKS = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count())
+STEPS = sys.argv[3] if len(sys.argv) > 3 else "6"
+
+if __name__ == "__main__":
+    out_dir = tempfile.mkdtemp()
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    print(f"sector {SECTOR}, {len(cores)} cores, {STEPS} steps/epoch x 2 epochs, batch 64 per rank")
+    print(f"{'ranks':>6} {'steps/s':>8} {'samples/s':>10} {'efficiency':>11} {'in sync':>8}")
+    base = None
+    try:
+        n = 1
+        while n <= MAX_RANKS:
+            summary_path = os.path.join(out_dir, f"summary_{n}.json")
+            subprocess.run([sys.executable, "distributed.py", "--sectors", SECTOR, "--world-size", str(n),
+                            "--epochs", "2", "--max-steps", STEPS, "--batch-size", "64",
+                            "--cores", ",".join(map(str, cores)), "--out-dir", out_dir,
+                            "--summary-path", summary_path],
+                           cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            with open(summary_path) as f:
+                summary = json.load(f)
+            base = base or summary["samples_per_sec"]
+            efficiency = summary["samples_per_sec"] / (n * base)
+            print(f"{n:>6} {summary['steps_per_sec']:>8.2f} {summary['samples_per_sec']:>10.1f} "
+                  f"{efficiency:>10.0%} {str(summary['replicas_in_sync']):>8}")
+            n *= 2
+    finally:
+        shutil.rmtree(out_dir)
@@ -0,0 +1,69 @@
+import os
+import sys
+import io
+import time
+from contextlib import redirect_stdout
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from feature_store import open_feature_store
+from preprocessing import WindowDataset, TickerBatchSampler
+from models import Generator, Discriminator
+from bench_trainer import make_trainer
+
+"""
+Trainer.evaluate against the notebook's sklearn metrics, and early stopping on a plateau
+python3 benchmarks/bench_evaluate.py
+"""
+
+SOURCE = os.path.join(os.path.dirname(__file__), "..", "data", "1yr", "tech_stocks_1y.csv")
+LOOKBACK = 3
+
+
+if __name__ == "__main__":
+    store = open_feature_store(SOURCE)
+    y_scaler = store.transformer("y_scaler")
+    test = WindowDataset.from_offsets(store.array("x_test"), store.array("y_test"), LOOKBACK, store.offsets("test"))
+    test_loader = DataLoader(test, batch_size=128, collate_fn=WindowDataset.collate)
+
+    torch.manual_seed(0)
+    trainer = make_trainer((Generator(store.n_features), Discriminator()), "no_grad")
+
+    start = time.perf_counter()
+    metrics = trainer.evaluate(test_loader, torch.device("cpu"), y_scaler)
+    elapsed = time.perf_counter() - start
+
+    # the notebook's way: one big forward, inverse_transform, sklearn
+    trainer.generator.eval()
+    x, y = test.__getitems__(list(range(len(test))))
+    with torch.no_grad():
+        pred = y_scaler.inverse_transform(trainer.generator(x).numpy())
+    true = y_scaler.inverse_transform(y[:, -1, :].numpy())
+    trainer.generator.train()
+    expected = {
+        "rmse": mean_squared_error(true, pred) ** 0.5,
+        "mae": mean_absolute_error(true, pred),
+        "r2": r2_score(true, pred),
+    }
+    for key in expected:
+        np.testing.assert_allclose(metrics[key], expected[key], rtol=1e-4)
+    print(f"evaluate matches sklearn on {len(test)} windows in {elapsed * 1e3:.0f} ms: "
+          + ", ".join(f"{k}={v:.4f}" for k, v in metrics.items()))
+
+    # a learning rate of 0 can never improve: training must stop after `patience` evaluations
+    train = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), LOOKBACK, store.offsets("train"))
+    batches = list(TickerBatchSampler(train, 64))[:2]
+    train_loader = DataLoader(train, batch_sampler=batches, collate_fn=WindowDataset.collate)
+    for optim in (trainer.optim_g, trainer.optim_d):
+        for group in optim.param_groups:
+            group["lr"] = 0.0
+    with redirect_stdout(io.StringIO()) as out:
+        trainer.train(train_loader, epochs=50, lookback=LOOKBACK, output_dim=1, device=torch.device("cpu"),
+                      val_loader=test_loader, patience=3, y_scaler=y_scaler)
+    assert trainer.metrics.epochs[-1]["epoch"] == 3, trainer.metrics.epochs[-1]["epoch"]
+    assert trainer.best_epoch == 0
+    print(f"early stopping after {len(trainer.metrics.epochs)} of 50 epochs: {out.getvalue().splitlines()[-1]}")
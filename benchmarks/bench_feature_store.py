@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from feature_store import build_feature_store, featurize, FeatureStore
+from preprocessing import WindowDataset, build_windows_per_ticker
+from storage import load_dataset
+
+"""
+startup cost of csv + featurize on every run vs opening a cached feature store, and equality of the windows
+python3 benchmarks/bench_feature_store.py [source]
+"""
+
+SOURCE = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "data", "1yr", "tech_stocks_1y.csv")
+LOOKBACK = 3
+
+if __name__ == "__main__":
+    root = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        features = featurize(load_dataset(SOURCE))
+        x_slide, _, y_slide = build_windows_per_ticker(features["x_train"], features["y_train"], LOOKBACK,
+                                                       features["tickers_train"])
+        from_csv = time.perf_counter() - start
+
+        start = time.perf_counter()
+        path = build_feature_store(SOURCE, root=root)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        path = build_feature_store(SOURCE, root=root)
+        store = FeatureStore(path)
+        dataset = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), LOOKBACK,
+                                             store.offsets("train"))
+        store.transformer("x_scaler")
+        warm = time.perf_counter() - start
+
+        x, y = dataset.__getitems__(list(range(len(dataset))))
+        assert torch.equal(x, x_slide) and torch.equal(y, y_slide)
+        assert isinstance(store.array("x_train"), np.memmap)
+        print(f"windows identical to the csv pipeline ({len(dataset)} train windows, {store.n_features} features)")
+        print(f"csv + featurize: {from_csv * 1e3:8.1f} ms | store build: {cold * 1e3:8.1f} ms "
+              f"| cached open: {warm * 1e3:6.1f} ms")
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,111 @@
+import os
+import sys
+import glob
+import time
+import numpy as np
+import pandas as pd
+from ta.momentum import RSIIndicator, StochasticOscillator
+from ta.trend import MACD, AroonIndicator, ADXIndicator
+from ta.volatility import BollingerBands
+from ta.volume import OnBalanceVolumeIndicator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from features import FEATURE_COLUMNS, compute_features, compute_features_grouped
+
+"""
+parity check of features.py against the ta library + microbenchmark
+python3 benchmarks/bench_features.py
+"""
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "1yr")
+
+
+# the per-indicator ta pipeline the collection/serving code used before features.py
+def ta_features(df):
+    df = df.copy()
+    for w in (7, 14, 21):
+        df[f"RSI_{w}"] = RSIIndicator(close=df["Close"], window=w).rsi()
+    macd_ind = MACD(close=df["Close"], window_slow=26, window_fast=12, window_sign=9)
+    df["MACD"] = macd_ind.macd()
+    df["MACD_Signal"] = macd_ind.macd_signal()
+    for w in (7, 14, 21):
+        bb = BollingerBands(close=df["Close"], window=w, window_dev=2)
+        df[f"BB_High_{w}"] = bb.bollinger_hband()
+        df[f"BB_Low_{w}"] = bb.bollinger_lband()
+        df[f"BB_Width_{w}"] = df[f"BB_High_{w}"] - df[f"BB_Low_{w}"]
+    for w in (7, 14, 21):
+        aroon = AroonIndicator(high=df["High"], low=df["Low"], window=w)
+        df[f"Aroon_{w}"] = aroon.aroon_indicator()
+        df[f"Aroon_Up_{w}"] = aroon.aroon_up()
+        df[f"Aroon_Down_{w}"] = aroon.aroon_down()
+    for w in (7, 14, 21):
+        adx = ADXIndicator(high=df["High"], low=df["Low"], close=df["Close"], window=w)
+        df[f"ADX_{w}"] = adx.adx()
+        df[f"ADX_neg_{w}"] = adx.adx_neg()
+        df[f"ADX_pos_{w}"] = adx.adx_pos()
+    df["OBV"] = OnBalanceVolumeIndicator(close=df["Close"], volume=df["Volume"]).on_balance_volume()
+    for w in (7, 14, 21):
+        stoch = StochasticOscillator(high=df["High"], low=df["Low"], close=df["Close"], window=w)
+        df[f"Stoch_{w}"] = stoch.stoch()
+        df[f"Stoch_Signal_{w}"] = stoch.stoch_signal()
+    return df
+
+
+def synthetic_ohlcv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        "Open": close + rng.normal(0, 0.5, n),
+        "High": close + np.abs(rng.normal(0, 1, n)),
+        "Low": close - np.abs(rng.normal(0, 1, n)),
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 30_000_000, n).astype(float),
+    })
+
+
+def check_parity(df, label):
+    expected = ta_features(df)[FEATURE_COLUMNS].to_numpy()
+    actual = compute_features(df)[FEATURE_COLUMNS].to_numpy()
+    same_nan = np.isnan(expected) == np.isnan(actual)
+    assert same_nan.all(), f"{label}: nan mismatch in {np.array(FEATURE_COLUMNS)[~same_nan.all(axis=0)]}"
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-7, equal_nan=True, err_msg=label)
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    n_checked = 0
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.csv"))):
+        raw = pd.read_csv(path, usecols=["date", "Open", "High", "Low", "Close", "Volume", "ticker"])
+        for ticker, ticker_df in raw.groupby("ticker"):
+            check_parity(ticker_df.reset_index(drop=True), f"{os.path.basename(path)}:{ticker}")
+            n_checked += 1
+    for n in (60, 100, 1000, 5000):
+        check_parity(synthetic_ohlcv(n, seed=n), f"synthetic n={n}")
+        n_checked += 1
+
+    panel = pd.concat([synthetic_ohlcv(250, seed=i).assign(ticker=f"T{i}") for i in range(8)], ignore_index=True)
+    grouped = compute_features_grouped(panel)
+    for ticker, ticker_df in panel.groupby("ticker"):
+        expected = compute_features(ticker_df)[FEATURE_COLUMNS].to_numpy()
+        np.testing.assert_allclose(grouped.loc[ticker_df.index, FEATURE_COLUMNS].to_numpy(), expected,
+                                   rtol=1e-12, equal_nan=True)
+    print(f"parity ok: {n_checked} series match ta, grouped panel matches per-ticker")
+
+    one_k = synthetic_ohlcv(1000)
+    t_ta = timed(lambda: ta_features(one_k))
+    t_np = timed(lambda: compute_features(one_k))
+    print(f"1k rows, 1 ticker:    ta {t_ta * 1e3:8.1f} ms | features {t_np * 1e3:7.1f} ms | {t_ta / t_np:5.1f}x")
+
+    universe = pd.concat([synthetic_ohlcv(250, seed=i).assign(ticker=f"T{i:03d}") for i in range(100)],
+                         ignore_index=True)
+    t_ta = timed(lambda: [ta_features(g) for _, g in universe.groupby("ticker")], repeat=1)
+    t_np = timed(lambda: compute_features_grouped(universe), repeat=3)
+    print(f"100 tickers x 250 rows: ta {t_ta * 1e3:8.1f} ms | features {t_np * 1e3:7.1f} ms | {t_ta / t_np:5.1f}x")
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import time
+import threading
+import io
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from data_collection import get_historical, RateLimiter
+
+"""
+wall-clock benchmark for get_historical against a local stand-in for the price API
+python3 benchmarks/bench_fetch.py [latency_sec]
+"""
+
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.25
+N_BARS = 252
+MAX_BARS = 5000
+
+# serves a year of synthetic daily OHLCV per ticker after a fixed delay
+class PriceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        url = urlparse(self.path)
+        ticker = url.path.rsplit("/", 1)[-1]
+        start = parse_qs(url.query).get("start", [None])[0]
+        body = json.dumps(synthetic_history(ticker, N_BARS, start).to_dict(orient="list"), default=int).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# deterministic per-ticker random walk (prefix-stable across n_bars), optionally only the bars from start onwards
+def synthetic_history(ticker, n_bars, start=None):
+    rng = np.random.default_rng(sum(map(ord, ticker)))
+    noise = rng.normal(0, 1, (4, MAX_BARS))[:, :n_bars]
+    close = 100 + np.cumsum(noise[0])
+    df = pd.DataFrame({
+        "Date": pd.bdate_range("2024-01-01", periods=n_bars, tz="America/New_York").astype(str),
+        "Open": close + 0.5 * noise[1],
+        "High": close + np.abs(noise[2]),
+        "Low": close - np.abs(noise[3]),
+        "Close": close,
+        "Volume": rng.integers(1e6, 3e7, MAX_BARS)[:n_bars],
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    })
+    if start is not None:
+        df = df[df["Date"].str[:10] >= start]
+    return df
+
+def local_history(base_url):
+    session = requests.Session()
+
+    def fetch(ticker, time_period, interval, start=None):
+        params = {"start": start} if start is not None else None
+        resp = session.get(f"{base_url}/history/{ticker}", params=params, timeout=15)
+        resp.raise_for_status()
+        df = pd.DataFrame(resp.json())
+        df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_convert("America/New_York")
+        return df.set_index("Date")
+
+    return fetch
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PriceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fetch_fn = local_history(f"http://127.0.0.1:{server.server_port}")
+
+    print(f"latency per request: {LATENCY:.2f}s")
+    print(f"{'tickers':>8} {'sequential':>12} {'concurrent':>12} {'speedup':>8}")
+    for n in (5, 10, 20, 35):
+        tickers = [f"T{i:03d}" for i in range(n)]
+
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            get_historical(tickers, "1y", "1d", False, "bench_fetch", max_workers=1, cpu_workers=0,
+                           fetch_fn=fetch_fn, limiter=RateLimiter(None))
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            get_historical(tickers, "1y", "1d", False, "bench_fetch", max_workers=16,
+                           fetch_fn=fetch_fn, limiter=RateLimiter(50))
+            concurrent = time.perf_counter() - start
+
+        print(f"{n:>8} {sequential:>11.2f}s {concurrent:>11.2f}s {sequential / concurrent:>7.1f}x")
+
+    server.shutdown()
+    for suffix in ("", ".index.json"):
+        os.remove(os.path.join(os.path.dirname(__file__), "..", "data", f"bench_fetch.csv{suffix}"))
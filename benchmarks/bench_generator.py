@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from models import Generator
+
+"""
+new Generator vs the previous implementation: state-dict compatibility, equal outputs (eval and seeded training),
+cpu forward (inference) and forward+backward (training) throughput at batch 1/128/1024
+python3 benchmarks/bench_generator.py [threads]
+"""
+
+INPUT_SIZE = 59
+LOOKBACK = 3
+
+
+# the Generator models.py shipped before: device probing + zero hidden states every call
+class ReferenceGenerator(nn.Module):
+    def __init__(self, input_size):
+        super().__init__()
+        self.gru_1 = nn.GRU(input_size, 1024, batch_first = True)
+        self.gru_2 = nn.GRU(1024, 512, batch_first = True)
+        self.gru_3 = nn.GRU(512, 256, batch_first = True)
+        self.linear_1 = nn.Linear(256, 128)
+        self.linear_2 = nn.Linear(128, 64)
+        self.linear_3 = nn.Linear(64, 1)
+        self.dropout = nn.Dropout(0.2)
+
+    def forward(self, x):
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        h0 = torch.zeros(1, x.size(0), 1024).to(device)
+        out_1, _ = self.gru_1(x, h0)
+        out_1 = self.dropout(out_1)
+        h1 = torch.zeros(1, x.size(0), 512).to(device)
+        out_2, _ = self.gru_2(out_1, h1)
+        out_2 = self.dropout(out_2)
+        h2 = torch.zeros(1, x.size(0), 256).to(device)
+        out_3, _ = self.gru_3(out_2, h2)
+        out_3 = self.dropout(out_3)
+        out_4 = self.linear_1(out_3[:, -1, :])
+        out_5 = self.linear_2(out_4)
+        out_6 = self.linear_3(out_5)
+        return out_6
+
+
+def per_sec(fn, batch, min_time=1.0):
+    fn()
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        fn()
+        n += 1
+    return n * batch / (time.perf_counter() - start)
+
+
+# old and new measured in alternation, median of each: single-core timings drift more than the difference
+def compare(old, new, batch, rounds=5):
+    old_rates, new_rates = [], []
+    for _ in range(rounds):
+        old_rates.append(per_sec(old, batch, 0.3))
+        new_rates.append(per_sec(new, batch, 0.3))
+    return np.median(old_rates), np.median(new_rates)
+
+
+def infer(model, x):
+    def step():
+        with torch.inference_mode():
+            model(x)
+    return step
+
+
+def train_step(model, x):
+    def step():
+        model.zero_grad(set_to_none=True)
+        model(x).sum().backward()
+    return step
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        torch.set_num_threads(int(sys.argv[1]))
+    torch.manual_seed(0)
+    reference = ReferenceGenerator(INPUT_SIZE)
+    model = Generator(INPUT_SIZE)
+    model.load_state_dict(reference.state_dict(), strict=True)
+    assert set(model.state_dict()) == set(reference.state_dict())
+
+    x = torch.randn(256, LOOKBACK, INPUT_SIZE)
+    reference.eval()
+    model.eval()
+    with torch.inference_mode():
+        torch.testing.assert_close(model(x), reference(x))
+
+    # same dropout masks in training: a seeded run draws the same RNG stream as before
+    reference.train()
+    model.train()
+    torch.manual_seed(1)
+    expected = reference(x)
+    torch.manual_seed(1)
+    torch.testing.assert_close(model(x), expected)
+    after = torch.rand(1)
+    torch.manual_seed(1)
+    reference(x)
+    assert torch.equal(torch.rand(1), after)
+    print("state dict compatible, outputs match in eval and in seeded training")
+
+    print(f"threads: {torch.get_num_threads()}")
+    print(f"{'batch':>6} {'infer old':>11} {'infer new':>11} {'speedup':>8} {'train old':>11} {'train new':>11} {'speedup':>8}")
+    for batch in (1, 128, 1024):
+        x = torch.randn(batch, LOOKBACK, INPUT_SIZE)
+        reference.eval()
+        model.eval()
+        infer_old, infer_new = compare(infer(reference, x), infer(model, x), batch)
+        reference.train()
+        model.train()
+        train_old, train_new = compare(train_step(reference, x), train_step(model, x), batch)
+        print(f"{batch:>6} {infer_old:>9.0f}/s {infer_new:>9.0f}/s {infer_new / infer_old:>7.2f}x "
+              f"{train_old:>9.0f}/s {train_new:>9.0f}/s {train_new / train_old:>7.2f}x")
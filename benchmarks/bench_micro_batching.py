@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import warnings
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from batching import MicroBatcher
+from bench_batch_inference import model_dir
+
+"""
+throughput / latency of concurrent single-window predictions, with and without the micro-batcher
+(random generator weights, the repo's financial scalers)
+python3 benchmarks/bench_micro_batching.py
+"""
+
+N_CLIENTS = 32
+REQUESTS_PER_CLIENT = 50
+
+
+def run_clients(predict, windows):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(i):
+        mine = []
+        for j in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            predict(windows[(i * REQUESTS_PER_CLIENT + j) % len(windows)])
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(N_CLIENTS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e3
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    os.environ["MODEL_DIR"] = model_dir()
+    os.environ["BATCH_MAX_WAIT_MS"] = "0"
+    import inference
+    inference.load_artifacts()
+    model = inference.registry.get("financial_1y")
+
+    rng = np.random.default_rng(0)
+    windows = model.x_scaler.inverse_transform(rng.random((256 * 3, 59))).reshape(256, 3, 59)
+
+    batcher = MicroBatcher(lambda w: model.predict_batch(np.stack(w)), max_batch_size=64, max_wait_ms=5)
+    expected = model.predict_batch(windows)
+    futures = [batcher.submit_async(w) for w in windows]
+    actual = np.stack([f.result() for f in futures])
+    np.testing.assert_allclose(actual, expected, rtol=1e-4)
+    batcher.close()
+    print("parity ok: batched results reach the right callers")
+
+    print(f"{N_CLIENTS} concurrent clients x {REQUESTS_PER_CLIENT} single-window requests")
+    throughput, p50, p99 = run_clients(lambda w: model.predict_batch(w[None])[0], windows)
+    print(f"{'unbatched':>22}: {throughput:8.0f} req/s | p50 {p50:6.2f} ms | p99 {p99:6.2f} ms")
+    for max_wait_ms in (1, 5, 20):
+        batcher = MicroBatcher(lambda w: model.predict_batch(np.stack(w)), max_batch_size=64, max_wait_ms=max_wait_ms)
+        throughput, p50, p99 = run_clients(batcher.submit, windows)
+        stats = batcher.stats()
+        batcher.close()
+        print(f"{f'batched, {max_wait_ms} ms window':>22}: {throughput:8.0f} req/s | p50 {p50:6.2f} ms | p99 {p99:6.2f} ms "
+              f"| mean batch {stats['mean_batch_size']:5.1f}")
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import warnings
+from contextlib import redirect_stdout
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_registry import model_dir
+from bench_batch_inference import ticker_rows
+
+"""
+prediction cache: repeated single-ticker and batch requests with and without a cached result
+(random generator weights, 4 sector models). also checks that a hit returns exactly what the model
+returned, that editing an old bar is a miss, that entries expire, and that a second worker sharing
+the backend (a LocalBackend standing in for redis) is served from the first worker's entries
+python3 benchmarks/bench_prediction_cache.py
+"""
+
+FINANCIAL = ("AXP", "BAC", "C", "GS", "JPM", "MS", "PNC", "WFC")
+
+
+def timed(client, path, payload, n=20):
+    start = time.perf_counter()
+    for _ in range(n):
+        response = client.post(path, json=payload)
+        assert response.status_code == 200, response.get_json()
+    return (time.perf_counter() - start) / n * 1e3, response.get_json()
+
+
+def main():
+    os.environ["MODEL_DIR"] = model_dir()
+    os.environ["PRELOAD"] = "sync"
+    os.environ["BATCH_MAX_WAIT_MS"] = "0"
+    import inference
+    from cache import PredictionCache, LocalBackend
+
+    client = inference.app.test_client()
+    model = inference.registry.get("financial_1y")
+    forwards = []
+    predict_batch = model.predict_batch
+    model.predict_batch = lambda windows: forwards.append(len(windows)) or predict_batch(windows)
+
+    rows = ticker_rows("JPM", 100, 0)
+    batch = {"batch": [row for i, ticker in enumerate(FINANCIAL) for row in ticker_rows(ticker, 100, i)],
+             "as_of": [rows[i]["Date"] for i in (-1, -2, -5, -10, -20)]}
+
+    inference.prediction_cache = None
+    uncached_single, expected_single = timed(client, "/invocations", rows)
+    uncached_batch, expected_batch = timed(client, "/invocations", batch, 5)
+
+    inference.prediction_cache = PredictionCache(LocalBackend(), ttl=900)
+    client.post("/invocations", json=rows)
+    client.post("/invocations", json=batch)
+    calls = len(forwards)
+    hit_single, actual_single = timed(client, "/invocations", rows)
+    hit_batch, actual_batch = timed(client, "/invocations", batch, 5)
+    assert len(forwards) == calls, "a cache hit ran the model"
+    assert actual_single == expected_single and actual_batch == expected_batch
+    print("parity ok: hits return the model's predictions and never run the model", file=sys.stderr)
+
+    # an edit far outside the lookback window still changes the recursive indicators -> must be a miss
+    edited = [dict(row) for row in rows]
+    edited[0]["Close"] *= 1.05
+    assert client.post("/invocations", json=edited).get_json() != expected_single
+    print("an edited old bar is a miss with a different prediction", file=sys.stderr)
+
+    # worker 2 with its own PredictionCache over the same backend
+    shared = inference.prediction_cache.backend
+    inference.prediction_cache = PredictionCache(shared, ttl=900)
+    client.post("/invocations", json=rows)
+    assert inference.prediction_cache.hits == 1
+    inference.prediction_cache = PredictionCache(LocalBackend(), ttl=0.05)
+    client.post("/invocations", json=rows)
+    time.sleep(0.1)
+    client.post("/invocations", json=rows)
+    assert inference.prediction_cache.hits == 0 and inference.prediction_cache.misses == 2
+    print("shared backend serves a second worker; entries expire after the ttl", file=sys.stderr)
+
+    print(f"single ticker, 100 bars: {uncached_single:7.2f} ms uncached | {hit_single:6.2f} ms cached", file=sys.stderr)
+    print(f"batch, 8 tickers x 5 as_of: {uncached_batch:7.2f} ms uncached | {hit_batch:6.2f} ms cached", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    # keeps the server's stdout (startup breakdown) out of the results
+    with redirect_stdout(open(os.devnull, "w")):
+        main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import warnings
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from models import Generator
+from features import compute_features
+from bench_batch_inference import ARTIFACTS, ticker_rows
+
+"""
+one container serving all four sector models: routing, lazy loads and LRU eviction under a budget
+(random generator weights, the repo's scalers/encoders; the energy/financial and industrial/tech
+encoders share tickers, so those requests are routed by sector)
+python3 benchmarks/bench_registry.py
+"""
+
+SECTORS = ("energy", "financial", "industrial", "tech")
+
+
+def model_dir():
+    path = tempfile.mkdtemp()
+    os.makedirs(os.path.join(path, "scalers"))
+    os.makedirs(os.path.join(path, "encoders"))
+    for seed, sector in enumerate(SECTORS):
+        torch.manual_seed(seed)
+        torch.save(Generator(59 if sector in ("energy", "financial") else 55).state_dict(),
+                   os.path.join(path, f"{sector}_1y_generator.pth"))
+        for kind, name in (("scalers", "x_scaler"), ("scalers", "y_scaler"), ("encoders", "one_hot_encoder")):
+            shutil.copy(os.path.join(ARTIFACTS, kind, f"{sector}_1y_{name}.pkl"), os.path.join(path, kind))
+    return path
+
+
+def main():
+    os.environ["MODEL_DIR"] = model_dir()
+    os.environ["PRELOAD"] = "0"
+    os.environ["PREDICTION_CACHE"] = "off"
+    import inference
+    from registry import ModelRegistry
+
+    inference.load_artifacts()
+    per_model_mb = inference.registry.get("financial_1y").nbytes / 2**20
+    # room for two resident models
+    inference.registry = ModelRegistry(os.environ["MODEL_DIR"], memory_budget_mb=2.5 * per_model_mb,
+                                       default_model="financial_1y", batch_max_wait_ms=0)
+    registry = inference.registry
+    client = inference.app.test_client()
+    print(f"discovered {sorted(registry.manifests)}, {per_model_mb:.1f} MB each, budget {2.5 * per_model_mb:.1f} MB",
+          file=sys.stderr)
+
+    payloads = {sector: ticker_rows(registry.manifests[f"{sector}_1y"]["tickers"][0], 60, seed)
+                for seed, sector in enumerate(SECTORS)}
+    for sector, rows in payloads.items():
+        response = client.post(f"/invocations?sector={sector}", json=rows)
+        assert response.status_code == 200, response.get_json()
+        # the routed model scores it exactly like that sector's model used on its own
+        model = registry.get(f"{sector}_1y")
+        window = model.build_model_input(compute_features(pd.DataFrame(rows))).tail(3).values
+        np.testing.assert_allclose(response.get_json(), model.predict_batch(window[None])[0], rtol=1e-6)
+    assert client.post("/invocations", json=payloads["energy"]).status_code == 200   # AXP -> DEFAULT_MODEL
+    ambiguous = client.post("/invocations", json=payloads["tech"])                   # BA: industrial or tech
+    assert ambiguous.status_code == 400, ambiguous.get_json()
+    print("routing ok: by sector, by ticker with a default model, 400 when ambiguous", file=sys.stderr)
+
+    stats = registry.stats()
+    assert len(stats["resident"]) == 2 and stats["resident_mb"] <= stats["memory_budget_mb"], stats
+    print(f"resident {stats['resident']} ({stats['resident_mb']:.1f} MB), evictions {stats['evictions']}",
+          file=sys.stderr)
+
+    def timed(sector, n=20):
+        start = time.perf_counter()
+        for _ in range(n):
+            client.post(f"/invocations?sector={sector}", json=payloads[sector])
+        return (time.perf_counter() - start) / n * 1e3
+
+    hot = timed("financial")
+    cold = np.mean([timed(sector, 1) for sector in ("energy", "industrial", "tech", "energy")])
+    print(f"request on a resident model: {hot:6.1f} ms | request that loads (and evicts) a model: {cold:6.1f} ms",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    # keeps the server's stdout (startup breakdown) out of the results
+    with redirect_stdout(open(os.devnull, "w")):
+        main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from features import FEATURE_COLUMNS, IndicatorState, compute_features
+from bench_features import synthetic_ohlcv
+
+"""
+parity of the streaming IndicatorState against the batch engine + per-bar cost
+python3 benchmarks/bench_streaming.py
+"""
+
+if __name__ == "__main__":
+    for n in (30, 100, 1000):
+        df = synthetic_ohlcv(n, seed=n)
+        expected = compute_features(df)[FEATURE_COLUMNS].to_numpy()
+        state, rows = IndicatorState(), []
+        for i, bar in enumerate(df.to_dict(orient="records")):
+            if i % 17 == 0:
+                # round-trip through json like a client holding the state between requests
+                state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+            row = state.update(bar)
+            rows.append([row[c] for c in FEATURE_COLUMNS])
+        np.testing.assert_allclose(np.array(rows), expected, rtol=1e-9, atol=1e-7, equal_nan=True,
+                                   err_msg=f"n={n}")
+    print("parity ok: streaming matches batch (with json round-trips)")
+
+    history = synthetic_ohlcv(101)
+    bars = history.to_dict(orient="records")
+    state = IndicatorState.from_frame(history.iloc[:100])
+    payload = json.dumps(state.to_dict())
+
+    n_iter = 200
+    start = time.perf_counter()
+    for _ in range(n_iter):
+        compute_features(history)
+    batch = (time.perf_counter() - start) / n_iter
+
+    start = time.perf_counter()
+    for _ in range(n_iter):
+        s = IndicatorState.from_dict(json.loads(payload))
+        s.update(bars[-1])
+        json.dumps(s.to_dict())
+    streaming = (time.perf_counter() - start) / n_iter
+
+    start = time.perf_counter()
+    for _ in range(n_iter):
+        state.update(bars[-1])
+    update_only = (time.perf_counter() - start) / n_iter
+
+    print(f"recompute 101 bars: {batch * 1e3:6.2f} ms | load state + 1 bar + dump: {streaming * 1e3:6.2f} ms "
+          f"| update alone: {update_only * 1e3:6.3f} ms "
+          f"| state {len(payload)} bytes vs {len(history.to_json(orient='records'))} bytes of history")
@@ -0,0 +1,69 @@
+import os
+import sys
+import io
+import time
+import copy
+from contextlib import redirect_stdout
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from models import Generator, Discriminator
+from training import Trainer, FAKE_MODES
+
+"""
+critic fake modes: "no_grad" must leave training bit-for-bit identical to "graph"; steps/s for each mode
+python3 benchmarks/bench_trainer.py [n_batches] [batch_size]
+"""
+
+N_BATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+BATCH_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+N_FEATURES = 59
+LOOKBACK = 3
+
+
+def synthetic_loader(n_batches, batch_size):
+    g = torch.Generator().manual_seed(0)
+    x = torch.rand(n_batches * batch_size, LOOKBACK, N_FEATURES, generator=g)
+    y = torch.rand(n_batches * batch_size, LOOKBACK + 1, 1, generator=g)
+    return DataLoader(TensorDataset(x, y), batch_size=batch_size, shuffle=False)
+
+
+def make_trainer(models, fake_mode):
+    generator, discriminator = copy.deepcopy(models)
+    optim_g = torch.optim.Adam(generator.parameters(), lr=1e-4, betas=[0.5, 0.9])
+    optim_d = torch.optim.Adam(discriminator.parameters(), lr=1e-4, betas=[0.5, 0.9])
+    return Trainer(generator, discriminator, optim_g, optim_d, lambda_weight=10, critic_iterations=5,
+                   device=torch.device("cpu"), fake_mode=fake_mode)
+
+
+def run(trainer, loader, seed=0):
+    torch.manual_seed(seed)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        trainer.train(loader, epochs=1, lookback=LOOKBACK, output_dim=1, device=torch.device("cpu"))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    models = (Generator(N_FEATURES), Discriminator())
+
+    loader = synthetic_loader(2, 32)
+    graph, no_grad = make_trainer(models, "graph"), make_trainer(models, "no_grad")
+    run(graph, loader)
+    run(no_grad, loader)
+    for a, b in zip(list(graph.generator.parameters()) + list(graph.discriminator.parameters()),
+                    list(no_grad.generator.parameters()) + list(no_grad.discriminator.parameters())):
+        assert torch.equal(a, b)
+    assert graph.losses == no_grad.losses
+    print("no_grad: weights and losses identical to graph after 2 batches")
+
+    loader = synthetic_loader(N_BATCHES, BATCH_SIZE)
+    print(f"{N_BATCHES} batches of {BATCH_SIZE}, {torch.get_num_threads()} threads")
+    baseline = None
+    for mode in ("graph",) + tuple(m for m in FAKE_MODES if m != "graph"):
+        elapsed = run(make_trainer(models, mode), loader)
+        steps = N_BATCHES / elapsed
+        baseline = baseline or steps
+        print(f"{mode:>8}: {steps:6.2f} steps/s ({steps / baseline:.2f}x)")
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from preprocessing import WindowDataset, TickerBatchSampler, build_windows_per_ticker
+from bench_windows import universe
+
+"""
+WindowDataset vs the materialized TensorDataset: same batches, one epoch of loading, resident bytes
+python3 benchmarks/bench_window_dataset.py
+"""
+
+
+def epoch_time(loader):
+    start = time.perf_counter()
+    n = 0
+    for x, y in loader:
+        n += len(x)
+    return time.perf_counter() - start, n
+
+
+if __name__ == "__main__":
+    x, y, tickers = universe(50, 252)
+    window, batch_size = 3, 128
+
+    x_slide, _, y_slide = build_windows_per_ticker(x, y, window, tickers)
+    dataset = WindowDataset(x, y, window, tickers)
+    eager = DataLoader(TensorDataset(x_slide, y_slide), batch_size=batch_size, shuffle=False)
+    lazy = DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=WindowDataset.collate,
+                      num_workers=2, pin_memory=torch.cuda.is_available())
+    for (xe, ye), (xl, yl) in zip(eager, lazy, strict=True):
+        assert torch.equal(xe, xl) and torch.equal(ye, yl)
+    print("sequential batches identical to TensorDataset (2 workers)")
+
+    sampler = TickerBatchSampler(dataset, batch_size, shuffle=True)
+    ticker_of = np.repeat(np.arange(len(dataset.ticker_ranges) - 1), np.diff(dataset.ticker_ranges))
+    seen = []
+    for epoch in range(2):
+        sampler.set_epoch(epoch)
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        assert all(len(set(ticker_of[b])) == 1 for b in batches)
+        assert sorted(i for b in batches for i in b) == list(range(len(dataset)))
+        seen.append(batches)
+    assert seen[0] != seen[1]
+    print("shuffled epochs cover every window once, no batch mixes tickers")
+
+    print(f"{'tickers':>8} {'lookback':>9} {'tensor ds':>10} {'lazy':>8} {'lazy x2w':>9} {'eager MB':>9} {'lazy MB':>8}")
+    for n_tickers, window in ((50, 3), (200, 20), (500, 60)):
+        x, y, tickers = universe(n_tickers, 252)
+        x_slide, _, y_slide = build_windows_per_ticker(x, y, window, tickers)
+        dataset = WindowDataset(x, y, window, tickers)
+        eager_time, _ = epoch_time(DataLoader(TensorDataset(x_slide, y_slide), batch_size=batch_size, shuffle=True))
+        lazy_loader = DataLoader(dataset, batch_sampler=TickerBatchSampler(dataset, batch_size),
+                                 collate_fn=WindowDataset.collate)
+        lazy_time, _ = epoch_time(lazy_loader)
+        workers_time, _ = epoch_time(DataLoader(dataset, batch_sampler=TickerBatchSampler(dataset, batch_size),
+                                                collate_fn=WindowDataset.collate, num_workers=2))
+        eager_mb = (x_slide.nbytes + y_slide.nbytes) / 2**20
+        lazy_mb = (dataset.x.nbytes + dataset.y.nbytes + dataset.starts.nbytes) / 2**20
+        print(f"{n_tickers:>8} {window:>9} {eager_time:>9.2f}s {lazy_time:>7.2f}s {workers_time:>8.2f}s "
+              f"{eager_mb:>9.1f} {lazy_mb:>8.1f}")
+        del x_slide, y_slide
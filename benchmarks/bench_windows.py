@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from preprocessing import build_windows_per_ticker
+
+"""
+equivalence of the vectorized window builder with the loop version it replaced + timings/storage
+python3 benchmarks/bench_windows.py
+"""
+
+
+# the loop implementation preprocessing.py used before
+def loop_sliding_window(x, y, window):
+    x_, y_, y_gan = [], [], []
+    for i in range(window, x.shape[0]):
+        x_.append(x[i - window: i, :])
+        y_.append(y[i])
+        y_gan.append(y[i - window: i + 1])
+    return (torch.from_numpy(np.array(x_)).float(), torch.from_numpy(np.array(y_)).float(),
+            torch.from_numpy(np.array(y_gan)).float())
+
+
+def loop_build_windows_per_ticker(x, y, window, tickers):
+    x_, y_, y_gan_ = [], [], []
+    df_x, df_y = pd.DataFrame(x), pd.DataFrame(y)
+    df_ticker = pd.Series(tickers)
+    for _, index_mask in df_ticker.groupby(df_ticker).groups.items():
+        x_ticker = df_x.iloc[index_mask].values
+        y_ticker = df_y.iloc[index_mask].values
+        if len(x_ticker) > window:
+            x_w, y_w, y_gan_w = loop_sliding_window(x_ticker, y_ticker, window)
+            x_.append(x_w)
+            y_.append(y_w)
+            y_gan_.append(y_gan_w)
+    return torch.cat(x_, dim=0), torch.cat(y_, dim=0), torch.cat(y_gan_, dim=0)
+
+
+def universe(n_tickers, n_rows, n_features=59, seed=0):
+    rng = np.random.default_rng(seed)
+    tickers = np.repeat([f"T{i:03d}" for i in range(n_tickers)], n_rows)
+    # interleave a little so grouping actually has to reorder rows
+    perm = np.arange(len(tickers))
+    rng.shuffle(perm[: len(perm) // 10])
+    x = rng.random((len(tickers), n_features))[perm]
+    y = rng.random((len(tickers), 1))[perm]
+    return x, y, tickers[perm]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def storage_mb(tensors):
+    storages = {t.untyped_storage().data_ptr(): t.untyped_storage().nbytes() for t in tensors}
+    return sum(storages.values()) / 2**20
+
+
+if __name__ == "__main__":
+    x, y, tickers = universe(20, 252)
+    for window in (1, 3, 10):
+        expected = loop_build_windows_per_ticker(x, y, window, tickers)
+        actual = build_windows_per_ticker(x, y, window, tickers)
+        for e, a in zip(expected, actual):
+            assert e.shape == a.shape and torch.equal(e, a), f"window={window}"
+        single = build_windows_per_ticker(x[:300], y[:300], window, np.zeros(300))
+        for e, a in zip(loop_sliding_window(x[:300], y[:300], window), single):
+            assert torch.equal(e, a)
+    print("equivalence ok")
+
+    print(f"{'tickers':>8} {'lookback':>9} {'loop':>9} {'vectorized':>11} {'speedup':>8}")
+    for n_tickers, window in ((20, 3), (100, 3), (100, 20), (500, 20)):
+        x, y, tickers = universe(n_tickers, 252)
+        _, loop_time = timed(loop_build_windows_per_ticker, x, y, window, tickers)
+        _, vec_time = timed(build_windows_per_ticker, x, y, window, tickers)
+        print(f"{n_tickers:>8} {window:>9} {loop_time:>8.3f}s {vec_time:>10.3f}s {loop_time / vec_time:>7.1f}x")
+
+    # one ticker's windows are views: storage stays at the size of the buffer whatever the lookback
+    x, y, _ = universe(1, 5000)
+    for window in (3, 20, 60):
+        views = build_windows_per_ticker(x, y, window, np.zeros(len(x)))
+        copies = loop_build_windows_per_ticker(x, y, window, np.zeros(len(x)))
+        print(f"lookback {window:>3}: views {storage_mb(views):6.1f}MB vs copies {storage_mb(copies):6.1f}MB")
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import warnings
+import threading
+import subprocess
+import http.client
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_registry import model_dir
+from bench_batch_inference import ticker_rows
+
+"""
+load test of the gunicorn server (gunicorn.conf.py): requests/sec and latency against the worker count,
+plus how much of the workers' memory is shared with the master (random generator weights, 4 sector models)
+
+every configuration starts a fresh `gunicorn --config gunicorn.conf.py wsgi:app` on a free port, waits
+for /ping, then runs --clients concurrent clients posting 60-row single-ticker payloads for --duration s
+python3 benchmarks/load_test.py --workers 1 2 4 --mode processes threads
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(directory, port, workers, mode):
+    env = dict(os.environ, MODEL_DIR=directory, PORT=str(port), SERVER_WORKERS=str(workers), SERVER_MODE=mode,
+               PREDICTION_CACHE="off")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "wsgi:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {server.returncode}")
+        try:
+            if request(port, "GET", "/ping")[0] == 200 and len(children(server.pid)) == workers:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise TimeoutError("server did not become healthy")
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def children(pid):
+    path = f"/proc/{pid}/task/{pid}/children"
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [int(p) for p in f.read().split()]
+
+
+# Rss counts shared pages in full for every process, Pss splits them between the processes sharing them
+def memory_mb(pids):
+    total = {"Rss": 0, "Pss": 0}
+    for pid in pids:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in total:
+                    total[key] += int(value.split()[0])
+    return {key: value / 1024 for key, value in total.items()}
+
+
+def run_clients(port, body, clients, duration):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client():
+        mine, failed = [], 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            status, _ = request(port, "POST", "/invocations?sector=financial", body)
+            if status == 200:
+                mine.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e3
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99), sum(errors)
+
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--mode", nargs="+", default=["processes"], choices=["processes", "threads"])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--model-dir", default=None, help="serve these models instead of random-weight ones")
+    args = parser.parse_args()
+
+    directory = args.model_dir or model_dir()
+    body = json.dumps(ticker_rows("JPM", 60, 0))
+    print(f"{len(os.sched_getaffinity(0))} cores, {args.clients} clients, {args.duration:.0f} s per configuration")
+    for mode in args.mode:
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(directory, port, workers, mode)
+            try:
+                request(port, "POST", "/invocations?sector=financial", body)
+                throughput, p50, p99, errors = run_clients(port, body, args.clients, args.duration)
+                memory = memory_mb([server.pid] + children(server.pid))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{mode:>9} x {workers}: {throughput:7.1f} req/s | p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | "
+                  f"errors {errors} | memory Rss {memory['Rss']:6.0f} MB, Pss {memory['Pss']:6.0f} MB")
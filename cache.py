@@ -0,0 +1,146 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+"""
+prediction cache: the generator runs in eval mode, so a model version scoring the same bars always gives
+the same prediction. repeated requests (dashboards refreshing, clients resending their 100-day history)
+are answered from here without featurization or a forward pass
+
+key: model name + model version (registry.model_version) + ticker + digest of every bar up to the scored
+one. the whole submitted history goes into the digest, not just the lookback window: EMA (RSI, MACD),
+ADX and OBV are recursive, so an older bar changes the indicators of the window too
+
+backends share get(key) / set(key, value, ttl) / clear():
+    LocalBackend   in-process LRU + TTL (default; also the stand-in for a shared backend in tests)
+    RedisBackend   shared by every worker/instance, TTL enforced by redis (needs the redis package)
+
+    PREDICTION_CACHE        "local" (default), "off", or a redis:// URL
+    PREDICTION_CACHE_TTL    seconds an entry lives, default 900
+    PREDICTION_CACHE_SIZE   entries kept by the local backend, default 10000
+"""
+
+# the request columns the model input is built from (indicators, base columns, date encodings)
+BAR_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+
+# one 64-bit hash per bar, vectorized; a digest over a prefix of these identifies that history
+def bar_hashes(df):
+    return pd.util.hash_pandas_object(df[[c for c in BAR_COLUMNS if c in df.columns]], index=False).values
+
+
+def history_digest(hashes):
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+class LocalBackend():
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend():
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        for key in self.client.scan_iter("prediction:*"):
+            self.client.delete(key)
+
+
+# a failing backend (shared cache unreachable) counts as a miss and never fails the request
+class PredictionCache():
+    def __init__(self, backend, ttl=900):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.errors = 0
+
+    @staticmethod
+    def key(model, version, ticker, digest):
+        return f"prediction:{model}:{version}:{ticker}:{digest}"
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            value = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "backend": type(self.backend).__name__,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+        if isinstance(self.backend, LocalBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+# PREDICTION_CACHE setting -> PredictionCache, or None when caching is off
+def from_setting(setting, ttl=900, max_entries=10_000):
+    if setting == "off":
+        return None
+    if setting == "local":
+        return PredictionCache(LocalBackend(max_entries), ttl)
+    if setting.startswith(("redis://", "rediss://", "unix://")):
+        return PredictionCache(RedisBackend(setting), ttl)
+    raise ValueError(f"PREDICTION_CACHE must be local, off or a redis:// URL, got {setting!r}")
@@ -0,0 +1,174 @@
+import os
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+
+"""
+periodic, asynchronous training checkpoints
+
+<directory>/
+    epoch-0007.pt       generator, discriminator, both optimizers, num_steps, epoch, rng states, metrics,
+                        early-stopping state (best val score/epoch/generator weights)
+    checkpoints.json    manifest: [{"epoch", "step", "file", "score"}, ...] oldest first
+
+the training thread only copies the state to cpu; serialization and the fsync'd write happen on a
+background thread (one save in flight at a time). retention keeps the newest `keep_last` checkpoints
+plus the `keep_best` lowest-scoring ones (score = validation loss, lower is better)
+"""
+
+def _to_cpu(obj):
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+
+def rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+class CheckpointManager():
+    def __init__(self, directory, every=1, keep_last=3, keep_best=1, async_save=True):
+        self.directory = directory
+        self.every = every
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.manifest_path = os.path.join(directory, "checkpoints.json")
+        self._executor = ThreadPoolExecutor(max_workers=1) if async_save else None
+        self._pending = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._read_manifest()
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def snapshot(self, trainer, epoch):
+        return _to_cpu({
+            "epoch": epoch,
+            "num_steps": trainer.num_steps,
+            "generator": trainer.generator.state_dict(),
+            "discriminator": trainer.discriminator.state_dict(),
+            "optim_g": trainer.optim_g.state_dict(),
+            "optim_d": trainer.optim_d.state_dict(),
+            "metrics": trainer.metrics.state_dict(),
+            "rng": rng_state(),
+            "early_stopping": {
+                "best_score": trainer.best_score,
+                "best_epoch": trainer.best_epoch,
+                "best_state": trainer.best_state,
+                "bad_evals": trainer.bad_evals,
+            },
+        })
+
+    # called by Trainer.train after every epoch; saves every `every` epochs and on the last one
+    def maybe_save(self, trainer, epoch, last=False, score=None):
+        if (epoch + 1) % self.every == 0 or last:
+            self.save(trainer, epoch, score)
+
+    def save(self, trainer, epoch, score=None):
+        state = self.snapshot(trainer, epoch)
+        entry = {"epoch": epoch, "step": trainer.num_steps, "file": f"epoch-{epoch:04d}.pt", "score": score}
+        self.wait()
+        if self._executor is None:
+            self._write(state, entry)
+        else:
+            self._pending = self._executor.submit(self._write, state, entry)
+
+    def _write(self, state, entry):
+        path = os.path.join(self.directory, entry["file"])
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        with self._lock:
+            self.entries = [e for e in self.entries if e["file"] != entry["file"]] + [entry]
+            self._prune()
+            self._write_manifest()
+
+    def _prune(self):
+        keep = {e["file"] for e in self.entries[-self.keep_last:]} if self.keep_last else set()
+        scored = [e for e in self.entries if e["score"] is not None]
+        keep |= {e["file"] for e in sorted(scored, key=lambda e: e["score"])[:self.keep_best]}
+        for e in self.entries:
+            if e["file"] not in keep:
+                path = os.path.join(self.directory, e["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+        self.entries = [e for e in self.entries if e["file"] in keep]
+
+    # blocks until the in-flight save (if any) is on disk; re-raises its error
+    def wait(self):
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def close(self):
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    # the saver thread replaces and prunes self.entries, so readers take the lock too
+    def latest(self):
+        with self._lock:
+            return os.path.join(self.directory, self.entries[-1]["file"]) if self.entries else None
+
+    def best(self):
+        with self._lock:
+            scored = [e for e in self.entries if e["score"] is not None]
+        if not scored:
+            return None
+        return os.path.join(self.directory, min(scored, key=lambda e: e["score"])["file"])
+
+    # restores everything into `trainer` and returns the epoch training should continue from
+    def restore(self, trainer, path=None):
+        path = path or self.latest()
+        if path is None:
+            return 0
+        # load_state_dict moves weights and optimizer state onto the trainer's device
+        state = torch.load(path, map_location="cpu", weights_only=False)
+        trainer.generator.load_state_dict(state["generator"])
+        trainer.discriminator.load_state_dict(state["discriminator"])
+        trainer.optim_g.load_state_dict(state["optim_g"])
+        trainer.optim_d.load_state_dict(state["optim_d"])
+        trainer.num_steps = state["num_steps"]
+        trainer.metrics.load_state_dict(state["metrics"])
+        set_rng_state(state["rng"])
+        for key, value in state.get("early_stopping", {}).items():
+            setattr(trainer, key, value)
+        print(f"Resumed from {path} (epoch {state['epoch'] + 1}, step {state['num_steps']})")
+        return state["epoch"] + 1
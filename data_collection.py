@@ -5,13 +5,15 @@ from bs4 import BeautifulSoup
 import requests
 import os
 from datetime import datetime, timedelta, timezone
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.trend import MACD, AroonIndicator, ADXIndicator
-from ta.volatility import BollingerBands
-from ta.volume import OnBalanceVolumeIndicator
 import yfinance as yf
 from pprint import pp
 import traceback
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from storage import DatasetWriter, append_rows, last_rows
+from features import compute_features
 
 
 """
@@ -51,141 +53,181 @@ def fetch_titles_sa(ticker: str) -> list[str]:
 """
 YF API
 """
+YF_HOST = "query2.finance.yahoo.com"
+
+# spaces out requests to the same host so concurrent fetches don't trip rate limits
+class RateLimiter():
+    def __init__(self, requests_per_sec=5.0):
+        self.min_interval = 1.0 / requests_per_sec if requests_per_sec else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# retries fn with exponential backoff + jitter, re-raises the last error
+def with_retry(fn, retries=3, backoff=0.5):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+# start (a date) overrides time_period when given, used by incremental refreshes
+def yf_history(ticker, time_period, interval, start=None):
+    if start is not None:
+        return yf.Ticker(ticker).history(start=start, interval=f"{interval}")
+    return yf.Ticker(ticker).history(period=f"{time_period}", interval=f"{interval}")
+
+# fetch raw price history for one ticker, rate limited per host and retried
+def fetch_history(ticker, time_period, interval, fetch_fn=yf_history, limiter=None, host=YF_HOST, retries=3, backoff=0.5, start=None):
+    def attempt():
+        if limiter is not None:
+            limiter.acquire(host)
+        if start is not None:
+            ticker_raw = fetch_fn(ticker, time_period, interval, start=start)
+        else:
+            ticker_raw = fetch_fn(ticker, time_period, interval)
+        if ticker_raw is None or ticker_raw.empty:
+            raise ValueError(f"No data for ticker {ticker}")
+        return ticker_raw
+
+    return with_retry(attempt, retries=retries, backoff=backoff)
+
+# fetch raw price history for all tickers on a bounded thread pool
+# returns ({ticker: raw df}, {ticker: exception}), both keyed in input order
+# starts optionally maps ticker -> first date to fetch
+def fetch_all(tickers, time_period, interval, max_workers=8, fetch_fn=yf_history, limiter=None, host=YF_HOST, retries=3, backoff=0.5, starts=None):
+    starts = starts or {}
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            ticker: pool.submit(fetch_history, ticker, time_period, interval, fetch_fn, limiter, host, retries, backoff, starts.get(ticker))
+            for ticker in tickers
+        }
+        for ticker, future in futures.items():
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = e
+    return results, errors
+
+# compute technical indicators for one ticker's raw price history
+def compute_technicals(ticker_raw, ticker):
+    ticker_df = ticker_raw.copy()
+    ticker_df = ticker_df.tz_localize(None)
+    ticker_df = ticker_df.reset_index() 
+    ticker_df = ticker_df.rename(columns={"Date": "date"})
+    ticker_df["date"] = pd.to_datetime(ticker_df["date"])
+
+    ticker_df = compute_features(ticker_df)
+
+    ticker_df.rename(columns={'index':'Date'}, inplace=True)
+    ticker_df['ticker'] = ticker
+
+    return ticker_df
+
+# fetch news sentiment for one ticker and average it per day
+def fetch_daily_sentiment(ticker, time_period):
+    news = fetch_news_data_av(ticker, time_period)
+    # print(news)
+    news_rows = []
+    for item in news.get("feed", []):
+        score = next(
+            (
+                ts.get("ticker_sentiment_score")
+                for ts in item.get("ticker_sentiment", [])
+                if ts.get("ticker") == ticker
+            ),
+            None,
+        )
+        news_rows.append(
+            {
+                "sentiment": score,
+                "date": item.get("time_published"),
+            }
+        )
+
+    # data cleaning news data
+    news_df = pd.DataFrame(news_rows)
+    news_df["sentiment"] = pd.to_numeric(news_df["sentiment"], errors="coerce")
+    news_df["date"] = pd.to_datetime(news_df["date"], format="%Y%m%dT%H%M%S", errors="coerce")
+    news_df = news_df.dropna(subset=["sentiment", "date"])
+
+    # averaging sentiment per day
+    daily_sent = (
+        news_df
+        .set_index("date")
+        .resample("D")["sentiment"]
+        .mean()
+        .reset_index()
+        .rename(columns={"sentiment": "avg_sentiment"})
+    )
+    return daily_sent
+
 # fetch historical price data from yfinance API and compute technical indicators
-def get_historical(tickers, time_period, interval, sentiment, filename):
+# downloads run concurrently (max_workers threads, rate limited per host), indicators
+# are computed on a process pool (cpu_workers, 0 computes inline)
+# on_error: "skip" drops failed tickers and keeps going, "raise" aborts the batch
+# each finished ticker is appended once via storage.DatasetWriter; an interrupted run
+# resumes from the tickers already written (resume=False starts over)
+def get_historical(tickers, time_period, interval, sentiment, filename,
+                   max_workers=8, cpu_workers=None, on_error="skip",
+                   fetch_fn=yf_history, limiter=None, retries=3, backoff=0.5,
+                   output_format="csv", resume=True):
     DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    df = pd.DataFrame()
-
-    for ticker in tickers:
+    if on_error not in ("skip", "raise"):
+        raise ValueError("on_error must be 'skip' or 'raise'")
+    if limiter is None:
+        limiter = RateLimiter()
+
+    out_name = f"{filename}.csv" if output_format == "csv" else filename
+    out_path = os.path.join(DATA_DIR, out_name)
+    writer = DatasetWriter(out_path, format=output_format, resume=resume)
+    pending = [ticker for ticker in tickers if ticker not in writer.completed]
+
+    raw, errors = fetch_all(pending, time_period, interval, max_workers=max_workers, fetch_fn=fetch_fn,
+                            limiter=limiter, retries=retries, backoff=backoff)
+
+    computed = {}
+    if cpu_workers == 0:
+        for ticker, ticker_raw in raw.items():
+            try:
+                computed[ticker] = compute_technicals(ticker_raw, ticker)
+            except Exception as e:
+                errors[ticker] = e
+    else:
+        with ProcessPoolExecutor(max_workers=cpu_workers) as pool:
+            futures = {ticker: pool.submit(compute_technicals, ticker_raw, ticker) for ticker, ticker_raw in raw.items()}
+            for ticker, future in futures.items():
+                try:
+                    computed[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = e
+
+    for ticker, e in errors.items():
+        print(f"Failed {ticker}: {e!r}")
+    if errors and on_error == "raise":
+        raise RuntimeError(f"Failed tickers: {list(errors)}")
+
+    for ticker in pending:
+        if ticker not in computed:
+            continue
         try:
-            # fetch
-            ticker_raw = yf.Ticker(ticker).history(period=f"{time_period}", interval=f"{interval}")
-            if ticker_raw.empty:
-                return "No data for ticker"
-
-            # compute technicals
-            ticker_df = ticker_raw.copy()
-            ticker_df = ticker_df.tz_localize(None)
-            ticker_df = ticker_df.reset_index() 
-            ticker_df = ticker_df.rename(columns={"Date": "date"})
-            ticker_df["date"] = pd.to_datetime(ticker_df["date"])
-
-            # rsi 
-            ticker_df['RSI_7'] = RSIIndicator(close=ticker_df['Close'], window=7).rsi()
-            ticker_df['RSI_14'] = RSIIndicator(close=ticker_df['Close'], window=14).rsi()
-            ticker_df['RSI_21'] = RSIIndicator(close=ticker_df['Close'], window=21).rsi()
-
-            # macd
-            macd_ind = MACD(close=ticker_df['Close'], window_slow=26, window_fast=12, window_sign=9)
-            ticker_df['MACD'] = macd_ind.macd()
-            ticker_df['MACD_Signal'] = macd_ind.macd_signal()
-
-            # bollinger bands
-            bb_ind_7 = BollingerBands(close=ticker_df['Close'], window=7, window_dev=2)
-            ticker_df['BB_High_7'] = bb_ind_7.bollinger_hband()
-            ticker_df['BB_Low_7'] = bb_ind_7.bollinger_lband()
-            ticker_df['BB_Width_7'] = ticker_df['BB_High_7'] - ticker_df['BB_Low_7']
-
-            bb_ind_14 = BollingerBands(close=ticker_df['Close'], window=14, window_dev=2)
-            ticker_df['BB_High_14'] = bb_ind_14.bollinger_hband()
-            ticker_df['BB_Low_14'] = bb_ind_14.bollinger_lband()
-            ticker_df['BB_Width_14'] = ticker_df['BB_High_14'] - ticker_df['BB_Low_14']
-
-            bb_ind_21 = BollingerBands(close=ticker_df['Close'], window=21, window_dev=2)
-            ticker_df['BB_High_21'] = bb_ind_21.bollinger_hband()
-            ticker_df['BB_Low_21'] = bb_ind_21.bollinger_lband()
-            ticker_df['BB_Width_21'] = ticker_df['BB_High_21'] - ticker_df['BB_Low_21']
-
-            # aroon
-            aroon_ind_7 = AroonIndicator(high=ticker_df["High"], low=ticker_df["Low"], window=7)
-            ticker_df["Aroon_7"] = aroon_ind_7.aroon_indicator()
-            ticker_df["Aroon_Up_7"] = aroon_ind_7.aroon_up()
-            ticker_df["Aroon_Down_7"] = aroon_ind_7.aroon_down()
-
-            aroon_ind_14 = AroonIndicator(high=ticker_df["High"], low=ticker_df["Low"], window=14)
-            ticker_df["Aroon_14"] = aroon_ind_14.aroon_indicator()
-            ticker_df["Aroon_Up_14"] = aroon_ind_14.aroon_up()
-            ticker_df["Aroon_Down_14"] = aroon_ind_14.aroon_down()
-
-            aroon_ind_21 = AroonIndicator(high=ticker_df["High"], low=ticker_df["Low"], window=21)
-            ticker_df["Aroon_21"] = aroon_ind_21.aroon_indicator()
-            ticker_df["Aroon_Up_21"] = aroon_ind_21.aroon_up()
-            ticker_df["Aroon_Down_21"] = aroon_ind_21.aroon_down()
-
-            # adx
-            adx_ind_7 = ADXIndicator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=7)
-            ticker_df["ADX_7"] = adx_ind_7.adx()
-            ticker_df["ADX_neg_7"] = adx_ind_7.adx_neg()
-            ticker_df["ADX_pos_7"] = adx_ind_7.adx_pos()
-
-            adx_ind_14 = ADXIndicator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=14)
-            ticker_df["ADX_14"] = adx_ind_14.adx()
-            ticker_df["ADX_neg_14"] = adx_ind_14.adx_neg()
-            ticker_df["ADX_pos_14"] = adx_ind_14.adx_pos()
-
-            adx_ind_21 = ADXIndicator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=21)
-            ticker_df["ADX_21"] = adx_ind_21.adx()
-            ticker_df["ADX_neg_21"] = adx_ind_21.adx_neg()
-            ticker_df["ADX_pos_21"] = adx_ind_21.adx_pos()
-
-            # obv
-            obv_ind = OnBalanceVolumeIndicator(close=ticker_df["Close"], volume=ticker_df["Volume"])
-            ticker_df["OBV"] = obv_ind.on_balance_volume()
-
-            # stochastic oscillator
-            stoch_osc_7 = StochasticOscillator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=7)
-            ticker_df["Stoch_7"] = stoch_osc_7.stoch()
-            ticker_df["Stoch_Signal_7"] = stoch_osc_7.stoch_signal()
-
-            stoch_osc_14 = StochasticOscillator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=14)
-            ticker_df["Stoch_14"] = stoch_osc_14.stoch()
-            ticker_df["Stoch_Signal_14"] = stoch_osc_14.stoch_signal()
-
-            stoch_osc_21 = StochasticOscillator(high=ticker_df["High"], low=ticker_df["Low"], close=ticker_df["Close"], window=21)
-            ticker_df["Stoch_21"] = stoch_osc_21.stoch()
-            ticker_df["Stoch_Signal_21"] = stoch_osc_21.stoch_signal()
-
-            ticker_df.rename(columns={'index':'Date'}, inplace=True)
-            ticker_df['ticker'] = ticker
+            ticker_df = computed[ticker]
 
             # collects sentiment data if requested
             if sentiment:
-                news = fetch_news_data_av(ticker, time_period)
-                # print(news)
-                news_rows = []
-                for item in news.get("feed", []):
-                    score = next(
-                        (
-                            ts.get("ticker_sentiment_score")
-                            for ts in item.get("ticker_sentiment", [])
-                            if ts.get("ticker") == ticker
-                        ),
-                        None,
-                    )
-                    news_rows.append(
-                        {
-                            "sentiment": score,
-                            "date": item.get("time_published"),
-                        }
-                    )
-
-                # data cleaning news data
-                news_df = pd.DataFrame(news_rows)
-                news_df["sentiment"] = pd.to_numeric(news_df["sentiment"], errors="coerce")
-                news_df["date"] = pd.to_datetime(news_df["date"], format="%Y%m%dT%H%M%S", errors="coerce")
-                news_df = news_df.dropna(subset=["sentiment", "date"])
-
-                # averaging sentiment per day
-                daily_sent = (
-                    news_df
-                    .set_index("date")
-                    .resample("D")["sentiment"]
-                    .mean()
-                    .reset_index()
-                    .rename(columns={"sentiment": "avg_sentiment"})
-                )
+                daily_sent = fetch_daily_sentiment(ticker, time_period)
 
                 # merging sentiment with price+technicals
                 ticker_df["date"] = pd.to_datetime(ticker_df["date"])
@@ -195,15 +237,97 @@ def get_historical(tickers, time_period, interval, sentiment, filename):
             print(f"\nFeature Data for {ticker}:")
             print(ticker_df.head())
 
-            df = pd.concat([df, ticker_df])
-
-            csv_filename = f"{filename}.csv"
-            csv_path = os.path.join(DATA_DIR, csv_filename)
-            df.to_csv(csv_path, index=False)
-            print(f"CSV exported to {csv_path}\n")
+            writer.append(ticker, ticker_df)
         except Exception as e:
             traceback.print_exc()
-            return None
+            if on_error == "raise":
+                raise
+
+    if not writer.completed:
+        print(f"No tickers written to {out_path}")
+        return None
+
+    writer.finalize()
+    print(f"Dataset exported to {out_path}\n")
+    return out_path
+
+
+# bars of history the slowest indicator needs before its output is usable:
+# ADX seeds on 2 * 21 bars, MACD signal on 26 + 9; the recursive (Wilder/EMA) ones
+# then need a few more windows for the seed to wash out, hence the 3x
+WARMUP_BARS = 3 * max(2 * 21, 26 + 9)
+
+# compute indicators on warmup + new bars and keep only the bars after the last stored row
+def compute_delta(ticker_raw, ticker, last_row, warmup_bars=WARMUP_BARS):
+    last_date = last_row["date"]
+    ticker_df = compute_technicals(ticker_raw, ticker)
+    n_old = int((ticker_df["date"] <= last_date).sum())
+    ticker_df = ticker_df.iloc[max(0, n_old - warmup_bars):]
+
+    if not (ticker_df["date"] > last_date).any():
+        return ticker_df.iloc[:0]
+
+    # obv is a running total from the first fetched bar, re-anchor it on the stored value. without the
+    # stored last bar in the refetch (vendor date shift, bars dropped) there is nothing to anchor on and
+    # the new rows would continue from an unrelated base, so the ticker fails instead of appending them
+    anchor = ticker_df.loc[ticker_df["date"] == last_date, "OBV"]
+    if not len(anchor):
+        raise ValueError(f"{ticker}: stored last bar {last_date:%Y-%m-%d} is missing from the refetched bars, "
+                         f"OBV cannot be re-anchored; refetch the ticker in full")
+    ticker_df["OBV"] = ticker_df["OBV"] - anchor.iloc[0] + last_row["OBV"]
+
+    ticker_df = ticker_df[ticker_df["date"] > last_date]
+    return ticker_df.dropna(how="any")
+
+# incremental refresh of a dataset written by get_historical: fetches only the bars
+# after each ticker's last stored date (plus warmup history) and appends them
+# tickers missing from the dataset are fetched over the full time_period
+# the recursive indicators are re-seeded from warmup_bars of history, so appended
+# values can differ from a full recompute in the far decimals
+# a ticker whose stored last bar is missing from the refetch fails like a fetch error
+# (skipped or raised per on_error) instead of appending OBV values it cannot anchor
+def refresh_historical(tickers, time_period, interval, filename, output_format="csv",
+                       warmup_bars=WARMUP_BARS, max_workers=8, on_error="skip",
+                       fetch_fn=yf_history, limiter=None, retries=3, backoff=0.5):
+    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+    out_name = f"{filename}.csv" if output_format == "csv" else filename
+    out_path = os.path.join(DATA_DIR, out_name)
+    if not os.path.exists(out_path):
+        return get_historical(tickers, time_period, interval, False, filename, max_workers=max_workers,
+                              on_error=on_error, fetch_fn=fetch_fn, limiter=limiter, retries=retries,
+                              backoff=backoff, output_format=output_format)
+    if limiter is None:
+        limiter = RateLimiter()
+
+    stored = last_rows(out_path)
+    # trading bars -> calendar days, with slack for holidays
+    warmup_days = int(warmup_bars * 7 / 5) + 10
+    starts = {
+        ticker: (stored[ticker]["date"] - timedelta(days=warmup_days)).strftime("%Y-%m-%d")
+        for ticker in tickers if ticker in stored
+    }
+
+    raw, errors = fetch_all(tickers, time_period, interval, max_workers=max_workers, fetch_fn=fetch_fn,
+                            limiter=limiter, retries=retries, backoff=backoff, starts=starts)
+
+    frames = {}
+    for ticker, ticker_raw in raw.items():
+        try:
+            if ticker in stored:
+                frames[ticker] = compute_delta(ticker_raw, ticker, stored[ticker], warmup_bars)
+            else:
+                frames[ticker] = compute_technicals(ticker_raw, ticker).dropna(how="any")
+        except Exception as e:
+            errors[ticker] = e
+
+    for ticker, e in errors.items():
+        print(f"Failed {ticker}: {e!r}")
+    if errors and on_error == "raise":
+        raise RuntimeError(f"Failed tickers: {list(errors)}")
+
+    n_new = append_rows(out_path, frames)
+    print(f"Appended {n_new} new rows across {sum(1 for df in frames.values() if len(df))} tickers to {out_path}")
+    return out_path
 
 
 """
@@ -268,6 +392,12 @@ tech_tickers = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSM", "AVGO",
 time_period = "1y" 
 interval = "1d" # valid intervals: [1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 4h, 1d, 5d, 1wk, 1mo, 3mo]")
 filename = "tech_stocks_1y"
-get_historical(financial_tickers, time_period, interval, False, filename)
+
+if __name__ == "__main__":
+    import sys
+    if "--refresh" in sys.argv:
+        refresh_historical(financial_tickers, time_period, interval, filename)
+    else:
+        get_historical(financial_tickers, time_period, interval, False, filename)
 
 
@@ -0,0 +1,239 @@
+import os
+import sys
+import io
+import json
+import time
+import socket
+import argparse
+import subprocess
+from contextlib import redirect_stdout
+import joblib
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+from torch.utils.data import DataLoader
+from feature_store import build_feature_store, FeatureStore
+from preprocessing import WindowDataset, TickerBatchSampler
+from models import Generator, Discriminator
+from training import Trainer
+
+"""
+data-parallel WGAN-GP training on CPU (gloo), one or several sector models at a time
+
+one sector, N ranks on this box:        python3 distributed.py --sectors tech --world-size 4
+all four sectors side by side:          python3 distributed.py --sectors energy financial industrial tech --world-size 2
+multi-node (torchrun sets RANK etc.):   torchrun --nnodes 2 --nproc-per-node 4 ... distributed.py --sectors tech
+
+every rank trains on its shard of the TickerBatchSampler batches pipeline.py and sweep.py use (same seed,
+same single-ticker batches, every world_size-th one per rank). artifacts are written as <name>_*, --name
+defaulting to <sector>_1y. gradients are averaged with one flattened
+all_reduce right before each optimizer step (the critic's 5 steps and the generator's step alike);
+DDP is not used because it cannot follow the gradient penalty's create_graph double backward
+"""
+
+SECTORS = ("energy", "financial", "industrial", "tech")
+DATA_DIR = os.path.join("data", "1yr")
+MODEL_DIR = "models"
+
+
+def sector_source(sector):
+    return os.path.join(DATA_DIR, f"{sector}_stocks_1y.csv")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# averages the module's gradients over all ranks in one flattened all_reduce
+def all_reduce_gradients(module):
+    grads = [p.grad for p in module.parameters() if p.grad is not None]
+    if not grads:
+        return
+    flat = _flatten_dense_tensors(grads)
+    dist.all_reduce(flat)
+    flat /= dist.get_world_size()
+    for grad, synced in zip(grads, _unflatten_dense_tensors(flat, grads)):
+        grad.copy_(synced)
+
+
+def broadcast_parameters(module, src=0):
+    for tensor in module.state_dict().values():
+        dist.broadcast(tensor, src)
+
+
+# True when every rank holds exactly the same weights
+def replicas_in_sync(module):
+    flat = _flatten_dense_tensors([t.detach().float() for t in module.state_dict().values()])
+    low, high = flat.clone(), flat.clone()
+    dist.all_reduce(low, op=dist.ReduceOp.MIN)
+    dist.all_reduce(high, op=dist.ReduceOp.MAX)
+    return bool(torch.equal(low, high))
+
+
+# splits `cores` into `n` contiguous groups (shared round-robin when there are fewer cores than groups)
+def split_cores(cores, n):
+    if len(cores) < n:
+        return [[cores[i % len(cores)]] for i in range(n)]
+    size = len(cores) // n
+    return [cores[i * size:(i + 1) * size] for i in range(n)]
+
+
+def pin_threads(cores):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(max(1, len(cores)))
+    torch.set_num_interop_threads(1)
+
+
+def train_rank(rank, world_size, config, init_method=None):
+    cores = config.get("cores")
+    if cores:
+        pin_threads(split_cores(cores, world_size)[rank])
+    dist.init_process_group("gloo", rank=rank, world_size=world_size,
+                            init_method=init_method or f"tcp://127.0.0.1:{config['port']}")
+    try:
+        store = FeatureStore(config["store"])
+        lookback = config["lookback"]
+        dataset = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), lookback,
+                                             store.offsets("train"))
+        batches = TickerBatchSampler(dataset, config["batch_size"], shuffle=True, seed=config["seed"],
+                                     num_replicas=world_size, rank=rank)
+        if config.get("max_steps"):
+            batches = list(batches)[:config["max_steps"]]
+        loader = DataLoader(dataset, batch_sampler=batches, collate_fn=WindowDataset.collate)
+
+        torch.manual_seed(config["seed"])
+        generator = Generator(store.n_features)
+        discriminator = Discriminator(lookback)
+        broadcast_parameters(generator)
+        broadcast_parameters(discriminator)
+        # per-rank noise (gradient penalty interpolation, dropout) should differ
+        torch.manual_seed(config["seed"] + rank)
+
+        betas = [0.5, 0.9]
+        optim_g = torch.optim.Adam(generator.parameters(), lr=config["learning_rate"], betas=betas)
+        optim_d = torch.optim.Adam(discriminator.parameters(), lr=config["learning_rate"], betas=betas)
+        trainer = Trainer(generator, discriminator, optim_g, optim_d, lambda_weight=config["lambda_weight"],
+                          critic_iterations=config["critic_iterations"], device=torch.device("cpu"),
+                          grad_sync=all_reduce_gradients)
+
+        start = time.perf_counter()
+        with redirect_stdout(sys.stdout if rank == 0 else io.StringIO()):
+            trainer.train(loader, epochs=config["epochs"], lookback=lookback, output_dim=1, device=torch.device("cpu"))
+        elapsed = time.perf_counter() - start
+        in_sync = replicas_in_sync(generator) and replicas_in_sync(discriminator)
+
+        if rank == 0:
+            sector, name = config["sector"], config["name"]
+            out_dir = config["out_dir"]
+            os.makedirs(os.path.join(out_dir, "scalers"), exist_ok=True)
+            os.makedirs(os.path.join(out_dir, "encoders"), exist_ok=True)
+            torch.save(generator.state_dict(), os.path.join(out_dir, f"{name}_generator.pth"))
+            torch.save(discriminator.state_dict(), os.path.join(out_dir, f"{name}_discriminator.pth"))
+            joblib.dump(store.transformer("x_scaler"), os.path.join(out_dir, "scalers", f"{name}_x_scaler.pkl"))
+            joblib.dump(store.transformer("y_scaler"), os.path.join(out_dir, "scalers", f"{name}_y_scaler.pkl"))
+            joblib.dump(store.transformer("one_hot_encoder"), os.path.join(out_dir, "encoders", f"{name}_one_hot_encoder.pkl"))
+
+            last = trainer.metrics.epochs[-1]
+            summary = {
+                "sector": sector,
+                "name": name,
+                "world_size": world_size,
+                "steps": trainer.num_steps,
+                "elapsed": elapsed,
+                "steps_per_sec": last["steps_per_sec"],
+                "samples_per_sec": last["steps_per_sec"] * config["batch_size"] * world_size,
+                "replicas_in_sync": in_sync,
+                "d": last["d"]["last"],
+                "g": last["g"]["last"],
+            }
+            if config.get("summary_path"):
+                with open(config["summary_path"], "w") as f:
+                    json.dump(summary, f)
+            print(json.dumps(summary))
+    finally:
+        dist.destroy_process_group()
+
+
+def make_config(sector, args, cores=None):
+    return {
+        "sector": sector,
+        "name": args.name or f"{sector}_1y",
+        "store": build_feature_store(sector_source(sector)),
+        "lookback": args.lookback,
+        "batch_size": args.batch_size,
+        "epochs": args.epochs,
+        "max_steps": args.max_steps,
+        "learning_rate": args.learning_rate,
+        "lambda_weight": args.lambda_weight,
+        "critic_iterations": args.critic_iterations,
+        "seed": args.seed,
+        "out_dir": args.out_dir,
+        "port": args.port or free_port(),
+        "cores": cores,
+        "summary_path": args.summary_path,
+    }
+
+
+# one sector on this box: spawns world_size ranks
+def train_sector(sector, args, cores=None):
+    config = make_config(sector, args, cores)
+    mp.spawn(train_rank, args=(args.world_size, config), nprocs=args.world_size, join=True)
+
+
+# several sectors at once: one child job per sector, each pinned to its own slice of the cores
+def launch_sectors(args):
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    jobs = []
+    for sector, job_cores in zip(args.sectors, split_cores(cores, len(args.sectors))):
+        # build the store before any rank starts so ranks of different jobs never race on it
+        build_feature_store(sector_source(sector))
+        cmd = [sys.executable, os.path.abspath(__file__), "--sectors", sector, "--cores", ",".join(map(str, job_cores))]
+        for key in ("world_size", "lookback", "batch_size", "epochs", "max_steps", "learning_rate",
+                    "lambda_weight", "critic_iterations", "seed", "out_dir"):
+            value = getattr(args, key)
+            if value is not None:
+                cmd += [f"--{key.replace('_', '-')}", str(value)]
+        print(f"{sector}: cores {job_cores[0]}-{job_cores[-1]}, {args.world_size} ranks")
+        jobs.append((sector, subprocess.Popen(cmd)))
+    failed = [sector for sector, proc in jobs if proc.wait() != 0]
+    if failed:
+        raise RuntimeError(f"training failed for {failed}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="data-parallel WGAN-GP training per sector")
+    parser.add_argument("--sectors", nargs="+", default=["tech"], choices=SECTORS)
+    parser.add_argument("--world-size", type=int, default=2)
+    parser.add_argument("--lookback", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=128, help="per rank")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--max-steps", type=int, default=None, help="cap on steps per epoch (benchmarks)")
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--lambda-weight", type=float, default=10)
+    parser.add_argument("--critic-iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default=MODEL_DIR)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--cores", type=lambda s: [int(c) for c in s.split(",")], default=None)
+    parser.add_argument("--summary-path", default=None)
+    parser.add_argument("--name", default=None, help="artifact prefix, default <sector>_1y (one sector only)")
+    args = parser.parse_args(argv)
+    if args.name is not None and len(args.sectors) > 1:
+        parser.error("--name needs exactly one sector")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if "RANK" in os.environ and "WORLD_SIZE" in os.environ:
+        # launched by torchrun (possibly across nodes): this process is one rank
+        config = make_config(args.sectors[0], args, args.cores)
+        train_rank(int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]), config, init_method="env://")
+    elif len(args.sectors) > 1:
+        launch_sectors(args)
+    else:
+        train_sector(args.sectors[0], args, args.cores)
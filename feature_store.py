@@ -0,0 +1,176 @@
+import os
+import json
+import shutil
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+import joblib
+import torch
+from sklearn.preprocessing import MinMaxScaler
+from preprocessing import cyclical_encoding, one_hot_encoding, ticker_offsets
+from storage import load_dataset
+
+"""
+versioned, memory-mapped store of the scaled training matrices
+
+<root>/<version>/
+    x_train.npy  y_train.npy  x_test.npy  y_test.npy    float32, rows grouped by ticker (sorted)
+    offsets_train.npy  offsets_test.npy                  [start, end) row boundaries of each ticker
+    x_scaler.pkl  y_scaler.pkl  one_hot_encoder.pkl      fitted transformers
+    meta.json                                            feature names, tickers, shapes, source signature
+
+the version is a hash of the source dataset (path, size, mtime) and the featurization params, so a
+rebuild only happens when one of them changes. arrays are opened with np.load(mmap_mode="c"): pages
+come straight from the page cache and are shared by every process training off the same version
+"""
+
+FORMAT_VERSION = 1
+DEFAULT_ROOT = os.path.join("data", "features")
+SPLITS = ("train", "test")
+
+
+def _source_signature(source):
+    paths = [source]
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(d, f) for d, _, files in os.walk(source) for f in files)
+    return [[os.path.relpath(p, source) if p != source else os.path.basename(p),
+             os.path.getsize(p), os.stat(p).st_mtime_ns] for p in paths]
+
+
+def store_version(source, split=0.8, period=10):
+    key = json.dumps({
+        "format": FORMAT_VERSION,
+        "source": os.path.abspath(source),
+        "signature": _source_signature(source),
+        "split": split,
+        "period": period,
+    }, sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+# the cyclical date encoding, one-hot tickers and min-max scaling main.py used to run on every start
+def featurize(df, split=0.8, period=10):
+    df = df.dropna().copy()
+    df['date'] = pd.to_datetime(df['date'])
+
+    year = df['date'].dt.year - 1
+    month = df['date'].dt.month - 1
+    day = df['date'].dt.day - 1
+
+    df["year_cos"], df["year_sin"] = cyclical_encoding(year, period)
+    df["month_cos"], df["month_sin"] = cyclical_encoding(month, 12)
+    df["day_cos"], df["day_sin"] = cyclical_encoding(day, 31)
+
+    df["y"] = df["Close"]
+
+    split_idx = int(df.shape[0] * split)
+    train_df, test_df = df[:split_idx], df[split_idx:]
+
+    train_ticker_encoded, test_ticker_encoded, one_hot_encoder = one_hot_encoding(train_df, test_df)
+
+    feature_cols = [c for c in df.columns if c not in ["date", "y", "Close", "ticker"]]
+    x_train = np.concatenate([train_df[feature_cols].values, train_ticker_encoded], axis=1)
+    x_test = np.concatenate([test_df[feature_cols].values, test_ticker_encoded], axis=1)
+
+    x_scaler = MinMaxScaler(feature_range=(0, 1))
+    y_scaler = MinMaxScaler(feature_range=(0, 1))
+
+    return {
+        "x_train": x_scaler.fit_transform(x_train),
+        "x_test": x_scaler.transform(x_test),
+        "y_train": y_scaler.fit_transform(train_df[["y"]].values),
+        "y_test": y_scaler.transform(test_df[["y"]].values),
+        "tickers_train": train_df["ticker"].values,
+        "tickers_test": test_df["ticker"].values,
+        "feature_names": feature_cols + [str(i) for i in range(train_ticker_encoded.shape[1])],
+        "transformers": {"x_scaler": x_scaler, "y_scaler": y_scaler, "one_hot_encoder": one_hot_encoder},
+    }
+
+
+def _write_store(path, features, meta):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    meta = dict(meta, feature_names=features["feature_names"], tickers={}, shapes={})
+    for split in SPLITS:
+        order, offsets = ticker_offsets(features[f"tickers_{split}"])
+        tickers = features[f"tickers_{split}"][order]
+        for name in ("x", "y"):
+            array = np.ascontiguousarray(features[f"{name}_{split}"][order], dtype=np.float32)
+            np.save(os.path.join(tmp, f"{name}_{split}.npy"), array)
+            meta["shapes"][f"{name}_{split}"] = list(array.shape)
+        np.save(os.path.join(tmp, f"offsets_{split}.npy"), offsets.astype(np.int64))
+        meta["tickers"][split] = [str(t) for t in tickers[offsets[:-1]]]
+    for name, transformer in features["transformers"].items():
+        joblib.dump(transformer, os.path.join(tmp, f"{name}.pkl"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # another process published the same version first
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            raise
+        shutil.rmtree(tmp)
+
+
+# featurizes `source` (anything load_dataset reads) into <root>/<version> unless that version exists
+def build_feature_store(source, root=DEFAULT_ROOT, split=0.8, period=10, force=False):
+    version = store_version(source, split, period)
+    path = os.path.join(root, version)
+    if os.path.exists(os.path.join(path, "meta.json")) and not force:
+        return path
+
+    os.makedirs(root, exist_ok=True)
+    if force and os.path.exists(path):
+        shutil.rmtree(path)
+    features = featurize(load_dataset(source), split, period)
+    _write_store(path, features, {
+        "version": version,
+        "format": FORMAT_VERSION,
+        "source": source,
+        "split": split,
+        "period": period,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"Feature store {path} built from {source}")
+    return path
+
+
+class FeatureStore():
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self._transformers = {}
+
+    # copy-on-write memmap: zero-copy into torch, shared page cache, never written back to disk
+    def array(self, name):
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="c")
+
+    def tensor(self, name):
+        return torch.from_numpy(self.array(name))
+
+    def offsets(self, split):
+        return np.load(os.path.join(self.path, f"offsets_{split}.npy"))
+
+    # per-row ticker labels, for code that still wants the flat ticker column
+    def row_tickers(self, split):
+        return np.repeat(self.meta["tickers"][split], np.diff(self.offsets(split)))
+
+    def transformer(self, name):
+        if name not in self._transformers:
+            self._transformers[name] = joblib.load(os.path.join(self.path, f"{name}.pkl"))
+        return self._transformers[name]
+
+    @property
+    def n_features(self):
+        return len(self.meta["feature_names"])
+
+
+def open_feature_store(source, root=DEFAULT_ROOT, split=0.8, period=10):
+    return FeatureStore(build_feature_store(source, root, split, period))
@@ -0,0 +1,646 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+technical indicator engine shared by data collection and serving
+
+matches the `ta` library outputs (fillna=False) column for column, but computes the whole
+set in one numpy pass: close diffs, previous close, directional movement and the rolling
+high/low windows are built once and reused by every indicator/window that needs them
+
+inputs can be 1-d (one ticker) or 2-d (tickers x time, equal length) - everything runs
+along the last axis so a panel of tickers is one pass too
+"""
+
+# scipy.signal is slow to import and only the batch engine needs it, so it is imported on first use
+# (the streaming engine and a server that has not computed a full history yet never pay for it)
+def lfilter(*args, **kwargs):
+    from scipy.signal import lfilter
+    return lfilter(*args, **kwargs)
+
+
+# (indicator, params, output columns) in dataset column order
+FEATURE_SPEC = [
+    ("rsi", {"window": 7}, ["RSI_7"]),
+    ("rsi", {"window": 14}, ["RSI_14"]),
+    ("rsi", {"window": 21}, ["RSI_21"]),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}, ["MACD", "MACD_Signal"]),
+    ("bb", {"window": 7, "dev": 2}, ["BB_High_7", "BB_Low_7", "BB_Width_7"]),
+    ("bb", {"window": 14, "dev": 2}, ["BB_High_14", "BB_Low_14", "BB_Width_14"]),
+    ("bb", {"window": 21, "dev": 2}, ["BB_High_21", "BB_Low_21", "BB_Width_21"]),
+    ("aroon", {"window": 7}, ["Aroon_7", "Aroon_Up_7", "Aroon_Down_7"]),
+    ("aroon", {"window": 14}, ["Aroon_14", "Aroon_Up_14", "Aroon_Down_14"]),
+    ("aroon", {"window": 21}, ["Aroon_21", "Aroon_Up_21", "Aroon_Down_21"]),
+    ("adx", {"window": 7}, ["ADX_7", "ADX_neg_7", "ADX_pos_7"]),
+    ("adx", {"window": 14}, ["ADX_14", "ADX_neg_14", "ADX_pos_14"]),
+    ("adx", {"window": 21}, ["ADX_21", "ADX_neg_21", "ADX_pos_21"]),
+    ("obv", {}, ["OBV"]),
+    ("stoch", {"window": 7, "smooth": 3}, ["Stoch_7", "Stoch_Signal_7"]),
+    ("stoch", {"window": 14, "smooth": 3}, ["Stoch_14", "Stoch_Signal_14"]),
+    ("stoch", {"window": 21, "smooth": 3}, ["Stoch_21", "Stoch_Signal_21"]),
+]
+
+FEATURE_COLUMNS = [col for _, _, cols in FEATURE_SPEC for col in cols]
+
+
+def _shift(x, fill=np.nan):
+    out = np.empty_like(x)
+    out[..., 0] = fill
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+# y[t] = (1 - alpha) * y[t-1] + alpha * x[t], seeded with the first valid x (pandas ewm adjust=False)
+# first (start + min_periods - 1) outputs are nan
+def _ewm(x, alpha, min_periods, start=0):
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] <= start:
+        return out
+    seq = x[..., start:]
+    zi = (1 - alpha) * seq[..., :1]
+    out[..., start:] = lfilter([alpha], [1.0, alpha - 1.0], seq, axis=-1, zi=zi)[0]
+    out[..., :start + min_periods - 1] = np.nan
+    return out
+
+
+# y[0] = y0, y[i] = y[i-1] * decay + x[i]
+def _recursive_sum(x, y0, decay):
+    return lfilter([1.0], [1.0, -decay], x, axis=-1, zi=(decay * y0)[..., None])[0]
+
+
+def _rolling(x, window):
+    if x.shape[-1] < window:
+        return np.empty(x.shape[:-1] + (0, window))
+    return sliding_window_view(x, window, axis=-1)
+
+
+def _pad_front(x, n, total):
+    out = np.full(x.shape[:-1] + (total,), np.nan)
+    out[..., n:] = x
+    return out
+
+
+class _Intermediates():
+    # lazily builds and caches the pieces several indicators share
+    def __init__(self, high, low, close, volume):
+        self.high, self.low, self.close, self.volume = high, low, close, volume
+        self.n = close.shape[-1]
+        self.cache = {}
+
+    def get(self, key, fn):
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return self.cache[key]
+
+    @property
+    def diff(self):
+        return self.get("diff", lambda: self.close - _shift(self.close))
+
+    @property
+    def prev_close(self):
+        return self.get("prev_close", lambda: _shift(self.close))
+
+    def rolling_max_high(self, window):
+        return self.get(("max_high", window), lambda: _rolling(self.high, window).max(axis=-1))
+
+    def rolling_min_low(self, window):
+        return self.get(("min_low", window), lambda: _rolling(self.low, window).min(axis=-1))
+
+    def directional(self):
+        def build():
+            prev_close = self.prev_close
+            # true range and +/- directional movement, nan on the first bar like ta
+            tr = np.maximum(self.high, prev_close) - np.minimum(self.low, prev_close)
+            up = self.high - _shift(self.high)
+            down = _shift(self.low) - self.low
+            pos = np.where((up > down) & (up > 0), up, 0.0)
+            neg = np.where((down > up) & (down > 0), down, 0.0)
+            return tr, pos, neg
+        return self.get("directional", build)
+
+
+def _rsi(inter, window):
+    diff = inter.diff
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    ema_up = _ewm(up, 1 / window, window)
+    ema_down = _ewm(down, 1 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + ema_up / ema_down)
+    return [np.where(ema_down == 0, 100.0, rsi)]
+
+
+def _macd(inter, fast, slow, signal):
+    close = inter.close
+    ema_fast = _ewm(close, 2 / (fast + 1), fast)
+    ema_slow = _ewm(close, 2 / (slow + 1), slow)
+    macd = ema_fast - ema_slow
+    macd_signal = _ewm(macd, 2 / (signal + 1), signal, start=slow - 1)
+    return [macd, macd_signal]
+
+
+def _bb(inter, window, dev):
+    windows = inter.get(("close_windows", window), lambda: _rolling(inter.close, window))
+    mean = windows.mean(axis=-1)
+    std = windows.std(axis=-1)
+    high = _pad_front(mean + dev * std, window - 1, inter.n)
+    low = _pad_front(mean - dev * std, window - 1, inter.n)
+    return [high, low, high - low]
+
+
+def _aroon(inter, window):
+    up = _rolling(inter.high, window + 1).argmax(axis=-1) / window * 100
+    down = _rolling(inter.low, window + 1).argmin(axis=-1) / window * 100
+    up = _pad_front(up, window, inter.n)
+    down = _pad_front(down, window, inter.n)
+    return [up - down, up, down]
+
+
+# replicates ta.trend.ADXIndicator including its seeding and index offsets
+def _adx(inter, window):
+    n, w = inter.n, window
+    tr, pos, neg = inter.directional()
+    length = n - (w - 1)
+    decay = 1 - 1 / w
+
+    def smooth(x):
+        out = np.zeros(x.shape[:-1] + (length,))
+        seed = x[..., 1:w + 1].sum(axis=-1)
+        out[..., 0] = seed
+        if length > 2:
+            out[..., 1:length - 1] = _recursive_sum(x[..., w + 1:w + length - 1], seed, decay)
+        return out
+
+    trs, dip, din = smooth(tr), smooth(pos), smooth(neg)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_pos = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_neg = np.where(trs != 0, 100 * din / trs, 0.0)
+        total = di_pos + di_neg
+        dx = np.where(total != 0, 100 * np.abs((di_pos - di_neg) / total), 0.0)
+
+    adx = np.zeros(inter.close.shape[:-1] + (length,))
+    if length > w:
+        seed = dx[..., :w].mean(axis=-1)
+        adx[..., w] = seed
+        if length > w + 1:
+            adx[..., w + 1:] = _recursive_sum(dx[..., w:length - 1] / w, seed, (w - 1) / w)
+    adx = np.concatenate([np.zeros(adx.shape[:-1] + (w - 1,)), adx], axis=-1)
+
+    # ta writes +DI/-DI one bar later than ADX and leaves the first/last smoothed values at 0
+    adx_pos = np.zeros(inter.close.shape)
+    adx_neg = np.zeros(inter.close.shape)
+    if length > 2:
+        adx_pos[..., w + 1:w + length - 1] = di_pos[..., 1:length - 1]
+        adx_neg[..., w + 1:w + length - 1] = di_neg[..., 1:length - 1]
+    return [adx, adx_neg, adx_pos]
+
+
+def _obv(inter):
+    signed = np.where(inter.close < inter.prev_close, -inter.volume, inter.volume)
+    return [np.cumsum(signed, axis=-1)]
+
+
+def _stoch(inter, window, smooth):
+    smin = _pad_front(inter.rolling_min_low(window), window - 1, inter.n)
+    smax = _pad_front(inter.rolling_max_high(window), window - 1, inter.n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = 100 * (inter.close - smin) / (smax - smin)
+    signal = _pad_front(_rolling(k, smooth).mean(axis=-1), smooth - 1, inter.n)
+    return [k, signal]
+
+
+INDICATORS = {
+    "rsi": _rsi,
+    "macd": _macd,
+    "bb": _bb,
+    "aroon": _aroon,
+    "adx": _adx,
+    "obv": _obv,
+    "stoch": _stoch,
+}
+
+
+# returns {column: array} for every column in spec, arrays shaped like close
+def compute_indicator_arrays(high, low, close, volume, spec=FEATURE_SPEC):
+    inter = _Intermediates(*(np.asarray(a, dtype=np.float64) for a in (high, low, close, volume)))
+    out = {}
+    for name, params, cols in spec:
+        for col, values in zip(cols, INDICATORS[name](inter, **params)):
+            out[col] = values
+    return out
+
+
+# adds the indicator columns to a single ticker's OHLCV frame (returns a copy)
+def compute_features(df, spec=FEATURE_SPEC):
+    arrays = compute_indicator_arrays(df["High"].values, df["Low"].values, df["Close"].values,
+                                      df["Volume"].values, spec)
+    features = pd.DataFrame(arrays, index=df.index)
+    return pd.concat([df, features], axis=1)
+
+
+# same as compute_features for a frame holding several tickers (rows ordered by date within
+# each ticker); equal-length tickers are stacked and computed as one 2-d pass
+def compute_features_grouped(df, spec=FEATURE_SPEC, by="ticker"):
+    groups = {ticker: idx for ticker, idx in df.groupby(by, sort=False).indices.items()}
+    lengths = {len(idx) for idx in groups.values()}
+    if len(lengths) != 1:
+        return pd.concat([compute_features(df.iloc[idx], spec) for idx in groups.values()])
+
+    order = np.concatenate(list(groups.values()))
+    panel = df.iloc[order]
+    shape = (len(groups), lengths.pop())
+    cols = {c: panel[c].values.reshape(shape) for c in ("High", "Low", "Close", "Volume")}
+    arrays = compute_indicator_arrays(cols["High"], cols["Low"], cols["Close"], cols["Volume"], spec)
+    features = pd.DataFrame({col: values.reshape(-1) for col, values in arrays.items()}, index=panel.index)
+    return pd.concat([panel, features], axis=1)
+
+
+"""
+streaming engine: same spec, advanced one bar at a time
+
+every stream keeps only what its indicator needs (ewm values, the last `window` highs/lows/
+closes, wilder sums), so an update costs O(window) regardless of how much history came
+before it. IndicatorState is json-serializable so it can live with the client between calls:
+the recursive accumulators plus one shared tail of raw high/low/close bars (the windowed
+streams rebuild their deques from it), validated against the server's spec on the way back in
+"""
+
+def _nan_to_none(value):
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _none_to_nan(value):
+    return np.nan if value is None else value
+
+
+# a client-supplied state that does not fit the server's spec
+class InvalidState(ValueError):
+    pass
+
+
+def _number(value, nullable=True):
+    if value is None and nullable:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidState(f"expected a number, got {value!r}")
+    return float(value)
+
+
+class _Stream():
+    # accumulator attributes that go into the serialized state (a deque is stored as a list)
+    STATE = ()
+
+    # raw (high, low, close) bars the stream rebuilds its windows from
+    def tail(self):
+        return 0
+
+    # bars before every output is final (not nan / not the zero-filled warmup)
+    def warmup(self):
+        return 1
+
+    # only deque entries use None for nan; a None scalar means "not seeded yet"
+    def state(self):
+        out = []
+        for key in self.STATE:
+            value = getattr(self, key)
+            out.append([_nan_to_none(v) for v in value] if isinstance(value, deque) else _nan_to_none(value))
+        return out
+
+    def load(self, values, bars):
+        if not isinstance(values, list) or len(values) != len(self.STATE):
+            raise InvalidState(f"{type(self).__name__}: expected {len(self.STATE)} accumulators")
+        for key, value in zip(self.STATE, values):
+            current = getattr(self, key)
+            if isinstance(current, deque):
+                if not isinstance(value, list) or len(value) > current.maxlen:
+                    raise InvalidState(f"{type(self).__name__}.{key}: expected at most {current.maxlen} values")
+                current.extend(_none_to_nan(_number(v)) for v in value)
+            else:
+                setattr(self, key, _number(value))
+        self.load_bars(bars)
+
+    def load_bars(self, bars):
+        pass
+
+
+class _RSIStream(_Stream):
+    STATE = ("up", "down")
+
+    def __init__(self, window):
+        self.window = window
+        self.up = None
+        self.down = None
+
+    def update(self, bar, prev, t):
+        diff = bar["Close"] - prev["Close"] if prev is not None else np.nan
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        alpha = 1 / self.window
+        if self.up is None:
+            self.up, self.down = up, down
+        else:
+            self.up = (1 - alpha) * self.up + alpha * up
+            self.down = (1 - alpha) * self.down + alpha * down
+        if t < self.window - 1:
+            return [np.nan]
+        return [100.0 if self.down == 0 else 100 - 100 / (1 + self.up / self.down)]
+
+
+class _MACDStream(_Stream):
+    STATE = ("ema_fast", "ema_slow", "ema_signal")
+
+    def __init__(self, fast, slow, signal):
+        self.fast, self.slow, self.signal = fast, slow, signal
+        self.ema_fast = None
+        self.ema_slow = None
+        self.ema_signal = None
+
+    def update(self, bar, prev, t):
+        close = bar["Close"]
+        a_fast, a_slow, a_sig = 2 / (self.fast + 1), 2 / (self.slow + 1), 2 / (self.signal + 1)
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = close
+        else:
+            self.ema_fast = (1 - a_fast) * self.ema_fast + a_fast * close
+            self.ema_slow = (1 - a_slow) * self.ema_slow + a_slow * close
+        if t < max(self.fast, self.slow) - 1:
+            return [np.nan, np.nan]
+        macd = self.ema_fast - self.ema_slow
+        if self.ema_signal is None:
+            self.ema_signal = macd
+        else:
+            self.ema_signal = (1 - a_sig) * self.ema_signal + a_sig * macd
+        signal = self.ema_signal if t >= self.slow + self.signal - 2 else np.nan
+        return [macd, signal]
+
+    def warmup(self):
+        return max(self.fast, self.slow) + self.signal - 1
+
+
+class _BBStream(_Stream):
+    def __init__(self, window, dev):
+        self.window, self.dev = window, dev
+        self.closes = deque(maxlen=window)
+
+    def tail(self):
+        return self.window
+
+    def warmup(self):
+        return self.window
+
+    def load_bars(self, bars):
+        self.closes.extend(close for _, _, close in bars[-self.window:])
+
+    def update(self, bar, prev, t):
+        self.closes.append(bar["Close"])
+        if len(self.closes) < self.window:
+            return [np.nan, np.nan, np.nan]
+        closes = np.fromiter(self.closes, dtype=np.float64)
+        mean, std = closes.mean(), closes.std()
+        high, low = mean + self.dev * std, mean - self.dev * std
+        return [high, low, high - low]
+
+
+class _AroonStream(_Stream):
+    def __init__(self, window):
+        self.window = window
+        self.highs = deque(maxlen=window + 1)
+        self.lows = deque(maxlen=window + 1)
+
+    def tail(self):
+        return self.window + 1
+
+    def warmup(self):
+        return self.window + 1
+
+    def load_bars(self, bars):
+        for high, low, _ in bars[-(self.window + 1):]:
+            self.highs.append(high)
+            self.lows.append(low)
+
+    def update(self, bar, prev, t):
+        self.highs.append(bar["High"])
+        self.lows.append(bar["Low"])
+        if len(self.highs) < self.window + 1:
+            return [np.nan, np.nan, np.nan]
+        up = float(np.argmax(np.fromiter(self.highs, dtype=np.float64))) / self.window * 100
+        down = float(np.argmin(np.fromiter(self.lows, dtype=np.float64))) / self.window * 100
+        return [up - down, up, down]
+
+
+# follows the batch _adx (and so ta) bar for bar, including its zero-filled warmup
+class _ADXStream(_Stream):
+    STATE = ("trs", "dip", "din", "dx_sum", "adx")
+
+    def __init__(self, window):
+        self.window = window
+        self.trs = 0.0
+        self.dip = 0.0
+        self.din = 0.0
+        self.dx_sum = 0.0
+        self.adx = 0.0
+
+    def update(self, bar, prev, t):
+        w = self.window
+        if prev is None:
+            return [0.0, 0.0, 0.0]
+        tr = max(bar["High"], prev["Close"]) - min(bar["Low"], prev["Close"])
+        up = bar["High"] - prev["High"]
+        down = prev["Low"] - bar["Low"]
+        pos = up if (up > down and up > 0) else 0.0
+        neg = down if (down > up and down > 0) else 0.0
+
+        if t <= w:
+            self.trs += tr
+            self.dip += pos
+            self.din += neg
+            if t < w:
+                return [0.0, 0.0, 0.0]
+        else:
+            decay = 1 - 1 / w
+            self.trs = self.trs * decay + tr
+            self.dip = self.dip * decay + pos
+            self.din = self.din * decay + neg
+
+        di_pos = 100 * self.dip / self.trs if self.trs != 0 else 0.0
+        di_neg = 100 * self.din / self.trs if self.trs != 0 else 0.0
+        total = di_pos + di_neg
+        dx = 100 * abs((di_pos - di_neg) / total) if total != 0 else 0.0
+
+        if t < 2 * w - 1:
+            self.dx_sum += dx
+            adx = 0.0
+        elif t == 2 * w - 1:
+            self.dx_sum += dx
+            self.adx = adx = self.dx_sum / w
+        else:
+            self.adx = adx = (self.adx * (w - 1) + dx) / w
+
+        if t == w:
+            return [adx, 0.0, 0.0]
+        return [adx, di_neg, di_pos]
+
+    def warmup(self):
+        return 2 * self.window
+
+
+class _OBVStream(_Stream):
+    STATE = ("obv",)
+
+    def __init__(self):
+        self.obv = 0.0
+
+    def update(self, bar, prev, t):
+        if prev is not None and bar["Close"] < prev["Close"]:
+            self.obv -= bar["Volume"]
+        else:
+            self.obv += bar["Volume"]
+        return [self.obv]
+
+
+class _StochStream(_Stream):
+    STATE = ("ks",)
+
+    def __init__(self, window, smooth):
+        self.window, self.smooth = window, smooth
+        self.highs = deque(maxlen=window)
+        self.lows = deque(maxlen=window)
+        self.ks = deque(maxlen=smooth)
+
+    def tail(self):
+        return self.window
+
+    def warmup(self):
+        return self.window + self.smooth - 1
+
+    def load_bars(self, bars):
+        for high, low, _ in bars[-self.window:]:
+            self.highs.append(high)
+            self.lows.append(low)
+
+    def update(self, bar, prev, t):
+        self.highs.append(bar["High"])
+        self.lows.append(bar["Low"])
+        k = np.nan
+        if len(self.highs) == self.window:
+            smin, smax = min(self.lows), max(self.highs)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                k = float(np.float64(100) * (bar["Close"] - smin) / np.float64(smax - smin))
+        self.ks.append(k)
+        signal = np.mean(self.ks) if len(self.ks) == self.smooth else np.nan
+        return [k, float(signal)]
+
+
+STREAMS = {
+    "rsi": _RSIStream,
+    "macd": _MACDStream,
+    "bb": _BBStream,
+    "aroon": _AroonStream,
+    "adx": _ADXStream,
+    "obv": _OBVStream,
+    "stoch": _StochStream,
+}
+
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+# the previous bar's fields the streams read
+PREV_FIELDS = ("High", "Low", "Close")
+
+
+# per-ticker online indicator state; update() takes one bar (dict with at least OHLCV, any
+# other keys like Date/ticker are carried through) and returns it with the feature columns
+# added. the last `lookback` finished rows are kept in .rows for building the model window
+class IndicatorState():
+    def __init__(self, spec=FEATURE_SPEC, lookback=3):
+        self.spec = [(name, dict(params), list(cols)) for name, params, cols in spec]
+        self.streams = [STREAMS[name](**params) for name, params, _ in self.spec]
+        self.columns = [col for _, _, cols in self.spec for col in cols]
+        self.lookback = lookback
+        self.t = 0
+        self.prev = None
+        self.rows = deque(maxlen=lookback)
+        self.bars = deque(maxlen=max(1, *(stream.tail() for stream in self.streams)))
+
+    def update(self, bar):
+        bar = dict(bar)
+        for field in BAR_FIELDS:
+            bar[field] = float(bar[field])
+        row = dict(bar)
+        for (_, _, cols), stream in zip(self.spec, self.streams):
+            row.update(zip(cols, stream.update(bar, self.prev, self.t)))
+        self.prev = {field: bar[field] for field in PREV_FIELDS}
+        self.bars.append(tuple(bar[field] for field in PREV_FIELDS))
+        self.t += 1
+        self.rows.append(row)
+        return row
+
+    # bars after which every indicator is past its warmup (nan or zero-filled outputs)
+    def warmup_bars(self):
+        return max(stream.warmup() for stream in self.streams)
+
+    # every row of the model window has final indicator values
+    def ready(self):
+        return len(self.rows) == self.lookback and self.t >= self.warmup_bars() + self.lookback - 1
+
+    # the spec and lookback are not part of the state: they are the server's
+    def to_dict(self):
+        keys = [k for k in self.rows[0] if k not in self.columns] if self.rows else []
+        return {
+            "t": self.t,
+            "bars": [list(bar) for bar in self.bars],
+            "streams": [stream.state() for stream in self.streams],
+            "row_keys": keys,
+            "rows": [[row.get(k) for k in keys] + [_nan_to_none(row[c]) for c in self.columns] for row in self.rows],
+        }
+
+    # rebuilds a state the client sent back; InvalidState if it does not fit spec/lookback
+    @classmethod
+    def from_dict(cls, data, spec=FEATURE_SPEC, lookback=3):
+        state = cls(spec=spec, lookback=lookback)
+        try:
+            t, bars, streams, keys, rows = data["t"], data["bars"], data["streams"], data["row_keys"], data["rows"]
+        except (KeyError, TypeError):
+            raise InvalidState("state needs t, bars, streams, row_keys and rows")
+        if isinstance(t, bool) or not isinstance(t, int) or t < 0:
+            raise InvalidState(f"t must be a non-negative integer, got {t!r}")
+        if not isinstance(bars, list) or len(bars) != min(t, state.bars.maxlen):
+            raise InvalidState(f"expected the last {min(t, state.bars.maxlen)} bars")
+        if not isinstance(streams, list) or len(streams) != len(state.streams):
+            raise InvalidState(f"expected {len(state.streams)} streams")
+        if not isinstance(keys, list) or not all(isinstance(k, str) and k not in state.columns for k in keys):
+            raise InvalidState("row_keys must be the rows' non-indicator field names")
+        if not isinstance(rows, list) or len(rows) != min(t, lookback):
+            raise InvalidState(f"expected the last {min(t, lookback)} rows")
+
+        for bar in bars:
+            if not isinstance(bar, list) or len(bar) != len(PREV_FIELDS):
+                raise InvalidState("bars are [high, low, close]")
+            state.bars.append(tuple(_number(v, nullable=False) for v in bar))
+        for stream, values in zip(state.streams, streams):
+            stream.load(values, list(state.bars))
+        for values in rows:
+            if not isinstance(values, list) or len(values) != len(keys) + len(state.columns):
+                raise InvalidState(f"rows hold {len(keys)} fields + {len(state.columns)} indicators")
+            row = dict(zip(keys, values[:len(keys)]))
+            if not all(v is None or isinstance(v, (str, int, float)) for v in row.values()):
+                raise InvalidState("row fields must be strings, numbers or null")
+            for field in BAR_FIELDS:
+                if field in row:
+                    row[field] = _number(row[field], nullable=False)
+            row.update((c, _none_to_nan(_number(v))) for c, v in zip(state.columns, values[len(keys):]))
+            state.rows.append(row)
+        state.t = t
+        if state.bars:
+            state.prev = dict(zip(PREV_FIELDS, state.bars[-1]))
+        return state
+
+    # replays a ticker's history (oldest first) to build its state
+    @classmethod
+    def from_frame(cls, df, spec=FEATURE_SPEC, lookback=3):
+        state = cls(spec=spec, lookback=lookback)
+        for bar in df.to_dict(orient="records"):
+            state.update(bar)
+        return state
@@ -0,0 +1,75 @@
+import os
+import gc
+
+"""
+gunicorn settings for the serving container (./serve runs `gunicorn --config gunicorn.conf.py wsgi:app`)
+
+the master imports the app with PRELOAD=sync, i.e. loads and warms up every model once, then forks the
+workers: model weights, scalers and encoders are shared copy-on-write instead of loaded once per worker
+
+    SERVER_MODE=processes   (default) SERVER_WORKERS single-threaded sync workers (default: one per core),
+                            each pinned to its own slice of the cores with TORCH_THREADS intra-op threads
+                            (default: its slice size); micro-batching is off unless BATCH_MAX_WAIT_MS is set,
+                            a sync worker never has two requests to batch
+    SERVER_MODE=threads     SERVER_WORKERS (default 1) gthread workers with SERVER_THREADS request threads each
+                            (default 4 per core), so concurrent requests meet in the micro-batcher
+    PORT                    default 8080
+    SERVER_TIMEOUT          worker timeout in seconds, default 60
+"""
+
+cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+mode = os.environ.get("SERVER_MODE", "processes")
+if mode not in ("processes", "threads"):
+    raise ValueError(f"SERVER_MODE must be processes or threads, got {mode!r}")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+preload_app = True
+timeout = int(os.environ.get("SERVER_TIMEOUT", "60"))
+accesslog = None
+if mode == "processes":
+    worker_class = "sync"
+    workers = int(os.environ.get("SERVER_WORKERS", len(cores)))
+    threads = 1
+    os.environ.setdefault("BATCH_MAX_WAIT_MS", "0")
+else:
+    worker_class = "gthread"
+    workers = int(os.environ.get("SERVER_WORKERS", "1"))
+    threads = int(os.environ.get("SERVER_THREADS", 4 * len(cores)))
+
+# core slice of each worker slot (more workers than cores: slots share cores round-robin)
+if workers <= len(cores):
+    core_slices = [cores[i::workers] for i in range(workers)]
+else:
+    core_slices = [[cores[i % len(cores)]] for i in range(workers)]
+torch_threads = int(os.environ.get("TORCH_THREADS", max(1, min(len(s) for s in core_slices))))
+
+os.environ.setdefault("PRELOAD", "sync")
+# the master runs the warm-up forwards single-threaded: an OpenMP pool started before fork() is not
+# usable in the children, each worker sizes its own in post_fork
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+
+# everything allocated while importing the app (the models) is moved out of the gc's reach, so
+# collections in the workers do not touch, and thereby copy, the shared pages
+def when_ready(server):
+    gc.freeze()
+
+
+# runs in the master: a new worker takes the first free slot, also when it replaces a dead one. workers
+# beyond the configured count (kill -TTIN) find every slot taken and share one round-robin
+def pre_fork(server, worker):
+    taken = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+    free = set(range(workers)) - taken
+    worker.slot = min(free) if free else len(server.WORKERS) % workers
+
+
+def post_fork(server, worker):
+    import torch
+    import inference
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, core_slices[worker.slot])
+    torch.set_num_threads(torch_threads)
+    inference.after_fork()
+    server.log.info(f"worker {worker.pid}: slot {worker.slot}, cores {core_slices[worker.slot]}, "
+                    f"{torch_threads} torch threads, {threads} request threads")
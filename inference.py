@@ -1,186 +1,310 @@
-from flask import Flask, request, jsonify
+import os
+import time
+import json
+import threading
+import traceback
+
+# process age (seconds) from /proc; None where that is not available
+def process_age():
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# cold-start breakdown, seconds; *_at values are measured from process start
+STARTUP = {"imports_started_at": process_age()}
+_imports_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 import torch
-from models import Generator
-import joblib
+import numpy as np
 import pandas as pd
-from preprocessing import cyclical_encoding
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.trend import MACD, AroonIndicator, ADXIndicator
-from ta.volatility import BollingerBands
-from ta.volume import OnBalanceVolumeIndicator
-import os
+from features import compute_features, compute_features_grouped, IndicatorState, InvalidState
+from registry import ModelRegistry
+from cache import PredictionCache, bar_hashes, history_digest, from_setting
+from codec import NPZ, decode_batch, encode_predictions
+
+STARTUP["imports"] = time.perf_counter() - _imports_started
 
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 MODEL_DIR = os.environ.get("MODEL_DIR", "/opt/ml/model")
-MODEL_PATH = os.path.join(MODEL_DIR, "financial_1y_generator.pth")
-XS_PATH  = os.path.join(MODEL_DIR, "financial_1y_x_scaler.pkl")
-YS_PATH  = os.path.join(MODEL_DIR, "financial_1y_y_scaler.pkl")
-ENC_PATH = os.path.join(MODEL_DIR, "financial_1y_one_hot_encoder.pkl")
+# resident sector models are evicted least recently used above MODEL_MEMORY_MB (unset: keep all)
+MODEL_MEMORY_MB = float(os.environ["MODEL_MEMORY_MB"]) if os.environ.get("MODEL_MEMORY_MB") else None
+# serves tickers that several sector models know when the request names no sector/model
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "financial_1y")
+# concurrent single-window predictions are gathered for up to BATCH_MAX_WAIT_MS (0 turns batching off)
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+# PRELOAD=1: load + warm up models in the background at import, /ping answers 503 until that is done
+#            (and /ping and /invocations answer 503 with the error if it failed)
+# PRELOAD=sync: the same, blocking the import (gunicorn preload_app: the master loads the models once
+#               and the forked workers share them copy-on-write, see gunicorn.conf.py); a failure
+#               raises out of the import, so the server does not start
+# PRELOAD=0: load on the first request (the old lazy behaviour)
+PRELOAD = os.environ.get("PRELOAD", "1")
+# repeated requests for a model/ticker/history already scored are answered from a cache (see cache.py)
+PREDICTION_CACHE = os.environ.get("PREDICTION_CACHE", "local")
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "900"))
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+# longest a request waits for the preload before it gets a 503
+READY_TIMEOUT = float(os.environ.get("READY_TIMEOUT", "300"))
+# load the manifest's TorchScript generator when there is one (see registry.export_torchscript)
+USE_TORCHSCRIPT = os.environ.get("USE_TORCHSCRIPT", "1") != "0"
 
 app = Flask(__name__)
 
-generator = None
-x_scaler = None
-y_scaler = None
-one_hot_encoder = None
+registry = None
+prediction_cache = from_setting(PREDICTION_CACHE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_SIZE)
+ready = threading.Event()
+# set when the background preload failed: /ping and /invocations answer 503 with it instead of waiting
+preload_error = None
+_load_lock = threading.Lock()
 
 def load_artifacts():
-    global generator, x_scaler, y_scaler, one_hot_encoder
-    if generator is not None:
-        return
-    generator = Generator(input_size=59)  # adjust for diff models
-    generator.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-    generator.eval()
-    
-    x_scaler = joblib.load(XS_PATH)
-    y_scaler = joblib.load(YS_PATH)
-    one_hot_encoder = joblib.load(ENC_PATH)
+    global registry
+    with _load_lock:
+        if registry is not None:
+            return
+        start = time.perf_counter()
+        registry = ModelRegistry(MODEL_DIR, MODEL_MEMORY_MB, DEFAULT_MODEL, device=DEVICE, script=USE_TORCHSCRIPT,
+                                 batch_max_size=BATCH_MAX_SIZE, batch_max_wait_ms=BATCH_MAX_WAIT_MS)
+        STARTUP["discover"] = time.perf_counter() - start
+
+# everything the first request would otherwise pay for: model loads, warm-up forwards and the
+# first pass through the indicator engine (lazy scipy import, numpy/pandas code paths)
+def preload():
+    load_artifacts()
+    start = time.perf_counter()
+    STARTUP["models"] = {name: registry.get(name).timings for name in registry.preload()}
+    STARTUP["models_total"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bars = np.linspace(100, 110, 60)
+    compute_features(pd.DataFrame({"Open": bars, "High": bars + 1, "Low": bars - 1, "Close": bars, "Volume": bars * 1e4}))
+    STARTUP["features_warmup"] = time.perf_counter() - start
+
+    STARTUP["ready_at"] = process_age()
+    ready.set()
+    print(f"Ready: {json.dumps(STARTUP)}")
+
+# PRELOAD=1: a failed preload still sets `ready`, so nothing waits on it forever
+def _background_preload():
+    global preload_error
+    try:
+        preload()
+    except Exception as e:
+        preload_error = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+        ready.set()
+
+# None once the models are ready, otherwise why a request cannot be served (preload failed or still loading)
+def wait_ready(timeout=READY_TIMEOUT):
+    if not ready.wait(timeout):
+        return "models are still loading"
+    if preload_error is not None:
+        return f"model preload failed: {preload_error}"
+    return None
+
+# called in every worker forked from a process that already preloaded
+def after_fork():
+    global _load_lock
+    _load_lock = threading.Lock()
+    if registry is not None:
+        registry.after_fork()
+
+if PRELOAD == "sync":
+    preload()
+elif PRELOAD != "0":
+    threading.Thread(target=_background_preload, name="preload", daemon=True).start()
+else:
+    ready.set()
 
 @app.route("/ping", methods=["GET"])
 def ping():
+    if preload_error is not None:
+        return f"model preload failed: {preload_error}", 503
+    if not ready.is_set():
+        return "loading", 503
     return "OK", 200
 
+# startup breakdown, resident models, registry hits/evictions, per-model micro-batcher stats and
+# prediction cache hits/misses
+def stats():
+    stats = registry.stats() if registry is not None else {}
+    return dict(stats, startup=STARTUP, cache=prediction_cache.stats() if prediction_cache is not None else None)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify(stats())
+
+@app.after_request
+def record_first_response(response):
+    if request.path == "/invocations" and "first_response_at" not in STARTUP:
+        STARTUP["first_response_at"] = process_age()
+    return response
+
+# "sector"/"model" routing hints: payload keys, query string or SageMaker custom attributes ("sector=tech")
+def route_hints(data, attributes="", args=None):
+    hints = {}
+    for item in attributes.split(";"):
+        key, _, value = item.strip().partition("=")
+        if value:
+            hints[key] = value
+    hints.update(args or {})
+    if isinstance(data, dict):
+        hints.update({k: data[k] for k in ("sector", "model") if k in data})
+    return {"sector": hints.get("sector"), "model": hints.get("model")}
+
+# {"bars": [...new bars...], "state": <state from the previous response or null>}
+# advances the ticker's IndicatorState by just the new bars instead of recomputing history; the
+# prediction stays null until every row of the window is past the indicators' warmup
+def invoke_stream(data, hints):
+    model = registry.model_for(data["bars"][0]["ticker"], **hints)
+    if data.get("state"):
+        state = IndicatorState.from_dict(data["state"], lookback=model.lookback)
+    else:
+        state = IndicatorState(lookback=model.lookback)
+    for bar in data["bars"]:
+        state.update(bar)
+
+    prediction = None
+    if state.ready():
+        X = model.build_model_input(pd.DataFrame(list(state.rows)))
+        prediction = model.predict(X.values)
+    return {"prediction": prediction, "state": state.to_dict()}
+
+# {"batch": [rows of any number of tickers], "as_of": [dates] (optional)}
+# indicators for every ticker in one grouped pass, then one generator forward per sector model over
+# all of its windows. yields (ticker, {as_of: prediction}) as each sector model finishes; without
+# as_of each ticker is scored at its last bar, and an as_of date scores the last bar on or before it
+# (null if fewer than lookback bars). every ticker is routed before the first yield; tickers whose
+# predictions are all cached are neither featurized nor sent through the model
+def iter_batch(data, hints):
+    df = pd.DataFrame(data["batch"])
+    df["_date"] = pd.to_datetime(df["Date"])
+    df = df.sort_values(["ticker", "_date"], kind="stable").reset_index(drop=True)
+    dates = df.pop("_date").values
+    hashes = bar_hashes(df) if prediction_cache is not None else None
+
+    as_of = data.get("as_of")
+    as_of_dates = pd.to_datetime(as_of).values if as_of else None
+    groups = {}
+    for ticker, rows in df.groupby("ticker", sort=False).indices.items():
+        groups.setdefault(registry.resolve(ticker, **hints), []).append((ticker, rows))
+
+    for name, tickers in groups.items():
+        lookback = registry.manifests[name]["lookback"]
+        predictions, pending = {}, []
+        for ticker, rows in tickers:
+            predictions[ticker] = {}
+            if as_of:
+                positions = np.searchsorted(dates[rows], as_of_dates, side="right") - 1
+                labels = list(as_of)
+            else:
+                positions = np.array([len(rows) - 1])
+                labels = [df["Date"].values[rows[-1]]]
+            for label, position in zip(labels, positions):
+                predictions[ticker][label] = None
+                if position < lookback - 1:
+                    continue
+                key = None
+                if hashes is not None:
+                    key = PredictionCache.key(name, registry.versions[name], ticker,
+                                              history_digest(hashes[rows[:position + 1]]))
+                    cached = prediction_cache.get(key)
+                    if cached is not None:
+                        predictions[ticker][label] = cached
+                        continue
+                pending.append((ticker, label, rows[position], key))
+
+        if pending:
+            model = registry.get(name)
+            featurize = {ticker for ticker, _, _, _ in pending}
+            idx = np.concatenate([rows for ticker, rows in tickers if ticker in featurize])
+            features = compute_features_grouped(df.iloc[idx])
+            X = np.zeros((len(df), len(model.feature_columns)))
+            X[features.index.values] = model.build_model_input(features).values.astype(np.float64)
+
+            ends = np.array([end for _, _, end, _ in pending])
+            windows = X[ends[:, None] + np.arange(1 - lookback, 1)]
+            for (ticker, label, _, key), prediction in zip(pending, model.predict_batch(windows)):
+                predictions[ticker][label] = prediction.tolist()
+                if key is not None:
+                    prediction_cache.set(key, predictions[ticker][label])
+        yield from predictions.items()
+
+# returns {"predictions": {ticker: {as_of: prediction}}}
+def invoke_batch(data, hints):
+    return {"predictions": dict(iter_batch(data, hints))}
+
+# rows of one ticker, scored at the last bar
+def invoke_rows(data, hints):
+    ticker = data[-1]["ticker"]
+    name = registry.resolve(ticker, **hints)
+    df = pd.DataFrame(data)
+    key = None
+    if prediction_cache is not None:
+        key = PredictionCache.key(name, registry.versions[name], ticker, history_digest(bar_hashes(df)))
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return cached
+
+    model = registry.get(name)
+    df = compute_features(df)
+    X = model.build_model_input(df)
+    window = X.tail(model.lookback).values
+    prediction = model.predict(window)
+    if key is not None:
+        prediction_cache.set(key, prediction)
+    return prediction
+
+# the /invocations contract shared by the Flask app and asgi.py; a KeyError (unknown ticker/sector/model
+# or a missing field) or an InvalidState (streaming state that does not fit the spec) is a bad request
+def handle(data, hints):
+    if isinstance(data, dict) and "bars" in data:
+        return invoke_stream(data, hints)
+    if isinstance(data, dict) and "batch" in data:
+        return invoke_batch(data, hints)
+    return invoke_rows(data, hints)
+
+# Content-Type application/x-npz: a columnar batch request (codec.py), anything else is JSON
+def decode_request(body, content_type):
+    if content_type.split(";")[0].strip() == NPZ:
+        return decode_batch(body)
+    return json.loads(body)
+
+# (body, content type) of a handle() result: batch predictions go back as npz when the client accepts it
+def encode_response(data, result, accept):
+    if NPZ in accept and isinstance(data, dict) and "batch" in data:
+        return encode_predictions(result["predictions"]), NPZ
+    return json.dumps(result).encode(), "application/json"
+
 @app.route('/invocations', methods=["POST"])
 def invoke():
-    data = request.get_json()
-
+    if request.mimetype == NPZ:
+        try:
+            data = decode_batch(request.get_data())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        data = request.get_json()
+
+    error = wait_ready()
+    if error is not None:
+        return jsonify({"error": error}), 503
     load_artifacts()
-    
-    df = pd.DataFrame(data)
-
-    df['date'] = pd.to_datetime(df['Date'])
-
-    year = df['date'].dt.year - 1
-    month = df['date'].dt.month - 1
-    day = df['date'].dt.day - 1
-
-    period = 10
-    df["year_cos"], df["year_sin"] = cyclical_encoding(year, period)
-    df["month_cos"], df["month_sin"] = cyclical_encoding(month, 12)
-    df["day_cos"], df["day_sin"] = cyclical_encoding(day, 31)
-
-    df["y"] = df["Close"]
-
-    # rsi 
-    df['RSI_7'] = RSIIndicator(close=df['Close'], window=7).rsi()
-    df['RSI_14'] = RSIIndicator(close=df['Close'], window=14).rsi()
-    df['RSI_21'] = RSIIndicator(close=df['Close'], window=21).rsi()
-
-    # macd
-    macd_ind = MACD(close=df['Close'], window_slow=26, window_fast=12, window_sign=9)
-    df['MACD'] = macd_ind.macd()
-    df['MACD_Signal'] = macd_ind.macd_signal()
-
-    # bollinger bands
-    bb_ind_7 = BollingerBands(close=df['Close'], window=7, window_dev=2)
-    df['BB_High_7'] = bb_ind_7.bollinger_hband()
-    df['BB_Low_7'] = bb_ind_7.bollinger_lband()
-    df['BB_Width_7'] = df['BB_High_7'] - df['BB_Low_7']
-
-    bb_ind_14 = BollingerBands(close=df['Close'], window=14, window_dev=2)
-    df['BB_High_14'] = bb_ind_14.bollinger_hband()
-    df['BB_Low_14'] = bb_ind_14.bollinger_lband()
-    df['BB_Width_14'] = df['BB_High_14'] - df['BB_Low_14']
-
-    bb_ind_21 = BollingerBands(close=df['Close'], window=21, window_dev=2)
-    df['BB_High_21'] = bb_ind_21.bollinger_hband()
-    df['BB_Low_21'] = bb_ind_21.bollinger_lband()
-    df['BB_Width_21'] = df['BB_High_21'] - df['BB_Low_21']
-
-    # aroon
-    aroon_ind_7 = AroonIndicator(high=df["High"], low=df["Low"], window=7)
-    df["Aroon_7"] = aroon_ind_7.aroon_indicator()
-    df["Aroon_Up_7"] = aroon_ind_7.aroon_up()
-    df["Aroon_Down_7"] = aroon_ind_7.aroon_down()
-
-    aroon_ind_14 = AroonIndicator(high=df["High"], low=df["Low"], window=14)
-    df["Aroon_14"] = aroon_ind_14.aroon_indicator()
-    df["Aroon_Up_14"] = aroon_ind_14.aroon_up()
-    df["Aroon_Down_14"] = aroon_ind_14.aroon_down()
-
-    aroon_ind_21 = AroonIndicator(high=df["High"], low=df["Low"], window=21)
-    df["Aroon_21"] = aroon_ind_21.aroon_indicator()
-    df["Aroon_Up_21"] = aroon_ind_21.aroon_up()
-    df["Aroon_Down_21"] = aroon_ind_21.aroon_down()
-
-    # adx
-    adx_ind_7 = ADXIndicator(high=df["High"], low=df["Low"], close=df["Close"], window=7)
-    df["ADX_7"] = adx_ind_7.adx()
-    df["ADX_neg_7"] = adx_ind_7.adx_neg()
-    df["ADX_pos_7"] = adx_ind_7.adx_pos()
-
-    adx_ind_14 = ADXIndicator(high=df["High"], low=df["Low"], close=df["Close"], window=14)
-    df["ADX_14"] = adx_ind_14.adx()
-    df["ADX_neg_14"] = adx_ind_14.adx_neg()
-    df["ADX_pos_14"] = adx_ind_14.adx_pos()
-
-    adx_ind_21 = ADXIndicator(high=df["High"], low=df["Low"], close=df["Close"], window=21)
-    df["ADX_21"] = adx_ind_21.adx()
-    df["ADX_neg_21"] = adx_ind_21.adx_neg()
-    df["ADX_pos_21"] = adx_ind_21.adx_pos()
-
-    # obv
-    obv_ind = OnBalanceVolumeIndicator(close=df["Close"], volume=df["Volume"])
-    df["OBV"] = obv_ind.on_balance_volume()
-
-    # stochastic oscillator
-    stoch_osc_7 = StochasticOscillator(high=df["High"], low=df["Low"], close=df["Close"], window=7)
-    df["Stoch_7"] = stoch_osc_7.stoch()
-    df["Stoch_Signal_7"] = stoch_osc_7.stoch_signal()
-
-    stoch_osc_14 = StochasticOscillator(high=df["High"], low=df["Low"], close=df["Close"], window=14)
-    df["Stoch_14"] = stoch_osc_14.stoch()
-    df["Stoch_Signal_14"] = stoch_osc_14.stoch_signal()
-
-    stoch_osc_21 = StochasticOscillator(high=df["High"], low=df["Low"], close=df["Close"], window=21)
-    df["Stoch_21"] = stoch_osc_21.stoch()
-    df["Stoch_Signal_21"] = stoch_osc_21.stoch_signal()
-
-    ticker_encoded = one_hot_encoder.transform(df[["ticker"]])
-    df = df.drop(columns=["ticker"])
-    df = pd.concat([df, pd.DataFrame(ticker_encoded, index=df.index)], axis=1)
-
-    drop_cols = [c for c in ['Date','date','y','ticker', 'Close'] if c in df.columns]
-    df = df.drop(columns=drop_cols)
-
-    x_cols = [ 
-        'Open','High','Low','Volume','Dividends','Stock Splits',
-        'RSI_7','RSI_14','RSI_21','MACD','MACD_Signal',
-        'BB_High_7','BB_Low_7','BB_Width_7',
-        'BB_High_14','BB_Low_14','BB_Width_14',
-        'BB_High_21','BB_Low_21','BB_Width_21',
-        'Aroon_7','Aroon_Up_7','Aroon_Down_7',
-        'Aroon_14','Aroon_Up_14','Aroon_Down_14',
-        'Aroon_21','Aroon_Up_21','Aroon_Down_21',
-        'ADX_7','ADX_neg_7','ADX_pos_7',
-        'ADX_14','ADX_neg_14','ADX_pos_14',
-        'ADX_21','ADX_neg_21','ADX_pos_21',
-        'OBV','Stoch_7','Stoch_Signal_7',
-        'Stoch_14','Stoch_Signal_14',
-        'Stoch_21','Stoch_Signal_21',
-        'year_cos','year_sin','month_cos','month_sin','day_cos','day_sin',
-        0,1,2,3,4,5,6,7  
-    ] # should fit scalers on dataframes so feature_names_in_ works, this is a bandage solution
-
-    df_colmap = {str(c): c for c in df.columns}
-    ordered_cols = [df_colmap[str(c)] for c in x_cols]
-    X = df[ordered_cols]
-
-    print(X.head())
-    print(f"X columns: {X.columns}")
-
-    lookback = 3
-    window = X.tail(lookback).values
-
-    print(window)
-    input_scaled = x_scaler.transform(window)
-    
-    input_tensor = torch.tensor(input_scaled, dtype=torch.float32).unsqueeze(0)
-    
-    with torch.no_grad():
-        output = generator(input_tensor).squeeze(0).numpy()
-    
-    output_rescaled = y_scaler.inverse_transform(output.reshape(1, -1)).flatten()
-    
-    return jsonify(output_rescaled.tolist())
\ No newline at end of file
+    hints = route_hints(data, request.headers.get("X-Amzn-SageMaker-Custom-Attributes", ""), request.args)
+
+    try:
+        result = handle(data, hints)
+    except (KeyError, InvalidState) as e:
+        return jsonify({"error": str(e.args[0])}), 400
+    if NPZ in request.headers.get("Accept", ""):
+        body, content_type = encode_response(data, result, request.headers.get("Accept", ""))
+        return Response(body, mimetype=content_type)
+    return jsonify(result)
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import numpy as np
+import torch
+
+"""
+training metrics without a host sync per step
+
+log() keeps the (detached) loss tensors on their device; every `flush_every` steps they are stacked
+and copied to the host in one transfer, then land in a fixed-size in-memory ring buffer and,
+when `path` is set, in an append-only columnar log on disk:
+
+<path>/
+    meta.json              metric names
+    <name>.f32             every logged value, float32
+    <name>.step.i64        trainer step each value was logged at
+    epochs.jsonl           one summary line per epoch (mean/last per metric, step timing)
+"""
+
+class MetricsLogger():
+    # resume=True keeps an existing on-disk log (load_state_dict then trims it to the checkpoint)
+    def __init__(self, names=("d", "g", "gp", "gradient_norm"), flush_every=50, capacity=100_000, path=None, resume=False):
+        self.names = list(names)
+        self.flush_every = flush_every
+        self.capacity = capacity
+        self.path = path
+        self.step_count = 0
+        self.epochs = []
+        self._pending = {name: [] for name in self.names}
+        self._pending_steps = {name: [] for name in self.names}
+        self._ring = {name: np.empty(capacity, dtype=np.float32) for name in self.names}
+        self._written = {name: 0 for name in self.names}
+        self._epoch_sum = {name: 0.0 for name in self.names}
+        self._epoch_count = {name: 0 for name in self.names}
+        self._last = {name: None for name in self.names}
+        self._step_times = []
+        self._last_step = time.perf_counter()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump({"names": self.names}, f)
+            mode = "ab" if resume else "wb"
+            for name in self.names:
+                for suffix in (".f32", ".step.i64"):
+                    open(os.path.join(path, f"{name}{suffix}"), mode).close()
+            open(os.path.join(path, "epochs.jsonl"), mode).close()
+
+    # value is a scalar tensor (any device) or a python number; never synced here
+    def log(self, name, value):
+        if torch.is_tensor(value):
+            value = value.detach()
+        self._pending[name].append(value)
+        self._pending_steps[name].append(self.step_count)
+
+    # step timing restarts here (call when an epoch starts)
+    def reset_timer(self):
+        self._last_step = time.perf_counter()
+
+    # marks the end of one training step (one batch)
+    def step(self):
+        now = time.perf_counter()
+        self._step_times.append(now - self._last_step)
+        self._last_step = now
+        self.step_count += 1
+        if self.step_count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for name in self.names:
+            pending = self._pending[name]
+            if not pending:
+                continue
+            if torch.is_tensor(pending[0]):
+                values = torch.stack(pending).float().cpu().numpy()
+            else:
+                values = np.asarray(pending, dtype=np.float32)
+            steps = np.asarray(self._pending_steps[name], dtype=np.int64)
+            self._pending[name], self._pending_steps[name] = [], []
+
+            start = self._written[name]
+            idx = (start + np.arange(len(values))) % self.capacity
+            self._ring[name][idx] = values
+            self._written[name] += len(values)
+            self._epoch_sum[name] += float(values.sum(dtype=np.float64))
+            self._epoch_count[name] += len(values)
+            self._last[name] = float(values[-1])
+
+            if self.path is not None:
+                with open(os.path.join(self.path, f"{name}.f32"), "ab") as f:
+                    f.write(values.astype(np.float32).tobytes())
+                with open(os.path.join(self.path, f"{name}.step.i64"), "ab") as f:
+                    f.write(steps.tobytes())
+
+    # the most recent values of a metric (up to `capacity`), oldest first
+    def series(self, name):
+        self.flush()
+        n = self._written[name]
+        if n <= self.capacity:
+            return self._ring[name][:n].copy()
+        return np.roll(self._ring[name], -(n % self.capacity))
+
+    # extra: additional json-able fields for this epoch's summary (e.g. validation metrics)
+    def end_epoch(self, epoch, extra=None):
+        self.flush()
+        summary = {"epoch": epoch, "step": self.step_count}
+        for name in self.names:
+            count = self._epoch_count[name]
+            summary[name] = {
+                "mean": self._epoch_sum[name] / count if count else None,
+                "last": self._last[name] if count else None,
+            }
+            self._epoch_sum[name], self._epoch_count[name] = 0.0, 0
+        step_times = np.asarray(self._step_times)
+        summary["steps"] = len(step_times)
+        summary["step_time_mean"] = float(step_times.mean()) if len(step_times) else None
+        summary["steps_per_sec"] = float(len(step_times) / step_times.sum()) if len(step_times) else None
+        self._step_times = []
+        summary.update(extra or {})
+        self.epochs.append(summary)
+
+        if self.path is not None:
+            with open(os.path.join(self.path, "epochs.jsonl"), "a") as f:
+                f.write(json.dumps(summary) + "\n")
+        return summary
+
+
+    def state_dict(self):
+        self.flush()
+        return {
+            "step_count": self.step_count,
+            "epochs": list(self.epochs),
+            "written": dict(self._written),
+            "ring": {name: ring.copy() for name, ring in self._ring.items()},
+            "epoch_sum": dict(self._epoch_sum),
+            "epoch_count": dict(self._epoch_count),
+            "last": dict(self._last),
+        }
+
+    # restores a checkpointed logger; anything logged after that checkpoint is dropped from disk too
+    def load_state_dict(self, state):
+        for name in self.names:
+            self._pending[name], self._pending_steps[name] = [], []
+        self.step_count = state["step_count"]
+        self.epochs = list(state["epochs"])
+        self._written = dict(state["written"])
+        self._ring = {name: np.array(ring, dtype=np.float32) for name, ring in state["ring"].items()}
+        self._epoch_sum = dict(state["epoch_sum"])
+        self._epoch_count = dict(state["epoch_count"])
+        self._last = dict(state["last"])
+        self._step_times = []
+
+        if self.path is not None:
+            for name in self.names:
+                for suffix, itemsize in ((".f32", 4), (".step.i64", 8)):
+                    with open(os.path.join(self.path, f"{name}{suffix}"), "ab") as f:
+                        f.truncate(self._written[name] * itemsize)
+            with open(os.path.join(self.path, "epochs.jsonl"), "w") as f:
+                f.writelines(json.dumps(summary) + "\n" for summary in self.epochs)
+
+
+# whole on-disk log as {name: values} (plus {name}_step arrays), memory-mapped
+def read_log(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        names = json.load(f)["names"]
+    log = {}
+    for name in names:
+        values_path = os.path.join(path, f"{name}.f32")
+        steps_path = os.path.join(path, f"{name}.step.i64")
+        size = os.path.getsize(values_path)
+        log[name] = np.memmap(values_path, dtype=np.float32, mode="r") if size else np.empty(0, dtype=np.float32)
+        log[f"{name}_step"] = np.memmap(steps_path, dtype=np.int64, mode="r") if size else np.empty(0, dtype=np.int64)
+    return log
+
+
+def read_epochs(path):
+    with open(os.path.join(path, "epochs.jsonl")) as f:
+        return [json.loads(line) for line in f if line.strip()]
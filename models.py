@@ -11,19 +11,14 @@ class Generator(nn.Module):
         self.linear_2 = nn.Linear(128, 64)
         self.linear_3 = nn.Linear(64, 1)
         self.dropout = nn.Dropout(0.2)
-        
 
+    # GRUs start from their default zero hidden state, so nothing is allocated or probed per call
     def forward(self, x):
-        use_cuda = 1
-        device = torch.device("cuda" if (torch.cuda.is_available() & use_cuda) else "cpu")
-        h0 = torch.zeros(1, x.size(0), 1024).to(device)
-        out_1, _ = self.gru_1(x, h0)
+        out_1, _ = self.gru_1(x)
         out_1 = self.dropout(out_1)
-        h1 = torch.zeros(1, x.size(0), 512).to(device)
-        out_2, _ = self.gru_2(out_1, h1)
+        out_2, _ = self.gru_2(out_1)
         out_2 = self.dropout(out_2)
-        h2 = torch.zeros(1, x.size(0), 256).to(device)
-        out_3, _ = self.gru_3(out_2, h2)
+        out_3, _ = self.gru_3(out_2)
         out_3 = self.dropout(out_3)
         out_4 = self.linear_1(out_3[:, -1, :])
         out_5 = self.linear_2(out_4)
@@ -31,9 +26,10 @@ class Generator(nn.Module):
         return out_6
 
 class Discriminator(nn.Module):
-    def __init__(self):
+    # input is the (lookback + 1)-step sequence the critic scores, one conv channel per step
+    def __init__(self, lookback=3):
         super().__init__()
-        self.conv1 = nn.Conv1d(4, 32, kernel_size = 5, stride = 1, padding = 'same')
+        self.conv1 = nn.Conv1d(lookback + 1, 32, kernel_size = 5, stride = 1, padding = 'same')
         self.conv2 = nn.Conv1d(32, 64, kernel_size = 5, stride = 1, padding = 'same')
         self.conv3 = nn.Conv1d(64, 128, kernel_size = 5, stride = 1, padding = 'same')
         self.linear1 = nn.Linear(128, 256)
@@ -0,0 +1,291 @@
+import os
+import json
+import shutil
+import hashlib
+import time
+import joblib
+import torch
+from torch.utils.data import DataLoader
+from feature_store import build_feature_store, store_version, FeatureStore
+from preprocessing import WindowDataset, TickerBatchSampler
+from models import Generator, Discriminator
+from training import Trainer
+from checkpoint import CheckpointManager
+from metrics import MetricsLogger
+from registry import write_manifest, export_torchscript
+
+"""
+config-driven training pipeline: featurize -> window -> train -> export
+
+    run = run_pipeline(load_config("configs/tech_1y.json"))
+
+every stage has a cache key (a hash of its config fields and the upstream stage's key). the keys and
+outputs of finished stages are kept in <run_dir>/stages.json, and a stage is skipped when its key is
+unchanged and its outputs are still on disk, so editing e.g. the learning rate reruns train + export
+but not featurize/window
+
+<run_dir>/
+    stages.json                     {stage: {"key", "outputs", "finished", "elapsed"}}
+    windows.json                    window counts per split for the configured lookback
+    checkpoints/                    CheckpointManager + metrics log of the train stage
+    generator.pth  discriminator.pth  train.json
+<export_dir>/
+    <name>_generator.pth  <name>_generator.ts  <name>_discriminator.pth  <name>.manifest.json
+    scalers/<name>_{x,y}_scaler.pkl  encoders/<name>_one_hot_encoder.pkl
+(<name> is the run name, "<sector>_1y" by default: a run on other data or with a custom name gets its own
+artifacts instead of overwriting the served <sector>_1y ones)
+"""
+
+STAGES = ("featurize", "window", "train", "export")
+
+DEFAULT_CONFIG = {
+    "name": None,                   # run name, defaults to "<sector>_1y"
+    "sector": "tech",
+    "data_path": None,              # defaults to data/1yr/<sector>_stocks_1y.csv
+    "split": 0.8,
+    "period": 10,
+    "lookback": 3,
+    "batch_size": 128,
+    "epochs": 100,
+    "learning_rate": 1e-4,
+    "betas": [0.5, 0.9],
+    "critic_iterations": 5,
+    "lambda_weight": 10,
+    "fake_mode": "no_grad",
+    "compile": False,
+    "amp_dtype": None,              # "bfloat16" for autocast
+    "seed": 0,
+    "eval_every": 1,
+    "patience": 10,
+    "min_delta": 0.0,
+    "checkpoint_every": 1,
+    "keep_last": 3,
+    "device": "auto",               # "auto", "cpu", "cuda", "cuda:1", ...
+    "threads": None,                # torch intra-op threads, None leaves torch's default
+    "num_workers": 0,
+    "run_dir": None,                # defaults to runs/<name>
+    "export_dir": "models",
+}
+
+# config fields each stage's output depends on (besides the upstream stage)
+STAGE_FIELDS = {
+    "featurize": ("data_path", "split", "period"),
+    "window": ("lookback",),
+    "train": ("batch_size", "epochs", "learning_rate", "betas", "critic_iterations", "lambda_weight",
+              "fake_mode", "compile", "amp_dtype", "seed", "eval_every", "patience", "min_delta"),
+    "export": ("name", "sector", "export_dir"),
+}
+
+
+def load_config(path=None, overrides=None):
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        with open(path) as f:
+            config.update(json.load(f))
+    config.update(overrides or {})
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"unknown config keys: {sorted(unknown)}")
+    config["name"] = config["name"] or f"{config['sector']}_1y"
+    config["data_path"] = config["data_path"] or os.path.join("data", "1yr", f"{config['sector']}_stocks_1y.csv")
+    config["run_dir"] = config["run_dir"] or os.path.join("runs", config["name"])
+    return config
+
+
+def resolve_device(name):
+    if name == "auto":
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return torch.device(name)
+
+
+def stage_key(config, stage, upstream=None):
+    fields = {field: config[field] for field in STAGE_FIELDS[stage]}
+    if stage == "featurize":
+        # the store version also covers the source file's size and mtime
+        upstream = store_version(config["data_path"], config["split"], config["period"])
+    blob = json.dumps({"stage": stage, "fields": fields, "upstream": upstream}, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+
+class Pipeline():
+    def __init__(self, config, resume=False):
+        self.config = config
+        self.resume = resume
+        self.run_dir = config["run_dir"]
+        self.manifest_path = os.path.join(self.run_dir, "stages.json")
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _write_manifest(self):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def cached(self, stage, key):
+        entry = self.manifest.get(stage)
+        if entry is None or entry["key"] != key:
+            return False
+        return all(os.path.exists(path) for path in entry["outputs"].values() if isinstance(path, str))
+
+    # stages: the ones allowed to run (the others are only used from cache); force: rerun these even when cached
+    def run(self, stages=STAGES, force=()):
+        config = self.config
+        if config["threads"]:
+            torch.set_num_threads(config["threads"])
+        upstream, stale = None, None
+        for stage in STAGES:
+            key = stage_key(config, stage, upstream)
+            if self.cached(stage, key) and stage not in force:
+                print(f"[{stage}] cached ({key})")
+            elif stage not in stages:
+                print(f"[{stage}] out of date, skipped")
+                stale = stale or stage
+            elif stale is not None:
+                raise RuntimeError(f"stage {stage} needs {stale}, which is out of date and not selected to run")
+            else:
+                print(f"[{stage}] running ({key})")
+                start = time.perf_counter()
+                outputs = getattr(self, stage)(key)
+                self.manifest[stage] = {"key": key, "outputs": outputs,
+                                        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                        "elapsed": time.perf_counter() - start}
+                self._write_manifest()
+            upstream = key
+        return {stage: entry["outputs"] for stage, entry in self.manifest.items()}
+
+    def store(self):
+        return FeatureStore(self.manifest["featurize"]["outputs"]["store"])
+
+    def featurize(self, key):
+        config = self.config
+        path = build_feature_store(config["data_path"], split=config["split"], period=config["period"])
+        return {"store": path}
+
+    def datasets(self):
+        store = self.store()
+        lookback = self.config["lookback"]
+        train = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), lookback, store.offsets("train"))
+        test = WindowDataset.from_offsets(store.array("x_test"), store.array("y_test"), lookback, store.offsets("test"))
+        return train, test
+
+    # windows are lazy views over the store, so this stage only checks the lookback against the
+    # tickers and records the window counts
+    def window(self, key):
+        train, test = self.datasets()
+        if len(train) == 0 or len(test) == 0:
+            raise ValueError(f"lookback {self.config['lookback']} leaves no windows ({len(train)} train, {len(test)} test)")
+        path = os.path.join(self.run_dir, "windows.json")
+        with open(path, "w") as f:
+            json.dump({"lookback": self.config["lookback"], "train": len(train), "test": len(test),
+                       "tickers": self.store().meta["tickers"]}, f, indent=1)
+        print(f"{len(train)} train windows, {len(test)} test windows")
+        return {"windows": path}
+
+    def train(self, key):
+        config = self.config
+        store = self.store()
+        train_dataset, test_dataset = self.datasets()
+        device = resolve_device(config["device"])
+        pin_memory = device.type == "cuda"
+        train_loader = DataLoader(
+            train_dataset,
+            batch_sampler=TickerBatchSampler(train_dataset, config["batch_size"], shuffle=True, seed=config["seed"]),
+            collate_fn=WindowDataset.collate,
+            num_workers=config["num_workers"],
+            pin_memory=pin_memory
+        )
+        test_loader = DataLoader(
+            test_dataset,
+            batch_size=config["batch_size"],
+            shuffle=False,
+            collate_fn=WindowDataset.collate,
+            num_workers=config["num_workers"],
+            pin_memory=pin_memory
+        )
+
+        torch.manual_seed(config["seed"])
+        generator = Generator(store.n_features).to(device)
+        discriminator = Discriminator(config["lookback"]).to(device)
+        optim_g = torch.optim.Adam(generator.parameters(), lr=config["learning_rate"], betas=config["betas"])
+        optim_d = torch.optim.Adam(discriminator.parameters(), lr=config["learning_rate"], betas=config["betas"])
+
+        # checkpoints of an older train config are useless for this one
+        checkpoint_dir = os.path.join(self.run_dir, "checkpoints")
+        checkpoint_key = os.path.join(checkpoint_dir, "key")
+        resume = False
+        if self.resume and os.path.exists(checkpoint_key):
+            with open(checkpoint_key) as f:
+                resume = f.read() == key
+        if not resume and os.path.exists(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(checkpoint_key, "w") as f:
+            f.write(key)
+
+        metrics = MetricsLogger(path=os.path.join(checkpoint_dir, "metrics"), resume=resume)
+        amp_dtype = getattr(torch, config["amp_dtype"]) if config["amp_dtype"] else None
+        trainer = Trainer(generator, discriminator, optim_g, optim_d, lambda_weight=config["lambda_weight"],
+                          critic_iterations=config["critic_iterations"], device=device, fake_mode=config["fake_mode"],
+                          metrics=metrics, compile=config["compile"], amp_dtype=amp_dtype)
+        checkpoints = CheckpointManager(checkpoint_dir, every=config["checkpoint_every"], keep_last=config["keep_last"])
+        start_epoch = checkpoints.restore(trainer) if resume else 0
+
+        y_scaler = store.transformer("y_scaler")
+        trainer.train(train_loader, epochs=config["epochs"], lookback=config["lookback"], output_dim=1, device=device,
+                      start_epoch=start_epoch, checkpoints=checkpoints, val_loader=test_loader,
+                      eval_every=config["eval_every"], patience=config["patience"], min_delta=config["min_delta"],
+                      y_scaler=y_scaler)
+        checkpoints.close()
+
+        outputs = {
+            "generator": os.path.join(self.run_dir, "generator.pth"),
+            "discriminator": os.path.join(self.run_dir, "discriminator.pth"),
+            "summary": os.path.join(self.run_dir, "train.json"),
+        }
+        torch.save(generator.state_dict(), outputs["generator"])
+        torch.save(discriminator.state_dict(), outputs["discriminator"])
+        with open(outputs["summary"], "w") as f:
+            json.dump({
+                "steps": trainer.num_steps,
+                "epochs": len(metrics.epochs),
+                "best_epoch": trainer.best_epoch,
+                "val": trainer.evaluate(test_loader, device, y_scaler),
+            }, f, indent=1)
+        return outputs
+
+    # one prefix per run name; the manifest lets registry.py serve every exported model from one MODEL_DIR
+    def export(self, key):
+        config = self.config
+        store = self.store()
+        trained = self.manifest["train"]["outputs"]
+        prefix = config["name"]
+        out_dir = config["export_dir"]
+        os.makedirs(os.path.join(out_dir, "scalers"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "encoders"), exist_ok=True)
+        outputs = {
+            "generator": os.path.join(out_dir, f"{prefix}_generator.pth"),
+            "discriminator": os.path.join(out_dir, f"{prefix}_discriminator.pth"),
+            "x_scaler": os.path.join(out_dir, "scalers", f"{prefix}_x_scaler.pkl"),
+            "y_scaler": os.path.join(out_dir, "scalers", f"{prefix}_y_scaler.pkl"),
+            "one_hot_encoder": os.path.join(out_dir, "encoders", f"{prefix}_one_hot_encoder.pkl"),
+        }
+        shutil.copyfile(trained["generator"], outputs["generator"])
+        shutil.copyfile(trained["discriminator"], outputs["discriminator"])
+        for name in ("x_scaler", "y_scaler", "one_hot_encoder"):
+            joblib.dump(store.transformer(name), outputs[name])
+        outputs["generator_script"] = os.path.join(out_dir, export_torchscript(
+            out_dir, os.path.basename(outputs["generator"]), store.n_features, config["lookback"]))
+        # what registry.py needs to serve this model next to the other sectors
+        outputs["manifest"] = write_manifest(out_dir, prefix, config["sector"], config["lookback"], config["period"],
+                                             store.meta["feature_names"], store.transformer("one_hot_encoder").categories_[0],
+                                             {k: os.path.relpath(v, out_dir) for k, v in outputs.items()})
+        print(f"Exported {prefix} to {out_dir}")
+        return outputs
+
+
+def run_pipeline(config, stages=STAGES, force=(), resume=False):
+    return Pipeline(config, resume).run(stages, force)
@@ -1,49 +1,145 @@
 import numpy as np
 import torch
+from torch.utils.data import Dataset, Sampler
 import re
 from datetime import datetime
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder
 
+# windows as strided views (no copy) over one contiguous float32 buffer
+# x_[j] = x[j:j + window], y_[j] = y[j + window], y_gan[j] = y[j:j + window + 1]
 def sliding_window(x: np.array, y: np.array, window: int) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-    x_ = []
-    y_ = []
-    y_gan = []
-
-    for i in range(window, x.shape[0]):
-        tmp_x = x[i - window: i, :]
-        tmp_y = y[i]
-        tmp_y_gan = y[i - window: i + 1]
-        x_.append(tmp_x)
-        y_.append(tmp_y)
-        y_gan.append(tmp_y_gan)
-
-    x_ = torch.from_numpy(np.array(x_)).float()
-    y_ = torch.from_numpy(np.array(y_)).float()
-    y_gan = torch.from_numpy(np.array(y_gan)).float()
+    x = torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+    y = torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32))
+    if x.shape[0] <= window:
+        return x.new_empty((0, window) + x.shape[1:]), y[:0], y.new_empty((0, window + 1) + y.shape[1:])
 
-    return x_, y_, y_gan
-
-def build_windows_per_ticker(x: np.array, y: np.array, window: int, tickers: np.array) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-    x_, y_, y_gan_ = [], [], []
+    x_ = x[:-1].unfold(0, window, 1).transpose(1, 2)
+    y_ = y[window:]
+    y_gan = y.unfold(0, window + 1, 1)
+    if y_gan.dim() == 3:
+        y_gan = y_gan.transpose(1, 2)
 
-    df_x, df_y = pd.DataFrame(x), pd.DataFrame(y)
-    df_ticker = pd.Series(tickers)
-    for _, index_mask in df_ticker.groupby(df_ticker).groups.items():
-        x_ticker = df_x.iloc[index_mask].values
-        y_ticker = df_y.iloc[index_mask].values
-
-        if len(x_ticker) > window:
-            x_w, y_w, y_gan_w = sliding_window(x_ticker, y_ticker, window)
-            x_.append(x_w)
-            y_.append(y_w)
-            y_gan_.append(y_gan_w)
+    return x_, y_, y_gan
 
-    x_ = torch.cat(x_, dim=0)
-    y_ = torch.cat(y_, dim=0)
-    y_gan_ = torch.cat(y_gan_, dim=0)
+# groups rows by ticker (sorted ticker order, original row order within a ticker)
+# returns the row permutation and the [start, end) boundaries of each ticker in it
+def ticker_offsets(tickers: np.array) -> tuple[np.array, np.array]:
+    tickers = np.asarray(tickers)
+    order = np.argsort(tickers, kind="stable")
+    _, starts = np.unique(tickers[order], return_index=True)
+    offsets = np.append(starts, len(tickers))
+    return order, offsets
+
+# start row of every window that stays inside one ticker, given ticker_offsets() boundaries
+def window_starts(offsets: np.array, window: int) -> np.array:
+    lengths = np.diff(offsets)
+    n_windows = np.maximum(lengths - window, 0)
+    first = np.repeat(offsets[:-1], n_windows)
+    skip = np.repeat(np.cumsum(n_windows) - n_windows, n_windows)
+    return first + np.arange(n_windows.sum()) - skip
 
-    return x_, y_, y_gan_
+def build_windows_per_ticker(x: np.array, y: np.array, window: int, tickers: np.array) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    order, offsets = ticker_offsets(tickers)
+    if not np.array_equal(order, np.arange(len(order))):
+        x, y = x[order], y[order]
+    x_, y_, y_gan_ = sliding_window(x, y, window)
+
+    starts = window_starts(offsets, window)
+    if len(starts) == len(x_):
+        # a single ticker: every window is valid, hand back the views as they are
+        return x_, y_, y_gan_
+
+    # windows straddling two tickers are dropped in one gather
+    starts = torch.from_numpy(starts)
+    return x_[starts], y_[starts], y_gan_[starts]
+
+
+# lazy counterpart of build_windows_per_ticker: keeps one contiguous float32 copy of the scaled
+# rows (grouped by ticker) plus the start row of every valid window, and slices windows on demand
+# batches come back as (x (B, window, F), y_gan (B, window + 1, 1)), same as the TensorDataset it replaces
+class WindowDataset(Dataset):
+    def __init__(self, x: np.array, y: np.array, window: int, tickers: np.array):
+        order, offsets = ticker_offsets(tickers)
+        x = np.ascontiguousarray(x[order], dtype=np.float32)
+        y = np.ascontiguousarray(y[order], dtype=np.float32)
+        self._setup(torch.from_numpy(x), torch.from_numpy(y), window, offsets)
+
+    # rows already grouped by ticker with known boundaries (e.g. FeatureStore arrays);
+    # float32 input, memmaps included, is used as is without a copy
+    @classmethod
+    def from_offsets(cls, x: np.array, y: np.array, window: int, offsets: np.array):
+        dataset = cls.__new__(cls)
+        dataset._setup(torch.as_tensor(x, dtype=torch.float32), torch.as_tensor(y, dtype=torch.float32), window, offsets)
+        return dataset
+
+    def _setup(self, x, y, window, offsets):
+        self.x = x
+        self.y = y
+        self.window = window
+        self.offsets = offsets
+        self.starts = torch.from_numpy(window_starts(offsets, window))
+        n_windows = np.maximum(np.diff(offsets) - window, 0)
+        # [start, end) window indices belonging to each ticker, for TickerBatchSampler
+        self.ticker_ranges = np.append(0, np.cumsum(n_windows))
+        self._x_steps = torch.arange(window)
+        self._y_steps = torch.arange(window + 1)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        start = int(self.starts[i])
+        return self.x[start:start + self.window], self.y[start:start + self.window + 1]
+
+    # whole batch in one gather; DataLoader calls this instead of __getitem__ per item
+    def __getitems__(self, indices):
+        starts = self.starts[torch.as_tensor(indices)].unsqueeze(1)
+        return self.x[starts + self._x_steps], self.y[starts + self._y_steps]
+
+    # __getitems__ already returns the batch, so the loader must not collate it again
+    @staticmethod
+    def collate(batch):
+        return batch
+
+# batches of windows that never mix two tickers; with shuffle=True the windows inside each ticker
+# and the order of the batches are reshuffled every epoch. set_epoch() reseeds it like DistributedSampler
+# num_replicas/rank: every rank draws the same batch list and keeps every num_replicas-th batch, cut to
+# an equal count per rank, so data-parallel ranks together see the single-process batches
+class TickerBatchSampler(Sampler):
+    def __init__(self, dataset: WindowDataset, batch_size: int, shuffle: bool = True, drop_last: bool = False, seed: int = 0,
+                 num_replicas: int = 1, rank: int = 0):
+        self.ticker_ranges = dataset.ticker_ranges
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _ticker_batches(self, start, end):
+        n = end - start
+        full = n // self.batch_size
+        return full if self.drop_last or n % self.batch_size == 0 else full + 1
+
+    def __len__(self):
+        total = sum(self._ticker_batches(start, end) for start, end in zip(self.ticker_ranges[:-1], self.ticker_ranges[1:]))
+        return total // self.num_replicas
+
+    def __iter__(self):
+        rng = np.random.default_rng((self.seed, self.epoch))
+        batches = []
+        for start, end in zip(self.ticker_ranges[:-1], self.ticker_ranges[1:]):
+            indices = start + (rng.permutation(end - start) if self.shuffle else np.arange(end - start))
+            for b in range(self._ticker_batches(start, end)):
+                batches.append(indices[b * self.batch_size:(b + 1) * self.batch_size])
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        batches = batches[self.rank::self.num_replicas][:len(batches) // self.num_replicas]
+        return iter([batch.tolist() for batch in batches])
 
 
 def remove_unicode(text):
@@ -86,6 +182,9 @@ def cyclical_encoding(time, max_days: int) -> list[int]:
 
 
 def one_hot_encoding(train_df, test_df):
+    # sklearn is imported here, not at module level: the serving process imports this module for
+    # cyclical_encoding and should not pay ~1s for sklearn before it can answer /ping
+    from sklearn.preprocessing import OneHotEncoder
     one_hot_encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
     one_hot_encoder.fit(train_df[["ticker"]])
     train_encoded = one_hot_encoder.transform(train_df[["ticker"]])
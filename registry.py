@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+from models import Generator
+from preprocessing import cyclical_encoding
+from features import FEATURE_COLUMNS
+from batching import MicroBatcher, BatcherClosed
+
+"""
+every sector model under MODEL_DIR behind one lookup, loaded on first use and evicted least recently
+used once the resident models exceed a memory budget
+
+<MODEL_DIR>/<name>.manifest.json (written by pipeline.py's export stage), paths relative to MODEL_DIR:
+    {"name": "tech_1y", "sector": "tech", "lookback": 3, "period": 10, "input_size": 59,
+     "feature_columns": [...model input order...], "tickers": [...],
+     "generator": "tech_1y_generator.pth", "x_scaler": "scalers/tech_1y_x_scaler.pkl",
+     "y_scaler": "scalers/tech_1y_y_scaler.pkl", "one_hot_encoder": "encoders/tech_1y_one_hot_encoder.pkl"}
+
+models without a manifest (older tarballs, artifacts/) are found by their <name>_generator.pth and
+<name>_{x_scaler,y_scaler,one_hot_encoder}.pkl files anywhere below MODEL_DIR; their input size comes
+from the weights and their tickers from the encoder, which costs a load of both at discovery.
+`python3 registry.py MODEL_DIR --script` writes the manifests (plus a TorchScript generator) up front
+
+an optional "generator_script" entry points at a frozen TorchScript generator (export_torchscript);
+it is loaded instead of rebuilding Generator + load_state_dict. plain state dicts are loaded with
+mmap=True / assign=True, so the weights are paged in from the file instead of copied
+"""
+
+BASE_COLUMNS = ["Open", "High", "Low", "Volume", "Dividends", "Stock Splits"]
+DATE_COLUMNS = ["year_cos", "year_sin", "month_cos", "month_sin", "day_cos", "day_sin"]
+ARTIFACTS = ("generator", "x_scaler", "y_scaler", "one_hot_encoder")
+
+
+def feature_columns(n_tickers):
+    return BASE_COLUMNS + FEATURE_COLUMNS + DATE_COLUMNS + [str(i) for i in range(n_tickers)]
+
+
+# paths: {artifact: path relative to model_dir}
+def write_manifest(model_dir, name, sector, lookback, period, feature_columns, tickers, paths):
+    generator = torch.load(os.path.join(model_dir, paths["generator"]), map_location="cpu")
+    manifest = {
+        "name": name,
+        "sector": sector,
+        "lookback": lookback,
+        "period": period,
+        "input_size": int(generator["gru_1.weight_ih_l0"].shape[1]),
+        "feature_columns": [str(c) for c in feature_columns],
+        "tickers": [str(t) for t in tickers],
+    }
+    manifest.update({key: paths[key] for key in ARTIFACTS + ("generator_script",) if key in paths})
+    path = os.path.join(model_dir, f"{name}.manifest.json")
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    return path
+
+
+def _legacy_manifest(model_dir, name, files):
+    paths = {"generator": files[f"{name}_generator.pth"]}
+    for key in ARTIFACTS[1:]:
+        if f"{name}_{key}.pkl" not in files:
+            return None
+        paths[key] = files[f"{name}_{key}.pkl"]
+    generator = torch.load(os.path.join(model_dir, paths["generator"]), map_location="cpu")
+    tickers = joblib.load(os.path.join(model_dir, paths["one_hot_encoder"])).categories_[0]
+    return dict(paths, name=name, sector=name.split("_")[0], lookback=3, period=10,
+                input_size=int(generator["gru_1.weight_ih_l0"].shape[1]),
+                feature_columns=feature_columns(len(tickers)), tickers=[str(t) for t in tickers])
+
+
+# traces the generator in eval mode (dropout off) and freezes it next to the state dict;
+# generator: state dict path relative to model_dir; returns the script's path relative to model_dir
+def export_torchscript(model_dir, generator, input_size, lookback):
+    model = Generator(input_size=input_size)
+    model.load_state_dict(torch.load(os.path.join(model_dir, generator), map_location="cpu"))
+    model.eval()
+    example = torch.zeros(1, lookback, input_size)
+    with torch.no_grad():
+        script = torch.jit.freeze(torch.jit.trace(model, example))
+    path = os.path.splitext(generator)[0] + ".ts"
+    torch.jit.save(script, os.path.join(model_dir, path))
+    return path
+
+
+# changes whenever the manifest or a file it points at is rewritten (size/mtime, no read of the weights);
+# prediction cache keys include it, so a redeployed model never serves its predecessor's cached results
+def model_version(model_dir, manifest):
+    digest = hashlib.blake2b(json.dumps(manifest, sort_keys=True).encode(), digest_size=8)
+    for key in ARTIFACTS + ("generator_script",):
+        if key in manifest:
+            stat = os.stat(os.path.join(model_dir, manifest[key]))
+            digest.update(f"{manifest[key]}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+# {name: manifest} for every model below model_dir
+def discover(model_dir):
+    manifests, files = {}, {}
+    for root, _, names in os.walk(model_dir):
+        for filename in names:
+            path = os.path.relpath(os.path.join(root, filename), model_dir)
+            if filename.endswith(".manifest.json"):
+                with open(os.path.join(model_dir, path)) as f:
+                    manifest = json.load(f)
+                manifests[manifest["name"]] = manifest
+            files.setdefault(filename, path)
+    for filename in files:
+        name = filename[:-len("_generator.pth")]
+        if filename.endswith("_generator.pth") and name not in manifests:
+            manifest = _legacy_manifest(model_dir, name, files)
+            if manifest is not None:
+                manifests[name] = manifest
+    return manifests
+
+
+class SectorModel():
+    # script: use the manifest's TorchScript generator when it has one
+    def __init__(self, manifest, model_dir, device="cpu", batch_max_size=64, batch_max_wait_ms=5.0, script=True):
+        self.manifest = manifest
+        self.name = manifest["name"]
+        self.lookback = manifest["lookback"]
+        self.period = manifest.get("period", 10)
+        self.feature_columns = manifest["feature_columns"]
+        self.timings = {}
+
+        start = time.perf_counter()
+        if script and manifest.get("generator_script"):
+            self.generator = torch.jit.load(os.path.join(model_dir, manifest["generator_script"]), map_location=device)
+        else:
+            self.generator = Generator(input_size=manifest["input_size"])
+            state = torch.load(os.path.join(model_dir, manifest["generator"]), map_location=device, mmap=True)
+            self.generator.load_state_dict(state, assign=True)
+        self.generator.eval()
+        self.timings["generator"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.x_scaler = joblib.load(os.path.join(model_dir, manifest["x_scaler"]))
+        self.y_scaler = joblib.load(os.path.join(model_dir, manifest["y_scaler"]))
+        self.one_hot_encoder = joblib.load(os.path.join(model_dir, manifest["one_hot_encoder"]))
+        self.timings["transformers"] = time.perf_counter() - start
+
+        self.nbytes = sum(t.numel() * t.element_size() for t in self.generator.state_dict().values())
+        self.nbytes += sum(os.path.getsize(os.path.join(model_dir, manifest[key])) for key in ARTIFACTS[1:])
+
+        # concurrent single-window predictions share one forward (see batching.py)
+        self.batcher = None
+        if batch_max_wait_ms > 0:
+            self.batcher = MicroBatcher(lambda windows: self.predict_batch(np.stack(windows)),
+                                        batch_max_size, batch_max_wait_ms)
+
+    # date encodings, ticker one-hot and column ordering for rows that already carry the indicators
+    def build_model_input(self, df):
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['Date'])
+
+        year = df['date'].dt.year - 1
+        month = df['date'].dt.month - 1
+        day = df['date'].dt.day - 1
+
+        df["year_cos"], df["year_sin"] = cyclical_encoding(year, self.period)
+        df["month_cos"], df["month_sin"] = cyclical_encoding(month, 12)
+        df["day_cos"], df["day_sin"] = cyclical_encoding(day, 31)
+
+        ticker_encoded = self.one_hot_encoder.transform(df[["ticker"]])
+        df = df.drop(columns=["ticker"])
+        df = pd.concat([df, pd.DataFrame(ticker_encoded, index=df.index)], axis=1)
+
+        drop_cols = [c for c in ['Date','date','y','ticker', 'Close'] if c in df.columns]
+        df = df.drop(columns=drop_cols)
+
+        df_colmap = {str(c): c for c in df.columns}
+        ordered_cols = [df_colmap[c] for c in self.feature_columns]
+        return df[ordered_cols]
+
+    # scaled generator forward pass for a (n, lookback, n_features) stack of windows, in price units
+    def predict_batch(self, windows):
+        n, lookback, n_features = windows.shape
+        input_scaled = self.x_scaler.transform(windows.reshape(-1, n_features)).reshape(n, lookback, n_features)
+
+        input_tensor = torch.tensor(input_scaled, dtype=torch.float32)
+
+        with torch.no_grad():
+            output = self.generator(input_tensor).numpy()
+
+        return self.y_scaler.inverse_transform(output.reshape(n, -1))
+
+    # one (lookback, n_features) window, in price units. a window of any other shape (a client that sent
+    # fewer than lookback rows) runs on its own: stacked into a batch it would fail every other caller too
+    def predict(self, window):
+        if self.batcher is not None and window.shape == (self.lookback, len(self.feature_columns)):
+            try:
+                return self.batcher.submit(window).tolist()
+            except BatcherClosed:
+                # evicted (batcher closed) while this request still held the model
+                pass
+        return self.predict_batch(window[None])[0].tolist()
+
+    # one forward at batch size 1 and one at the batcher's max size, so the first requests do not pay
+    # for lazy initialization (allocator, kernel selection, scaler validation)
+    def warmup(self):
+        start = time.perf_counter()
+        row = self.x_scaler.data_min_.reshape(1, 1, -1)
+        for n in (1, self.batcher.max_batch_size if self.batcher else 1):
+            self.predict_batch(np.repeat(np.repeat(row, self.lookback, axis=1), n, axis=0))
+        self.timings["warmup"] = time.perf_counter() - start
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+class ModelRegistry():
+    # memory_budget_mb: resident models are evicted least recently used above it (None: keep all)
+    # default_model: wins when a ticker is served by several models and the request names no sector
+    def __init__(self, model_dir, memory_budget_mb=None, default_model=None, **model_kwargs):
+        self.model_dir = model_dir
+        self.memory_budget = memory_budget_mb * 2**20 if memory_budget_mb else None
+        self.default_model = default_model
+        self.model_kwargs = model_kwargs
+        self.manifests = discover(model_dir)
+        self.versions = {name: model_version(model_dir, manifest) for name, manifest in self.manifests.items()}
+        self.by_sector = {m["sector"]: name for name, m in sorted(self.manifests.items())}
+        self.by_ticker = {}
+        for name, manifest in sorted(self.manifests.items()):
+            for ticker in manifest["tickers"]:
+                self.by_ticker.setdefault(ticker, []).append(name)
+        self._loaded = OrderedDict()
+        # name -> Event set when the thread loading that model is done (loaded or failed)
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    # model name for a request; an explicit model or sector beats the ticker lookup
+    def resolve(self, ticker=None, sector=None, model=None):
+        if model is not None:
+            if model not in self.manifests:
+                raise KeyError(f"unknown model {model!r}")
+            return model
+        if sector is not None:
+            if sector not in self.by_sector:
+                raise KeyError(f"no model for sector {sector!r}")
+            return self.by_sector[sector]
+        candidates = self.by_ticker.get(ticker, [])
+        if len(candidates) == 1:
+            return candidates[0]
+        if not candidates:
+            raise KeyError(f"no model serves ticker {ticker!r}")
+        if self.default_model in candidates:
+            return self.default_model
+        raise KeyError(f"ticker {ticker!r} is served by {candidates}, pass a sector or model")
+
+    # the load itself runs outside the registry lock, so requests for resident models never wait on it;
+    # concurrent requests for the same cold model wait for the one thread loading it
+    def get(self, name):
+        while True:
+            with self._lock:
+                if name in self._loaded:
+                    self.hits += 1
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name]
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = threading.Event()
+                    self.misses += 1
+                    break
+            # loaded (or failed) by another thread: look again
+            loading.wait()
+
+        try:
+            model = SectorModel(self.manifests[name], self.model_dir, **self.model_kwargs)
+        except BaseException:
+            with self._lock:
+                del self._loading[name]
+            loading.set()
+            raise
+
+        evicted = []
+        with self._lock:
+            self._loaded[name] = model
+            while self.memory_budget is not None and len(self._loaded) > 1 and self.resident_bytes() > self.memory_budget:
+                evicted.append(self._loaded.popitem(last=False)[1])
+                self.evictions += 1
+            del self._loading[name]
+        loading.set()
+        for old in evicted:
+            old.close()
+        return model
+
+    # loads and warms up models (default: all, in name order) while they fit the memory budget
+    def preload(self, names=None):
+        loaded = []
+        for name in names or sorted(self.manifests):
+            manifest = self.manifests[name]
+            size = sum(os.path.getsize(os.path.join(self.model_dir, manifest[key])) for key in ARTIFACTS)
+            if self.memory_budget is not None and loaded and self.resident_bytes() + size > self.memory_budget:
+                break
+            self.get(name).warmup()
+            loaded.append(name)
+        return loaded
+
+    # in a freshly forked child: new micro-batcher threads (the parent's did not survive the fork)
+    def after_fork(self):
+        self._lock = threading.Lock()
+        self._loading = {}
+        for model in self._loaded.values():
+            if model.batcher is not None:
+                model.batcher.restart()
+
+    def model_for(self, ticker=None, sector=None, model=None):
+        return self.get(self.resolve(ticker, sector, model))
+
+    def resident_bytes(self):
+        return sum(model.nbytes for model in self._loaded.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": sorted(self.manifests),
+                "resident": list(self._loaded),
+                "resident_mb": self.resident_bytes() / 2**20,
+                "memory_budget_mb": self.memory_budget / 2**20 if self.memory_budget else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "batching": {name: model.batcher.stats() for name, model in self._loaded.items() if model.batcher},
+            }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="write manifests (and TorchScript generators) for the models in a MODEL_DIR")
+    parser.add_argument("model_dir")
+    parser.add_argument("--script", action="store_true", help="also export a frozen TorchScript generator per model")
+    args = parser.parse_args()
+    for name, manifest in discover(args.model_dir).items():
+        paths = {key: manifest[key] for key in ARTIFACTS}
+        if args.script:
+            paths["generator_script"] = export_torchscript(args.model_dir, manifest["generator"],
+                                                           manifest["input_size"], manifest["lookback"])
+        path = write_manifest(args.model_dir, name, manifest["sector"], manifest["lookback"], manifest["period"],
+                              manifest["feature_columns"], manifest["tickers"], paths)
+        print(f"{name}: {path}")
@@ -1,8 +1,13 @@
+import os
+import sys
 import yfinance as yf
 import pandas as pd
 import boto3
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from codec import NPZ, encode_batch, decode_predictions
+
 # creates input data
 def build_payload(ticker="JPM", days=100):
     df = yf.download(
@@ -42,19 +47,75 @@ def build_payload(ticker="JPM", days=100):
 
     return df.to_dict(orient="records")
 
-payload = build_payload("GS", days=100)
+# OHLCV rows of every ticker from one download
+def build_batch_frame(tickers, days=100):
+    df = yf.download(
+        list(tickers),
+        period=f"{days}d",
+        interval="1d",
+        auto_adjust=False,
+        progress=False,
+        group_by="column",
+    )
+
+    # (field, ticker) columns -> one row per (date, ticker)
+    df = df.stack(level=1, future_stack=True).rename_axis(["Date", "ticker"]).reset_index()
+    df = df.dropna(subset=["Close"])
+
+    df = df.assign(
+        Date = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d"),
+        Dividends = 0.0,
+        **{"Stock Splits": 0.0},
+    )
+
+    cols = [
+        "Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits", "ticker", "Date"
+    ]
+
+    df = df[cols]
+    df["Open"]   = df["Open"].astype(float)
+    df["High"]   = df["High"].astype(float)
+    df["Low"]    = df["Low"].astype(float)
+    df["Close"]  = df["Close"].astype(float)
+    df["Volume"] = df["Volume"].astype(int)
+    return df
+
+# input data for a batch invocation, optionally scored at several dates
+def build_batch_payload(tickers, days=100, as_of=None):
+    df = build_batch_frame(tickers, days)
+    payload = {"batch": df.to_dict(orient="records")}
+    if as_of:
+        payload["as_of"] = list(as_of)
+    return payload
 
 endpoint_name = "financial-1y-wgan-gp-endpoint-2"   
 region = "us-east-1"
 
 runtime = boto3.client("sagemaker-runtime", region_name=region)
 
-resp = runtime.invoke_endpoint(
-    EndpointName=endpoint_name,
-    ContentType="application/json",
-    Accept="application/json",
-    Body=json.dumps(payload).encode("utf-8"),
-)
+def invoke(payload):
+    resp = runtime.invoke_endpoint(
+        EndpointName=endpoint_name,
+        ContentType="application/json",
+        Accept="application/json",
+        Body=json.dumps(payload).encode("utf-8"),
+    )
+    return json.loads(resp["Body"].read().decode("utf-8"))
+
+# {ticker: {as_of: prediction}} for many tickers in one round trip
+# binary=True sends and receives the columnar npz format (codec.py) instead of JSON records
+def invoke_batch(tickers, days=100, as_of=None, binary=False):
+    if not binary:
+        return invoke(build_batch_payload(tickers, days, as_of))["predictions"]
+    resp = runtime.invoke_endpoint(
+        EndpointName=endpoint_name,
+        ContentType=NPZ,
+        Accept=NPZ,
+        Body=encode_batch(build_batch_frame(tickers, days), as_of),
+    )
+    return decode_predictions(resp["Body"].read())
 
-result = json.loads(resp["Body"].read().decode("utf-8"))
-print(result) 
\ No newline at end of file
+if __name__ == "__main__":
+    print(invoke(build_payload("GS", days=100)))
+    print(invoke_batch(["AXP", "BAC", "C", "GS", "JPM", "MS", "PNC", "WFC"], days=100))
+    print(invoke_batch(["AXP", "BAC", "C", "GS", "JPM", "MS", "PNC", "WFC"], days=100, binary=True))
@@ -11,6 +11,7 @@ model_name = "financial-1y-wgan-gp"
 endpoint_config_name = "financial-1y-wgan-gp-endpoint-config"
 endpoint_name = "financial-1y-wgan-gp-endpoint-2"
 image_uri = os.getenv["IMAGE_URI"] 
+max_concurrency = int(os.environ.get("MAX_CONCURRENCY", os.environ.get("BATCH_MAX_SIZE", "64")))
 
 try:
     client.create_model(
@@ -29,7 +30,9 @@ try:
         ProductionVariants=[{
             "VariantName": "AllTraffic",
             "ModelName": model_name,
-            "ServerlessConfig": {"MemorySizeInMB": 2048, "MaxConcurrency": 1}
+            # the server micro-batches concurrent requests (BATCH_MAX_WAIT_MS); with MaxConcurrency 1 every batch
+            # holds one request, so it defaults to BATCH_MAX_SIZE (serverless allows 1-200, within the account quota)
+            "ServerlessConfig": {"MemorySizeInMB": 2048, "MaxConcurrency": max_concurrency}
         }],
     )
     print("Created endpoint config:", endpoint_config_name)
@@ -0,0 +1,321 @@
+import os
+import io
+import json
+import shutil
+import importlib.util
+import pandas as pd
+
+"""
+append-only dataset writer + partition-aware reader
+
+csv layout:      <name>.csv plus <name>.csv.index.json ({ticker: [[byte offset, nbytes, nrows], ...]})
+parquet layout:  <name>/ticker=<T>/year=<Y>/part-<n>.parquet (hive partitioned, needs pyarrow)
+
+while writing, everything lives under <path>.partial and only becomes visible at finalize()
+append_rows() adds new bars to a finalized dataset without rewriting it
+"""
+
+def _fsync_write(path, text, mode="a"):
+    with open(path, mode) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class DatasetWriter():
+    def __init__(self, path, format="csv", resume=True):
+        if format not in ("csv", "parquet"):
+            raise ValueError("format must be 'csv' or 'parquet'")
+        # checked here, not at the first append, so a missing engine fails before anything is fetched
+        if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("format='parquet' needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.format = format
+        self.partial = f"{path}.partial"
+        self.log_path = f"{path}.partial.log"
+        self.header = None
+        self.completed = {}  # ticker -> [offset, nbytes, nrows] (csv) or nrows (parquet)
+
+        if resume and os.path.exists(self.log_path):
+            self._recover()
+        else:
+            self._reset()
+
+    def _reset(self):
+        for p in (self.partial, self.log_path):
+            if os.path.isdir(p):
+                shutil.rmtree(p)
+            elif os.path.exists(p):
+                os.remove(p)
+        if self.format == "parquet":
+            os.makedirs(self.partial)
+
+    # replays the commit log and drops anything written after the last committed ticker
+    def _recover(self):
+        end = 0
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line
+                if entry.get("header") is not None:
+                    self.header = entry["header"]
+                self.completed[entry["ticker"]] = entry["meta"]
+                if self.format == "csv":
+                    end = entry["meta"][0] + entry["meta"][1]
+
+        if self.format == "csv":
+            if os.path.exists(self.partial):
+                with open(self.partial, "r+b") as f:
+                    f.truncate(end)
+            else:
+                # the log describes a file that is gone: start over, header included
+                self.header = None
+                self.completed = {}
+                self._reset()
+        else:
+            os.makedirs(self.partial, exist_ok=True)
+            for entry in os.listdir(self.partial):
+                ticker = entry.split("=", 1)[-1]
+                if ticker not in self.completed:
+                    shutil.rmtree(os.path.join(self.partial, entry))
+
+        if self.completed:
+            print(f"Resuming {self.path}: {len(self.completed)} tickers already written")
+
+    def append(self, ticker, ticker_df):
+        if ticker in self.completed:
+            return
+        if self.format == "csv":
+            meta = self._append_csv(ticker_df)
+        else:
+            meta = self._append_parquet(ticker, ticker_df)
+        entry = {"ticker": ticker, "meta": meta}
+        if self.format == "csv" and len(self.completed) == 0:
+            entry["header"] = self.header
+        _fsync_write(self.log_path, json.dumps(entry) + "\n")
+        self.completed[ticker] = meta
+
+    def _append_csv(self, ticker_df):
+        if self.header is None:
+            self.header = [str(c) for c in ticker_df.columns]
+            _fsync_write(self.partial, ",".join(self.header) + "\n", mode="w")
+        buf = io.StringIO()
+        ticker_df[self.header].to_csv(buf, index=False, header=False)
+        data = buf.getvalue().encode("utf-8")
+        with open(self.partial, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return [offset, len(data), len(ticker_df)]
+
+    def _append_parquet(self, ticker, ticker_df):
+        ticker_dir = os.path.join(self.partial, f"ticker={ticker}")
+        staging = f"{ticker_dir}.tmp"
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        part = ticker_df.drop(columns=["ticker"], errors="ignore")
+        for year, year_df in _year_parts(part):
+            year_dir = os.path.join(staging, f"year={year}")
+            os.makedirs(year_dir)
+            year_df.to_parquet(os.path.join(year_dir, "part-0.parquet"), index=False)
+        os.replace(staging, ticker_dir)
+        return len(ticker_df)
+
+    # atomically publishes the dataset at self.path and clears the partial state
+    def finalize(self):
+        if self.format == "csv":
+            if not os.path.exists(self.partial):
+                raise RuntimeError(f"Nothing written to {self.path}")
+            index = {
+                "header": self.header,
+                "size": os.path.getsize(self.partial),
+                "tickers": {ticker: [meta] for ticker, meta in self.completed.items()},
+            }
+            # a stale index must never describe the new file, so drop it before the swap
+            if os.path.exists(f"{self.path}.index.json"):
+                os.remove(f"{self.path}.index.json")
+            os.replace(self.partial, self.path)
+            _write_index(self.path, index)
+        else:
+            old = f"{self.path}.old"
+            # left behind by a run interrupted between the two swaps
+            if os.path.exists(old):
+                shutil.rmtree(old)
+            if os.path.exists(self.path):
+                os.replace(self.path, old)
+            os.replace(self.partial, self.path)
+            if os.path.exists(old):
+                shutil.rmtree(old)
+        os.remove(self.log_path)
+        return self.path
+
+
+def _read_index(path):
+    index_path = f"{path}.index.json"
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def _write_index(path, index):
+    index_tmp = f"{path}.index.json.tmp"
+    _fsync_write(index_tmp, json.dumps(index), mode="w")
+    os.replace(index_tmp, f"{path}.index.json")
+
+
+# one-off scan that indexes a plain csv (e.g. data/1yr/*.csv) by contiguous ticker runs
+def build_index(path):
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header = header_line.decode("utf-8").rstrip("\r\n").split(",")
+        ticker_col = header.index("ticker")
+        tickers = {}
+        current, start, nrows = None, f.tell(), 0
+        offset = start
+        for line in f:
+            ticker = line.decode("utf-8").rstrip("\r\n").split(",")[ticker_col]
+            if ticker != current:
+                if current is not None:
+                    tickers.setdefault(current, []).append([start, offset - start, nrows])
+                current, start, nrows = ticker, offset, 0
+            offset += len(line)
+            nrows += 1
+        if current is not None:
+            tickers.setdefault(current, []).append([start, offset - start, nrows])
+    index = {"header": header, "size": offset, "tickers": tickers}
+    _write_index(path, index)
+    return index
+
+
+def _year_parts(part):
+    years = pd.to_datetime(part["date"]).dt.year
+    return part.groupby(years)
+
+
+# append new rows for existing or new tickers to a finalized dataset
+# csv: bytes go past the indexed size and only count once the index is swapped in,
+# so a crash mid-append leaves the dataset unchanged (the tail is truncated next time)
+def append_rows(path, frames):
+    frames = {ticker: df for ticker, df in frames.items() if len(df)}
+    if not frames:
+        return 0
+
+    if os.path.isdir(path):
+        for ticker, ticker_df in frames.items():
+            part = ticker_df.drop(columns=["ticker"], errors="ignore")
+            for year, year_df in _year_parts(part):
+                year_dir = os.path.join(path, f"ticker={ticker}", f"year={year}")
+                os.makedirs(year_dir, exist_ok=True)
+                n = len([f for f in os.listdir(year_dir) if f.endswith(".parquet")])
+                tmp = os.path.join(year_dir, f".part-{n}.parquet.tmp")
+                year_df.to_parquet(tmp, index=False)
+                os.replace(tmp, os.path.join(year_dir, f"part-{n}.parquet"))
+        return sum(len(df) for df in frames.values())
+
+    index = _read_index(path) or build_index(path)
+    header = index["header"]
+    with open(path, "r+b") as f:
+        f.truncate(index["size"])
+        f.seek(index["size"])
+        for ticker, ticker_df in frames.items():
+            buf = io.StringIO()
+            ticker_df[header].to_csv(buf, index=False, header=False)
+            data = buf.getvalue().encode("utf-8")
+            index["tickers"].setdefault(ticker, []).append([f.tell(), len(data), len(ticker_df)])
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        index["size"] = f.tell()
+    _write_index(path, index)
+    return sum(len(df) for df in frames.values())
+
+
+# last stored row per ticker ({ticker: Series}), reading only each ticker's final line when indexed
+def last_rows(path):
+    index = None if os.path.isdir(path) else _read_index(path)
+    if index is None:
+        df = load_dataset(path)
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.sort_values("date").groupby("ticker").tail(1)
+        return {row["ticker"]: row for _, row in df.iterrows()}
+
+    lines = []
+    with open(path, "rb") as f:
+        for ticker, ranges in index["tickers"].items():
+            offset, nbytes, _ = ranges[-1]
+            tail = min(nbytes, 64 * 1024)
+            f.seek(offset + nbytes - tail)
+            lines.append(f.read(tail).rstrip(b"\n").rsplit(b"\n", 1)[-1])
+    df = pd.read_csv(io.BytesIO(b"\n".join(lines)), header=None, names=index["header"])
+    df["date"] = pd.to_datetime(df["date"])
+    return {row["ticker"]: row for _, row in df.iterrows()}
+
+
+def _filter_dates(df, start, end):
+    if start is None and end is None:
+        return df
+    dates = pd.to_datetime(df["date"])
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates <= pd.Timestamp(end)
+    return df[mask]
+
+
+def _load_csv(path, tickers, start, end, columns):
+    index = _read_index(path)
+    if index is not None:
+        # seek straight to each ticker's byte ranges instead of parsing the whole file
+        frames = []
+        with open(path, "rb") as f:
+            for ticker in (index["tickers"] if tickers is None else tickers):
+                if ticker not in index["tickers"]:
+                    continue
+                ranges = index["tickers"][ticker]
+                chunks = []
+                for offset, nbytes, _ in ranges:
+                    f.seek(offset)
+                    chunks.append(f.read(nbytes))
+                frames.append(pd.read_csv(io.BytesIO(b"".join(chunks)), header=None, names=index["header"],
+                                          usecols=columns))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or index["header"])
+        return _filter_dates(df, start, end)
+
+    frames = []
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=100_000):
+        if tickers is not None:
+            chunk = chunk[chunk["ticker"].isin(tickers)]
+        frames.append(_filter_dates(chunk, start, end))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _load_parquet(path, tickers, start, end, columns):
+    filters = []
+    if tickers is not None:
+        filters.append(("ticker", "in", list(tickers)))
+    if start is not None:
+        filters.append(("year", ">=", pd.Timestamp(start).year))
+    if end is not None:
+        filters.append(("year", "<=", pd.Timestamp(end).year))
+    df = pd.read_parquet(path, columns=columns, filters=filters or None)
+    if "ticker" in df.columns:
+        df["ticker"] = df["ticker"].astype(str)
+    df = df.drop(columns=["year"], errors="ignore")
+    return _filter_dates(df, start, end).reset_index(drop=True)
+
+
+# load a dataset written by DatasetWriter (or any plain csv with date/ticker columns)
+# only the requested tickers / date range are parsed when the layout allows it
+def load_dataset(path, tickers=None, start=None, end=None, columns=None):
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ["date", "ticker"]))
+    if os.path.isdir(path):
+        return _load_parquet(path, tickers, start, end, columns)
+    return _load_csv(path, tickers, start, end, columns)
@@ -0,0 +1,264 @@
+import os
+import io
+import json
+import time
+import random
+import sqlite3
+import argparse
+import itertools
+import multiprocessing
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from feature_store import build_feature_store, FeatureStore
+from preprocessing import WindowDataset, TickerBatchSampler
+from models import Generator, Discriminator
+from training import Trainer
+from distributed import SECTORS, sector_source, split_cores, pin_threads
+
+"""
+hyperparameter sweep over Trainer configurations, several trials at a time
+
+python3 sweep.py --sector tech --trials 24 --workers 4 [--space space.json]
+
+- every worker process is pinned to its own slice of the cores (threads-per-trial torch threads)
+- all trials read the same memory-mapped feature store, built once up front
+- after each validation pass a trial reports its val RMSE; it is pruned when that is worse than the
+  median of the other trials' best RMSE at the same epoch (after a few startup trials / warmup epochs)
+- everything lands in sweeps/<name>/results.db (sqlite): trials + per-epoch intermediate values
+"""
+
+# what main.py hard-codes, plus the values to try around it
+DEFAULT_SPACE = {
+    "lookback": [3, 5, 10],
+    "learning_rate": [5e-5, 1e-4, 3e-4],
+    "critic_iterations": [3, 5],
+    "lambda_weight": [5, 10],
+    "batch_size": [64, 128, 256],
+}
+SWEEP_DIR = "sweeps"
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_db(db_path):
+    with connect(db_path) as conn:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trials (
+                id INTEGER PRIMARY KEY,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                best_rmse REAL,
+                best_epoch INTEGER,
+                mae REAL,
+                r2 REAL,
+                epochs INTEGER,
+                steps_per_sec REAL,
+                elapsed REAL,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS intermediate (
+                trial_id INTEGER,
+                epoch INTEGER,
+                rmse REAL,
+                PRIMARY KEY (trial_id, epoch)
+            );
+        """)
+
+
+# full grid, or `n_trials` distinct points drawn from it
+def sample_space(space, n_trials=None, seed=0):
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if n_trials is None or n_trials >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, n_trials)
+
+
+class MedianPruner():
+    def __init__(self, n_startup_trials=3, n_warmup_epochs=2):
+        self.n_startup_trials = n_startup_trials
+        self.n_warmup_epochs = n_warmup_epochs
+
+    # this trial's best rmse so far against the median of the other trials' best so far at the same
+    # epoch (Optuna MedianPruner semantics): comparing the current, noisy GAN validation value with
+    # the others' bests would prune on a single bad epoch
+    def should_prune(self, conn, trial_id, epoch, rmse):
+        if epoch < self.n_warmup_epochs:
+            return False
+        # only trials that got as far as this epoch count
+        rows = conn.execute(
+            "SELECT MIN(rmse) FROM intermediate WHERE trial_id != ? AND epoch <= ? "
+            "GROUP BY trial_id HAVING MAX(epoch) = ?",
+            (trial_id, epoch, epoch)).fetchall()
+        if len(rows) < self.n_startup_trials:
+            return False
+        (best,) = conn.execute("SELECT MIN(rmse) FROM intermediate WHERE trial_id = ? AND epoch <= ?",
+                               (trial_id, epoch)).fetchone()
+        best = rmse if best is None else min(best, rmse)
+        return best > float(np.median([r[0] for r in rows]))
+
+
+_worker_cores = None
+
+
+def _init_worker(core_queue, threads):
+    global _worker_cores
+    _worker_cores = core_queue.get() if core_queue is not None else None
+    if _worker_cores:
+        pin_threads(_worker_cores)
+    else:
+        torch.set_num_threads(threads)
+
+
+def run_trial(trial_id, params, config):
+    conn = connect(config["db"])
+    conn.execute("UPDATE trials SET status = 'running' WHERE id = ?", (trial_id,))
+    conn.commit()
+    pruner = MedianPruner(config["n_startup_trials"], config["n_warmup_epochs"])
+    start = time.perf_counter()
+    try:
+        store = FeatureStore(config["store"])
+        lookback = params["lookback"]
+        train = WindowDataset.from_offsets(store.array("x_train"), store.array("y_train"), lookback, store.offsets("train"))
+        test = WindowDataset.from_offsets(store.array("x_test"), store.array("y_test"), lookback, store.offsets("test"))
+        batches = TickerBatchSampler(train, params["batch_size"], shuffle=True, seed=config["seed"])
+        if config.get("max_steps"):
+            batches = list(batches)[:config["max_steps"]]
+        train_loader = DataLoader(train, batch_sampler=batches, collate_fn=WindowDataset.collate)
+        test_loader = DataLoader(test, batch_size=1024, collate_fn=WindowDataset.collate)
+
+        torch.manual_seed(config["seed"])
+        generator = Generator(store.n_features)
+        discriminator = Discriminator(lookback)
+        betas = [0.5, 0.9]
+        optim_g = torch.optim.Adam(generator.parameters(), lr=params["learning_rate"], betas=betas)
+        optim_d = torch.optim.Adam(discriminator.parameters(), lr=params["learning_rate"], betas=betas)
+        trainer = Trainer(generator, discriminator, optim_g, optim_d, lambda_weight=params["lambda_weight"],
+                          critic_iterations=params["critic_iterations"], device=torch.device("cpu"))
+
+        pruned = []
+
+        def report(trainer, epoch, summary):
+            val = summary.get("val")
+            if val is None:
+                return False
+            conn.execute("INSERT OR REPLACE INTO intermediate VALUES (?, ?, ?)", (trial_id, epoch, val["rmse"]))
+            conn.commit()
+            if pruner.should_prune(conn, trial_id, epoch, val["rmse"]):
+                pruned.append(epoch)
+                return True
+            return False
+
+        with redirect_stdout(io.StringIO()):
+            trainer.train(train_loader, epochs=config["epochs"], lookback=lookback, output_dim=1,
+                          device=torch.device("cpu"), val_loader=test_loader, eval_every=config["eval_every"],
+                          patience=config["patience"], y_scaler=store.transformer("y_scaler"),
+                          on_epoch_end=report)
+
+        best = trainer.evaluate(test_loader, torch.device("cpu"), store.transformer("y_scaler"))
+        result = {
+            "status": "pruned" if pruned else "complete",
+            "best_rmse": trainer.best_score,
+            "best_epoch": trainer.best_epoch,
+            "mae": best["mae"],
+            "r2": best["r2"],
+            "epochs": len(trainer.metrics.epochs),
+            "steps_per_sec": float(np.mean([e["steps_per_sec"] for e in trainer.metrics.epochs])),
+            "elapsed": time.perf_counter() - start,
+            "error": None,
+        }
+    except Exception as e:
+        result = {"status": "failed", "elapsed": time.perf_counter() - start, "error": repr(e)}
+
+    columns = ", ".join(f"{key} = ?" for key in result)
+    conn.execute(f"UPDATE trials SET {columns} WHERE id = ?", (*result.values(), trial_id))
+    conn.commit()
+    conn.close()
+    return trial_id, result
+
+
+def run_sweep(sector, space=DEFAULT_SPACE, n_trials=None, workers=2, threads_per_trial=None, epochs=30,
+              eval_every=1, patience=5, max_steps=None, n_startup_trials=3, n_warmup_epochs=2, seed=0, name=None):
+    name = name or f"{sector}_{time.strftime('%Y%m%d_%H%M%S')}"
+    out_dir = os.path.join(SWEEP_DIR, name)
+    os.makedirs(out_dir, exist_ok=True)
+    db = os.path.join(out_dir, "results.db")
+    init_db(db)
+
+    # one featurization for every trial; workers only memory-map it
+    store = build_feature_store(sector_source(sector))
+    trials = sample_space(space, n_trials, seed)
+    with connect(db) as conn:
+        ids = [conn.execute("INSERT INTO trials (params, status) VALUES (?, 'queued')", (json.dumps(params),)).lastrowid
+               for params in trials]
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    threads = threads_per_trial or max(1, len(cores) // workers)
+    ctx = multiprocessing.get_context("spawn")
+    core_queue = None
+    if len(cores) >= workers * threads:
+        core_queue = ctx.Queue()
+        for group in split_cores(cores[:workers * threads], workers):
+            core_queue.put(group)
+
+    config = {
+        "db": db,
+        "store": store,
+        "epochs": epochs,
+        "eval_every": eval_every,
+        "patience": patience,
+        "max_steps": max_steps,
+        "n_startup_trials": n_startup_trials,
+        "n_warmup_epochs": n_warmup_epochs,
+        "seed": seed,
+    }
+    print(f"Sweep {name}: {len(trials)} trials on {workers} workers x {threads} threads, results in {db}")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(core_queue, threads)) as pool:
+        futures = [pool.submit(run_trial, trial_id, params, config) for trial_id, params in zip(ids, trials)]
+        for future in as_completed(futures):
+            trial_id, result = future.result()
+            rmse = result.get("best_rmse")
+            print(f"trial {trial_id}: {result['status']}" + (f", best val RMSE {rmse:.4f}" if rmse is not None else "")
+                  + (f" ({result['error']})" if result.get("error") else ""))
+    return db
+
+
+def leaderboard(db, limit=10):
+    with connect(db) as conn:
+        return conn.execute(
+            "SELECT id, status, best_rmse, best_epoch, epochs, elapsed, params FROM trials "
+            "WHERE best_rmse IS NOT NULL ORDER BY best_rmse LIMIT ?", (limit,)).fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="parallel hyperparameter sweep for one sector model")
+    parser.add_argument("--sector", default="tech", choices=SECTORS)
+    parser.add_argument("--space", default=None, help="json file {param: [values]}; defaults to DEFAULT_SPACE")
+    parser.add_argument("--trials", type=int, default=None, help="random subset of the grid (default: full grid)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-trial", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--eval-every", type=int, default=1)
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--max-steps", type=int, default=None, help="cap on steps per epoch (smoke runs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space is not None:
+        with open(args.space) as f:
+            space = json.load(f)
+    db = run_sweep(args.sector, space, args.trials, args.workers, args.threads_per_trial, args.epochs,
+                   args.eval_every, args.patience, args.max_steps, seed=args.seed, name=args.name)
+    print(f"\n{'trial':>5} {'status':>9} {'val RMSE':>9} {'epoch':>6} {'epochs':>7} {'time':>7}  params")
+    for trial_id, status, rmse, best_epoch, n_epochs, elapsed, params in leaderboard(db):
+        print(f"{trial_id:>5} {status:>9} {rmse:>9.4f} {best_epoch + 1:>6} {n_epochs:>7} {elapsed:>6.0f}s  {params}")
@@ -1,49 +1,109 @@
+import math
+from contextlib import nullcontext
 import torch
+from metrics import MetricsLogger
+
+# how the critic steps get their fake sequences:
+#   "no_grad"  generator forward under torch.no_grad() every critic iteration (same updates as "graph")
+#   "reuse"    one no_grad forward per batch, shared by all critic iterations
+#   "graph"    generator forward with autograd every critic iteration (the original behaviour)
+FAKE_MODES = ("no_grad", "reuse", "graph")
+
+# accelerated mode (both opt-in):
+#   compile=True        generator/discriminator forwards go through torch.compile
+#   amp_dtype=bfloat16  those forwards run under autocast; losses are reduced in fp32
+# the gradient penalty always uses the eager discriminator in fp32: its double backward is not
+# supported by compiled graphs, and bf16 gradients make the ||grad|| - 1 term too noisy to be useful
+
+# epoch summary values are None when the epoch ran no steps (empty loader, max_steps, resume at the end)
+def _fmt(value, spec=".4f"):
+    return "n/a" if value is None else format(value, spec)
 
 class Trainer():
-    def __init__(self, generator, discriminator, optim_g, optim_d, lambda_weight, critic_iterations, device):
+    def __init__(self, generator, discriminator, optim_g, optim_d, lambda_weight, critic_iterations, device, fake_mode="no_grad", metrics=None, compile=False, amp_dtype=None, grad_sync=None):
+        if fake_mode not in FAKE_MODES:
+            raise ValueError(f"fake_mode must be one of {FAKE_MODES}")
         self.generator = generator
         self.discriminator = discriminator
         self.optim_g = optim_g
         self.optim_d = optim_d
         self.lambda_weight = lambda_weight
         self.critic_iterations = critic_iterations
-        self.losses = {"d": [], "g": [], "gp": [], "gradient_norm": []}
+        # losses stay on the device until the logger flushes them (every metrics.flush_every steps)
+        self.metrics = metrics if metrics is not None else MetricsLogger()
         self.num_steps = 0
+        self.fake_mode = fake_mode
         self.generator = self.generator.to(device)
         self.discriminator = self.discriminator.to(device)
+        self.device_type = torch.device(device).type
+        self.amp_dtype = amp_dtype
+        # called with the module about to be stepped, after its backward (e.g. distributed.all_reduce_gradients)
+        self.grad_sync = grad_sync
+        # early stopping / best-model selection on validation RMSE (see train)
+        self.best_score = None
+        self.best_epoch = None
+        self.best_state = None
+        self.bad_evals = 0
+        self._generator = torch.compile(self.generator) if compile else self.generator
+        self._discriminator = torch.compile(self.discriminator) if compile else self.discriminator
+
+    def autocast(self):
+        if self.amp_dtype is None:
+            return nullcontext()
+        return torch.autocast(device_type=self.device_type, dtype=self.amp_dtype)
+
+    # {name: [values]} view of the logged losses, as the old per-step lists
+    @property
+    def losses(self):
+        return {name: self.metrics.series(name).tolist() for name in self.metrics.names}
     
-    def critic_train_step(self, x, y, lookback, output_dim, device):
-        fake_data = self.generator(x)
-        fake_data = torch.cat([y[:, :lookback, :], fake_data.reshape(-1, 1, output_dim)], axis=1)
-
-        critic_real = self.discriminator(y)
-        critic_fake = self.discriminator(fake_data)
+    # real lookback followed by the generated next step, shaped like y
+    def fake_sequence(self, x, y, lookback, output_dim):
+        with self.autocast():
+            fake_data = self._generator(x)
+        return torch.cat([y[:, :lookback, :], fake_data.float().reshape(-1, 1, output_dim)], axis=1)
+
+    def critic_train_step(self, x, y, lookback, output_dim, device, fake_data=None):
+        if fake_data is None:
+            if self.fake_mode == "graph":
+                fake_data = self.fake_sequence(x, y, lookback, output_dim)
+            else:
+                # the critic loss never updates the generator, so its graph is not needed here
+                with torch.no_grad():
+                    fake_data = self.fake_sequence(x, y, lookback, output_dim)
+
+        with self.autocast():
+            critic_real = self._discriminator(y).float()
+            critic_fake = self._discriminator(fake_data).float()
 
         gp = self.gradient_penalty(y, fake_data, device)
-        self.losses['gp'].append(gp.item())
+        self.metrics.log('gp', gp)
 
         self.optim_d.zero_grad()
         d_loss = critic_fake.mean() - critic_real.mean() + gp
         d_loss.backward()
 
+        if self.grad_sync is not None:
+            self.grad_sync(self.discriminator)
         self.optim_d.step()
 
-        self.losses['d'].append(d_loss.item())
+        self.metrics.log('d', d_loss)
     
     def generator_train_step(self, x, y, lookback, output_dim):
-        fake_data = self.generator(x)
-        fake_data = torch.cat([y[:, :lookback, :], fake_data.reshape(-1, 1, output_dim)], axis=1)
+        fake_data = self.fake_sequence(x, y, lookback, output_dim)
 
-        critic_fake = self.discriminator(fake_data)
+        with self.autocast():
+            critic_fake = self._discriminator(fake_data).float()
 
         self.optim_g.zero_grad()
         g_loss = -critic_fake.mean()
         g_loss.backward()
 
+        if self.grad_sync is not None:
+            self.grad_sync(self.generator)
         self.optim_g.step()
 
-        self.losses['g'].append(g_loss.item())
+        self.metrics.log('g', g_loss)
     
     def gradient_penalty(self, real_data, fake_data, device):
         batch_size = real_data.size(0)
@@ -51,6 +111,7 @@ class Trainer():
 
         interpolated = (alpha * real_data.data + (1 - alpha) * fake_data.data.requires_grad_(True)).to(device)
 
+        # eager module, outside autocast: see the accelerated mode note at the top
         prob_interpolated = self.discriminator(interpolated)
 
         gradients = torch.autograd.grad(outputs=prob_interpolated, inputs=interpolated,
@@ -58,26 +119,106 @@ class Trainer():
                                         create_graph=True, retain_graph=True)[0]
 
         gradients = gradients.view(batch_size, -1)
-        self.losses['gradient_norm'].append(gradients.norm(2, dim=1).mean().item())
+        self.metrics.log('gradient_norm', gradients.norm(2, dim=1).mean())
 
         gradients_norm = torch.sqrt(torch.sum(gradients ** 2, dim=1) + 1e-12)
 
         return self.lambda_weight * ((gradients_norm - 1) ** 2).mean()
     
-    def train(self, data_loader, epochs, lookback, output_dim, device):
-        for epoch in range(epochs):
+    # batched inference over a held-out loader: RMSE / MAE / R² of the next-step prediction against
+    # y[:, -1], in price units when the fitted MinMaxScaler for y is given. sums stay on the device
+    def evaluate(self, data_loader, device, y_scaler=None):
+        was_training = self.generator.training
+        self.generator.eval()
+        # n, sum err², sum |err|, sum y, sum y²
+        stats = torch.zeros(5, dtype=torch.float64, device=device)
+        with torch.inference_mode():
             for x, y in data_loader:
                 x, y = x.to(device), y.to(device)
-                
+                pred = self.generator(x).reshape(-1).double()
+                true = y[:, -1, :].reshape(-1).double()
+                if y_scaler is not None:
+                    pred = (pred - y_scaler.min_[0]) / y_scaler.scale_[0]
+                    true = (true - y_scaler.min_[0]) / y_scaler.scale_[0]
+                err = pred - true
+                stats += torch.stack([torch.tensor(float(len(err)), dtype=torch.float64, device=device),
+                                      (err ** 2).sum(), err.abs().sum(), true.sum(), (true ** 2).sum()])
+        self.generator.train(was_training)
+
+        n, sse, sae, sum_y, sum_y2 = stats.tolist()
+        ss_tot = sum_y2 - sum_y * sum_y / n
+        return {
+            "rmse": math.sqrt(sse / n),
+            "mae": sae / n,
+            "r2": 1 - sse / ss_tot if ss_tot > 0 else float("nan"),
+        }
+
+    # returns True when validation has not improved by more than min_delta for `patience` evaluations
+    def _track_best(self, score, epoch, min_delta, patience):
+        if self.best_score is None or score < self.best_score - min_delta:
+            self.best_score = score
+            self.best_epoch = epoch
+            self.best_state = {k: v.detach().clone() for k, v in self.generator.state_dict().items()}
+            self.bad_evals = 0
+        else:
+            self.bad_evals += 1
+        return patience is not None and self.bad_evals >= patience
+
+    # start_epoch > 0 continues a run restored by CheckpointManager.restore
+    # val_loader: evaluated every `eval_every` epochs; training stops once val RMSE has not improved
+    # by min_delta for `patience` evaluations, and the best generator weights are loaded back at the end
+    # checkpoints keep-best uses score_fn(trainer) if given, else the val RMSE (lower is better)
+    # on_epoch_end(trainer, epoch, summary) runs after every epoch; returning True stops training (e.g. sweep pruning)
+    def train(self, data_loader, epochs, lookback, output_dim, device, start_epoch=0, checkpoints=None, score_fn=None,
+              val_loader=None, eval_every=1, patience=None, min_delta=0.0, y_scaler=None, restore_best=True,
+              on_epoch_end=None):
+        for epoch in range(start_epoch, epochs):
+            # reshuffle samplers that are seeded per epoch (TickerBatchSampler, DistributedSampler)
+            for sampler in (data_loader.batch_sampler, data_loader.sampler):
+                if hasattr(sampler, "set_epoch"):
+                    sampler.set_epoch(epoch)
+            self.metrics.reset_timer()
+            for x, y in data_loader:
+                x, y = x.to(device), y.to(device)
+
+                fake_data = None
+                if self.fake_mode == "reuse":
+                    with torch.no_grad():
+                        fake_data = self.fake_sequence(x, y, lookback, output_dim)
+
                 for _ in range(self.critic_iterations):
-                    self.critic_train_step(x, y, lookback, output_dim, device)
+                    self.critic_train_step(x, y, lookback, output_dim, device, fake_data)
                 
                 self.generator_train_step(x, y, lookback, output_dim)
                 
                 self.num_steps += 1
-                
-            print(f"Epoch [{epoch+1}/{epochs}] | D Loss: {self.losses['d'][-1]:.4f} | G Loss: {self.losses['g'][-1]:.4f} | GP: {self.losses['gp'][-1]:.4f} | Grad Norm: {self.losses['gradient_norm'][-1]:.4f}")
-    
-
-
-    
+                self.metrics.step()
+
+            val, stop = None, False
+            if val_loader is not None and ((epoch + 1) % eval_every == 0 or epoch == epochs - 1):
+                val = self.evaluate(val_loader, device, y_scaler)
+                stop = self._track_best(val["rmse"], epoch, min_delta, patience)
+
+            summary = self.metrics.end_epoch(epoch, extra={"val": val} if val is not None else None)
+            message = f"Epoch [{epoch+1}/{epochs}] | D Loss: {_fmt(summary['d']['last'])} | G Loss: {_fmt(summary['g']['last'])} | GP: {_fmt(summary['gp']['last'])} | Grad Norm: {_fmt(summary['gradient_norm']['last'])} | {_fmt(summary['steps_per_sec'], '.2f')} steps/s"
+            if val is not None:
+                message += f" | Val RMSE: {val['rmse']:.4f} MAE: {val['mae']:.4f} R2: {val['r2']:.4f}"
+            print(message)
+
+            if checkpoints is not None:
+                if score_fn is not None:
+                    score = score_fn(self)
+                else:
+                    score = val["rmse"] if val is not None else None
+                checkpoints.maybe_save(self, epoch, last=stop or epoch == epochs - 1, score=score)
+
+            if on_epoch_end is not None and on_epoch_end(self, epoch, summary):
+                break
+            if stop:
+                print(f"Early stopping: val RMSE has not improved for {self.bad_evals} evaluations (best {self.best_score:.4f} at epoch {self.best_epoch + 1})")
+                break
+
+        if checkpoints is not None:
+            checkpoints.wait()
+        if restore_best and self.best_state is not None:
+            self.generator.load_state_dict(self.best_state)